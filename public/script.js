@@ -10,8 +10,16 @@ document.addEventListener('DOMContentLoaded', () => {
    * @namespace
    */
   const GitRank = {
-    /** @type {Array<Object>} Holds the currently displayed dataset. */
+    /** @type {Array<Object>} Holds the currently displayed dataset (non-paged rankings only). */
     currentData: [],
+    /** @type {number} Total number of items in the current ranking. */
+    totalItems: 0,
+    /** @type {Object|null} Manifest of the pre-paginated ranking, or null when the full file is loaded. */
+    pagedManifest: null,
+    /** @type {Map<number, Promise<Array<Object>>>} Page shards fetched (or being fetched) for the current ranking. */
+    pageCache: new Map(),
+    /** @type {number} Incremented on every render so stale async renders can be dropped. */
+    renderId: 0,
     /** @type {number} Current page number for pagination. */
     currentPage: 1,
     /** @type {number} Number of items to display per page. */
@@ -128,6 +136,136 @@ document.addEventListener('DOMContentLoaded', () => {
       return translation || key;
     },
 
+    /**
+     * Fetches a JSON file, preferring its pre-compressed `.gz` sibling when the
+     * browser can decompress it. Falls back to the plain file.
+     * @param {string} url URL of the plain JSON file.
+     * @returns {Promise<Object>} The parsed JSON.
+     */
+    async loadJson(url) {
+      if ('DecompressionStream' in window) {
+        try {
+          const response = await fetch(`${url}.gz`);
+          if (response.ok) {
+            const bytes = new Uint8Array(await response.arrayBuffer());
+            // Some servers already decode .gz via Content-Encoding; check the gzip magic bytes
+            if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+              const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+              return JSON.parse(await new Response(stream).text());
+            }
+            return JSON.parse(new TextDecoder().decode(bytes));
+          }
+        } catch (error) {
+          console.warn(`Could not load ${url}.gz, falling back to plain JSON:`, error);
+        }
+      }
+      const response = await fetch(url);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      return response.json();
+    },
+
+    /**
+     * Expands the columnar layout ({keys, columns}) back into row objects.
+     * @param {Object} data The columnar data.
+     * @returns {Object} Data in the row layout: {meta, [data_key]: rows}.
+     */
+    decodeColumnar(data) {
+      const rowCount = data.columns.length ? data.columns[0].length : 0;
+      const rows = new Array(rowCount);
+      for (let i = 0; i < rowCount; i++) {
+        const row = {};
+        data.keys.forEach((key, k) => { row[key] = data.columns[k][i]; });
+        rows[i] = row;
+      }
+      return { meta: data.meta, [data.data_key]: rows };
+    },
+
+    /**
+     * Loads a ranking, preferring the compact columnar file over the row JSON.
+     * @param {string} type The ranking type (e.g., 'daily_trending').
+     * @returns {Promise<Object>} The ranking data in the row layout.
+     */
+    async loadRanking(type) {
+      try {
+        const data = await GitRank.loadJson(`./data/${type}.columnar.json`);
+        if (data.format === 'columnar') return GitRank.decodeColumnar(data);
+      } catch (error) {
+        console.warn(`Columnar data for ${type} unavailable, loading row JSON:`, error);
+      }
+      return GitRank.loadJson(`./data/${type}.json`);
+    },
+
+    /**
+     * Loads the page manifest of a pre-paginated ranking.
+     * @param {string} type The ranking type (e.g., 'daily_trending').
+     * @returns {Promise<Object|null>} The manifest, or null if the ranking is not paginated.
+     */
+    async loadManifest(type) {
+      try {
+        const manifest = await GitRank.loadJson(`./data/${type}/manifest.json`);
+        return manifest.format === 'paged' ? { ...manifest, type } : null;
+      } catch (error) {
+        console.warn(`No page manifest for ${type}, loading the full ranking:`, error);
+        return null;
+      }
+    },
+
+    /**
+     * Fetches one page shard of the current paged ranking, caching the request.
+     * @param {number} page The 1-based shard number.
+     * @returns {Promise<Array<Object>>} The items of that shard.
+     */
+    fetchPage(page) {
+      const manifest = GitRank.pagedManifest;
+      if (!GitRank.pageCache.has(page)) {
+        const url = `./data/${manifest.type}/page-${String(page).padStart(4, '0')}.json`;
+        const request = GitRank.loadJson(url).then(data => data[manifest.data_key] || []);
+        // Drop failed requests so they can be retried
+        request.catch(() => GitRank.pageCache.delete(page));
+        GitRank.pageCache.set(page, request);
+      }
+      return GitRank.pageCache.get(page);
+    },
+
+    /**
+     * Returns the items in [start, end) of the current ranking, fetching only the shards that cover them.
+     * @param {number} start Start index (inclusive).
+     * @param {number} end End index (exclusive).
+     * @returns {Promise<Array<Object>>} The items in range.
+     */
+    async getItems(start, end) {
+      const manifest = GitRank.pagedManifest;
+      if (!manifest) {
+        return GitRank.currentData.slice(start, end);
+      }
+      end = Math.min(end, manifest.total);
+      if (start >= end) return [];
+      const firstPage = Math.floor(start / manifest.page_size) + 1;
+      const lastPage = Math.ceil(end / manifest.page_size);
+      const pages = [];
+      for (let page = firstPage; page <= lastPage; page++) {
+        pages.push(GitRank.fetchPage(page));
+      }
+      const items = (await Promise.all(pages)).flat();
+      const offset = start - (firstPage - 1) * manifest.page_size;
+      return items.slice(offset, offset + (end - start));
+    },
+
+    /**
+     * Starts fetching the shards of the next display page in the background.
+     */
+    prefetchNextPage() {
+      const manifest = GitRank.pagedManifest;
+      if (!manifest) return;
+      const start = GitRank.currentPage * GitRank.itemsPerPage;
+      const end = Math.min(start + GitRank.itemsPerPage, manifest.total);
+      for (let page = Math.floor(start / manifest.page_size) + 1; start < end && page <= Math.ceil(end / manifest.page_size); page++) {
+        GitRank.fetchPage(page).catch(() => {});
+      }
+    },
+
     /**
      * Fetches data for the specified ranking type.
      * @param {string} type The ranking type (e.g., 'daily_trending').
@@ -139,28 +277,42 @@ document.addEventListener('DOMContentLoaded', () => {
       GitRank.currentPage = 1;
       const dataUrl = `./data/${type}.json`;
 
+      GitRank.pagedManifest = null;
+      GitRank.pageCache = new Map();
+      GitRank.currentData = [];
+      GitRank.totalItems = 0;
+
       try {
-        const response = await fetch(dataUrl);
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const data = await response.json();
+        let meta;
+        // Prefer the pre-paginated shards so only the visible page is downloaded
+        const manifest = await GitRank.loadManifest(type);
+        if (manifest) {
+          GitRank.pagedManifest = manifest;
+          GitRank.totalItems = manifest.total;
+          meta = manifest.meta;
+        } else {
+          const data = await GitRank.loadRanking(type);
 
-        // Determine the correct data array key
-        const listData = data.top_repos || data.top_users || [];
-        GitRank.currentData = listData.map((item, index) => ({ ...item, rank: index + 1 }));
+          // Determine the correct data array key
+          const listData = data.top_repos || data.top_users || [];
+          GitRank.currentData = listData.map((item, index) => ({ ...item, rank: index + 1 }));
+          GitRank.totalItems = GitRank.currentData.length;
+          meta = data.meta;
+        }
 
         // Fetch update time separately
         GitRank.fetchUpdateTime();
 
         // Update GitHub user count
-        GitRank.updateGitHubUserCount(data.meta);
+        GitRank.updateGitHubUserCount(meta);
 
       } catch (error) {
         console.error('Error fetching data:', error);
         GitRank.elements.rankListContainer.innerHTML = 
           `<p>${GitRank.i18n('errorLoading', type, error.message, dataUrl)}</p>`;
         GitRank.currentData = [];
+        GitRank.pagedManifest = null;
+        GitRank.totalItems = 0;
         // Attempt to update user count to N/A on error
         GitRank.updateGitHubUserCount(null); 
         // Also clear update time on error
@@ -222,12 +374,9 @@ document.addEventListener('DOMContentLoaded', () => {
       } else {
         // Attempt to fetch from top_users_list.json only if count wasn't in the primary data's meta
         try {
-          const userCountResp = await fetch('./data/top_users_list.json');
-          if (userCountResp.ok) {
-            const userCountData = await userCountResp.json();
-            if (userCountData.meta && typeof userCountData.meta.user_total_count === 'number') {
-              count = userCountData.meta.user_total_count;
-            }
+          const userCountData = await GitRank.loadRanking('top_users_list');
+          if (userCountData.meta && typeof userCountData.meta.user_total_count === 'number') {
+            count = userCountData.meta.user_total_count;
           }
         } catch (userCountError) {
           console.warn('Could not fetch separate user count:', userCountError);
@@ -243,14 +392,27 @@ document.addEventListener('DOMContentLoaded', () => {
     /**
      * Renders the list of items based on current data and pagination.
      */
-    renderList() {
-      GitRank.elements.rankListContainer.innerHTML = ''; // Clear previous list
+    async renderList() {
+      const renderId = ++GitRank.renderId;
       const startIndex = (GitRank.currentPage - 1) * GitRank.itemsPerPage;
       const endIndex = startIndex + GitRank.itemsPerPage;
-      const itemsToDisplay = GitRank.currentData.slice(startIndex, endIndex);
+      let itemsToDisplay;
+      try {
+        itemsToDisplay = await GitRank.getItems(startIndex, endIndex);
+      } catch (error) {
+        console.error('Error fetching page:', error);
+        if (renderId === GitRank.renderId) {
+          GitRank.elements.rankListContainer.innerHTML =
+            `<p>${GitRank.i18n('errorLoading', GitRank.currentRankType, error.message, `./data/${GitRank.currentRankType}/`)}</p>`;
+        }
+        return;
+      }
+      // A newer render (page or ranking change) started while this one was loading
+      if (renderId !== GitRank.renderId) return;
+      GitRank.elements.rankListContainer.innerHTML = ''; // Clear previous list
 
       if (itemsToDisplay.length === 0) {
-        const message = GitRank.currentData.length > 0 ? GitRank.i18n('noItems') : GitRank.i18n('loading');
+        const message = GitRank.totalItems > 0 ? GitRank.i18n('noItems') : GitRank.i18n('loading');
         GitRank.elements.rankListContainer.innerHTML = `<p>${message}</p>`;
         return;
       }
@@ -266,6 +428,7 @@ document.addEventListener('DOMContentLoaded', () => {
       });
 
       GitRank.elements.rankListContainer.appendChild(listElement);
+      GitRank.prefetchNextPage();
     },
 
     /**
@@ -347,7 +510,7 @@ document.addEventListener('DOMContentLoaded', () => {
      */
     renderPagination() {
       GitRank.elements.paginationContainer.innerHTML = ''; // Clear previous pagination
-      const totalPages = Math.ceil(GitRank.currentData.length / GitRank.itemsPerPage);
+      const totalPages = Math.ceil(GitRank.totalItems / GitRank.itemsPerPage);
 
       if (totalPages <= 1) return; // No pagination needed
 
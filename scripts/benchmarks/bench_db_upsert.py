@@ -0,0 +1,87 @@
+"""Benchmark: bulk upsert vs. the previous per-row ORM path for save_repositories.
+
+Usage:
+    python scripts/benchmarks/bench_db_upsert.py [--sizes 1000 10000 100000] [--page-size 100]
+
+Rows are written in pages of ``--page-size`` (like the crawler does), twice:
+once into an empty database (inserts) and once more on top (updates).
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs log to the temp dir, not to the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", os.path.join(tempfile.gettempdir(), "codeLegend_bench.log"))
+
+from config import logger  # noqa: E402
+from utils.db_utils import save_repositories, session_scope  # noqa: E402
+from utils.models import Repository  # noqa: E402
+
+
+def save_repositories_orm(db_path, repos):
+    """The per-row SELECT + merge implementation that save_repositories replaced."""
+    with session_scope(db_path) as session:
+        for item in repos:
+            repo = session.query(Repository).filter_by(
+                databaseId=item.get('databaseId')).first()
+            if not repo:
+                repo = Repository(databaseId=item.get('databaseId'))
+            repo.id = item.get('id')
+            repo.name = item.get('name')
+            repo.url = item.get('url')
+            languages = item.get('languages', [])
+            repo.language = ' | '.join(languages) if languages else None
+            repo.description = item.get('description')
+            repo.accumulatedStars = item.get('accumulatedStars')
+            created_at_str = item.get('createdAt')
+            repo.createdAt = datetime.datetime.strptime(
+                created_at_str, '%Y-%m-%dT%H:%M:%SZ') if created_at_str else None
+            repo.updatedAt = datetime.datetime.now()
+            session.merge(repo)
+
+
+def make_repos(n, offset=0):
+    return [{
+        "databaseId": i + 1,
+        "id": f"R_{i + 1}",
+        "name": f"repo-{i + 1}",
+        "url": f"https://github.com/owner/repo-{i + 1}",
+        "accumulatedStars": 100000 - (i % 100000) + offset,
+        "description": "A synthetic repository used for benchmarking " * 2,
+        "createdAt": "2020-01-01T00:00:00Z",
+        "languages": ["Python", "C", "Shell"],
+    } for i in range(n)]
+
+
+def run(save_func, db_path, repos, page_size):
+    start = time.perf_counter()
+    for i in range(0, len(repos), page_size):
+        save_func(db_path, repos[i:i + page_size])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+    logger.setLevel("WARNING")  # the save functions log one line per page
+
+    print(f"{'rows':>8} {'path':>6} {'insert rows/s':>14} {'update rows/s':>14}")
+    for size in args.sizes:
+        repos = make_repos(size)
+        updated = make_repos(size, offset=1)
+        for label, func in (("orm", save_repositories_orm), ("bulk", save_repositories)):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "bench.db")
+                insert_s = run(func, db_path, repos, args.page_size)
+                update_s = run(func, db_path, updated, args.page_size)
+            print(f"{size:>8} {label:>6} {size / insert_s:>14,.0f} {size / update_s:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: pooled GitHubClient vs. the previous sessionless requests.request path.
+
+Usage:
+    python scripts/benchmarks/bench_github_client.py [--requests 200] [--workers 4] [--latency 0.02] [--tls] [--page-size 100]
+
+Both clients fetch the same repo search pages from a local FakeGraphQLServer,
+from ``--workers`` threads. Over plain local HTTP this only shows the cost of
+opening a TCP connection per request; ``--tls`` adds the TLS handshake that
+every new connection to api.github.com pays (plus the network round trips,
+which a local server does not have).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs log to the temp dir, not to the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", os.path.join(tempfile.gettempdir(), "codeLegend_bench.log"))
+
+import requests  # noqa: E402
+
+from config import logger  # noqa: E402
+from fake_graphql_server import FakeGraphQLServer  # noqa: E402
+from fetch_github_main import GET_TOP_REPOS_QUERY  # noqa: E402
+from utils.github_client import GitHubClient  # noqa: E402
+
+
+def _variables(i, page_size):
+    return {"queryString": "stars:>1 sort:stars-desc", "number_of_repos": page_size,
+            "cursor": str(i * page_size % 900)}
+
+
+def fetch_sessionless(base_url, variables):
+    """The per-request requests.request call that GitHubClient replaced."""
+    response = requests.request("POST", f"{base_url}/graphql",
+                                json={"query": GET_TOP_REPOS_QUERY, "operationName": "getToprepos",
+                                      "variables": variables},
+                                headers={"Content-Type": "application/json"})
+    response.raise_for_status()
+    return len(response.content)
+
+
+def run(label, func, n, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(func, range(n)))
+    elapsed = time.perf_counter() - start
+    logger.info(f"{label:<12} {n} requests in {elapsed:.3f}s ({n / elapsed:.1f} req/s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="Server-side delay per request (s)")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a self-signed certificate")
+    parser.add_argument("--page-size", type=int, default=100,
+                        help="Repos per page; small pages isolate the per-connection cost")
+    args = parser.parse_args()
+
+    with FakeGraphQLServer(latency=args.latency, tls=args.tls) as server:
+        if server.cert_file:
+            os.environ["REQUESTS_CA_BUNDLE"] = server.cert_file
+        run("sessionless", lambda i: fetch_sessionless(server.base_url, _variables(i, args.page_size)),
+            args.requests, args.workers)
+        client = GitHubClient(server.base_url, headers={"Content-Type": "application/json"},
+                              pool_size=args.workers)
+        try:
+            run("GitHubClient",
+                lambda i: client.graphql(GET_TOP_REPOS_QUERY, "getToprepos", _variables(i, args.page_size)),
+                args.requests, args.workers)
+            logger.info(f"GitHubClient stats: {client.stats()}")
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
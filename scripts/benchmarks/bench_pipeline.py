@@ -0,0 +1,107 @@
+"""Benchmark: the full run_pipeline against the local replay server at several scales.
+
+Usage:
+    python scripts/benchmarks/bench_pipeline.py [--scales 1000 10000 100000] [--latency 0.05]
+        [--requests-per-second 50] [--failure-rate 0.02] [--max-page-size 50] [--cassette crawl.jsonl]
+
+For every scale, ``scale`` repos and ``scale`` users are crawled from a
+FakeGraphQLServer into a fresh temporary data/db directory, then the star
+deltas, rankings and archive steps run on them exactly as in a daily run.
+Record a cassette with ``python scripts/fetch_github_main.py --record crawl.jsonl``
+to replay real cursor chains, rate-limit headers and 502s; requests that are
+not in the cassette get synthetic responses.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs log to the temp dir, not to the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", os.path.join(tempfile.gettempdir(), "codeLegend_bench.log"))
+
+import config  # noqa: E402
+from config import logger  # noqa: E402
+from fake_graphql_server import FakeGraphQLServer  # noqa: E402
+import fetch_github_main  # noqa: E402
+from utils.db_utils import dispose_engines  # noqa: E402
+from utils.github_client import GitHubClient  # noqa: E402
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+
+def use_temp_dirs(root):
+    """Points every data and db path of config at a fresh directory."""
+    config.DATA_DIR = os.path.join(root, "data")
+    config.ARCHIVE_DIR = os.path.join(config.DATA_DIR, "archive")
+    config.SQLITE_DB_DIR = config.DB_DIR = os.path.join(root, "db")
+    config.USERS_SQLITE_DB_PATH = os.path.join(config.SQLITE_DB_DIR, "users.db")
+    config.REPOS_SQLITE_DB_PATH = os.path.join(config.SQLITE_DB_DIR, "repos.db")
+    config.GITHUB_DB_INFO_PATH = os.path.join(config.SQLITE_DB_DIR, "github_info.db")
+    config.STAR_HISTORY_DB_PATH = os.path.join(config.SQLITE_DB_DIR, "star_history.db")
+    config.SQLITE_DB_PATHS = [config.USERS_SQLITE_DB_PATH, config.REPOS_SQLITE_DB_PATH,
+                              config.GITHUB_DB_INFO_PATH, config.STAR_HISTORY_DB_PATH]
+    os.makedirs(config.SQLITE_DB_DIR, exist_ok=True)
+
+
+def bench_scale(scale, args):
+    root = tempfile.mkdtemp(prefix=f"bench_pipeline_{scale}_")
+    use_temp_dirs(root)
+    config.MAX_REPOS = config.MAX_USERS = scale
+    config.TOP_USERS_LIMIT = scale
+    try:
+        with FakeGraphQLServer(latency=args.latency, total=scale, cassette=args.cassette,
+                               rate_limit=args.rate_limit, rate_limit_window=args.rate_limit_window,
+                               failure_rate=args.failure_rate, max_page_size=args.max_page_size) as server:
+            limiter = RateLimiter(requests_per_second=args.requests_per_second,
+                                  burst=max(config.RATE_LIMIT_BURST, int(args.requests_per_second)),
+                                  reserve_points=config.RATE_LIMIT_RESERVE_POINTS)
+            client = GitHubClient(server.base_url, headers={"Content-Type": "application/json"},
+                                  rate_limiter=limiter, pool_size=config.HTTP_POOL_SIZE,
+                                  connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+                                  read_timeout=config.HTTP_READ_TIMEOUT,
+                                  retry_after=config.RATE_LIMIT_RETRY_AFTER)
+            fetch_github_main.rate_limiter = limiter
+            fetch_github_main.github_client = client
+            start = time.perf_counter()
+            ok = fetch_github_main.run_pipeline(profile=args.profile,
+                                                trace_memory=args.trace_memory) == fetch_github_main.EXIT_OK
+            elapsed = time.perf_counter() - start
+            client.close()
+            with open(os.path.join(config.DATA_DIR, config.RUN_METRICS_FILENAME), encoding="utf-8") as f:
+                for step in json.load(f)["steps"]:
+                    counters = " ".join(f"{key}={value}" for key, value in step["counters"].items() if value)
+                    logger.info(f"  {step['step']:<22} wall={step['wall_seconds']:>7.2f}s "
+                                f"cpu={step['cpu_seconds']:>7.2f}s {counters}")
+        dispose_engines()
+        logger.info(f"scale={scale:>7} ok={ok} pipeline={elapsed:.1f}s requests={server.requests} "
+                    f"({server.requests / elapsed:.1f} req/s) replayed={server.replayed} "
+                    f"injected_failures={server.failures} client={client.stats()}")
+        return elapsed
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.05, help="Server-side delay per request (s)")
+    parser.add_argument("--requests-per-second", type=float, default=50.0,
+                        help="Local token-bucket rate (the production default is much lower)")
+    parser.add_argument("--rate-limit", type=int, default=10 ** 7,
+                        help="Server points per window; 5000 paces the crawl to GitHub's real hourly budget")
+    parser.add_argument("--rate-limit-window", type=float, default=3600, help="Server window length (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected 502")
+    parser.add_argument("--max-page-size", type=int, default=None, help="Search pages above this get a 502")
+    parser.add_argument("--cassette", help="JSON Lines file recorded with fetch_github_main.py --record")
+    parser.add_argument("--profile", action="store_true", help="cProfile every pipeline step")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc every pipeline step")
+    args = parser.parse_args()
+    for scale in args.scales:
+        bench_scale(scale, args)
+
+
+if __name__ == "__main__":
+    main()
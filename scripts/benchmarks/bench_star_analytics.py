@@ -0,0 +1,86 @@
+"""Benchmark: star velocity / acceleration / breakout rankings over a synthetic star history.
+
+Usage:
+    python scripts/benchmarks/bench_star_analytics.py [--repos 20000] [--days 365] [--gap-rate 0.1]
+
+Fills a temporary star history db with ``--repos`` repos x ``--days`` daily
+snapshots (``--gap-rate`` of the days are missing, as when a run fails), then
+times loading the series, interpolating the gaps and computing every
+configured window.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs log to the temp dir, not to the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", os.path.join(tempfile.gettempdir(), "codeLegend_bench.log"))
+
+import numpy as np  # noqa: E402
+
+import config  # noqa: E402
+from config import logger  # noqa: E402
+from utils.db_utils import dispose_engines, save_star_snapshot  # noqa: E402
+from utils.star_analytics import (date_to_day, interpolate_gaps, load_star_series,  # noqa: E402
+                                  star_velocity_rankings, window_metrics)
+
+
+def fill_history(db_path, repos, days, gap_rate, seed=0):
+    """Writes random-walk star counts; returns today's {databaseId: stars}."""
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(0.5, 20, repos)
+    stars = rng.integers(100, 100000, repos).astype(np.float64)
+    ids = np.arange(1, repos + 1).tolist()
+    today = datetime.date.today()
+    for offset in range(days, 0, -1):
+        stars += rng.poisson(rates)
+        if rng.random() >= gap_rate:
+            day = date_to_day(today - datetime.timedelta(days=offset))
+            save_star_snapshot(db_path, day, dict(zip(ids, stars.astype(np.int64).tolist())))
+    stars += rng.poisson(rates)
+    return dict(zip(ids, stars.astype(np.int64).tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--gap-rate", type=float, default=0.1, help="Fraction of days without a snapshot")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_star_analytics_")
+    db_path = os.path.join(root, "star_history.db")
+    try:
+        start = time.perf_counter()
+        current = fill_history(db_path, args.repos, args.days, args.gap_rate)
+        logger.info(f"Wrote {args.repos} repos x {args.days} days in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        series = load_star_series(db_path, args.days + 1, current=current)
+        loaded = time.perf_counter()
+        series.stars = interpolate_gaps(series.stars, config.STAR_HISTORY_MAX_GAP_DAYS)
+        interpolated = time.perf_counter()
+        windows = sorted(set(config.STAR_VELOCITY_WINDOWS) | {1, 7, 30})
+        for window in windows:
+            window_metrics(series, window, config.BREAKOUT_BASELINE_DAYS)
+        computed = time.perf_counter()
+        logger.info(f"load={loaded - start:.2f}s interpolate={interpolated - loaded:.2f}s "
+                    f"metrics({windows})={computed - interpolated:.2f}s")
+
+        start = time.perf_counter()
+        rankings = star_velocity_rankings(db_path, current, config.STAR_VELOCITY_WINDOWS,
+                                          config.BREAKOUT_BASELINE_DAYS, config.STAR_VELOCITY_LIMIT,
+                                          max_gap=config.STAR_HISTORY_MAX_GAP_DAYS,
+                                          breakout_window=config.BREAKOUT_WINDOW_DAYS)
+        logger.info(f"star_velocity_rankings: {sorted(rankings)} in {time.perf_counter() - start:.2f}s")
+    finally:
+        dispose_engines()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
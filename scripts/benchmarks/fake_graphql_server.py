@@ -0,0 +1,281 @@
+"""A local stand-in for the GitHub GraphQL endpoint, for offline benchmarks.
+
+It answers search pages (``first`` / ``after``), count queries and aliased
+``nodes(ids:)`` lookups, sends rate-limit headers and gzips the body when
+asked to. Requests are served from two sources:
+
+* a cassette recorded with ``fetch_github_main.py --record PATH``: matching
+  requests (same operation and variables) get the recorded responses in the
+  recorded order, including 502s and rate-limit headers;
+* synthetic data for everything else. ``total`` repos and users are ranked so
+  that entity ``n`` has ``SYNTHETIC_TOP // (n + 1)`` stars/followers, and the
+  ``stars:a..b`` / ``followers:a..b`` qualifiers are honoured, so the shard
+  planner and the crawlers behave as they would against GitHub at any scale.
+
+Latency, a points budget per rate-limit window and failure injection (random
+502s, 502s for pages larger than ``max_page_size``) are configurable. With
+``tls=True`` it serves HTTPS with a throwaway self-signed certificate (needs
+the ``openssl`` CLI), so connection reuse saves a real TLS handshake; point
+``REQUESTS_CA_BUNDLE`` at ``server.cert_file``. Use it as a context manager:
+
+    with FakeGraphQLServer(latency=0.05, cassette="crawl.jsonl") as server:
+        client = GitHubClient(server.base_url)
+"""
+import base64
+import binascii
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs log to the temp dir, not to the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", os.path.join(tempfile.gettempdir(), "codeLegend_bench.log"))
+
+from utils.graphql_recorder import exchange_key, load_cassette  # noqa: E402
+
+SYNTHETIC_TOP = 10 ** 9 # stars/followers of the top-ranked synthetic entity
+_ALIAS_RE = re.compile(r"(b\d+): nodes\(ids: \$(ids\d+)\)")
+_LEGACY_ID_RE = re.compile(rb"(?:Repository|User)(\d+)$")
+_QUALIFIER_RE = re.compile(r"(?:stars|followers):(>=)?(\d+)(?:\.\.(\d+))?")
+
+
+def _database_id(node_id):
+    """Recovers the databaseId from a synthetic (R_123) or legacy (base64 "04:User123") node id."""
+    try:
+        return int(node_id.split("_")[-1])
+    except ValueError:
+        pass
+    try:
+        match = _LEGACY_ID_RE.search(base64.b64decode(node_id))
+    except (binascii.Error, ValueError):
+        match = None
+    return int(match.group(1)) if match else zlib.crc32(node_id.encode())
+
+
+def _repo_node(n):
+    return {
+        "databaseId": n, "id": f"R_{n}", "name": f"repo-{n}", "url": f"https://github.com/o/repo-{n}",
+        "languages": {"nodes": [{"name": "Python"}]}, "stargazerCount": SYNTHETIC_TOP // (n + 1),
+        "description": "A synthetic repository " * 4, "createdAt": "2020-01-01T00:00:00Z",
+    }
+
+
+def _user_node(n):
+    return {
+        "databaseId": n, "id": f"U_{n}", "login": f"user-{n}", "name": f"User {n}", "location": None,
+        "url": f"https://github.com/user-{n}", "avatarUrl": f"https://avatars.githubusercontent.com/u/{n}",
+        "followers": {"totalCount": SYNTHETIC_TOP // (n + 1)},
+        "topRepositories": {"nodes": [{"stargazerCount": 100 - i} for i in range(10)]},
+        "contributionsCollection": {
+            "totalCommitContributions": n % 37, "totalIssueContributions": n % 5,
+            "totalPullRequestContributions": n % 7, "totalPullRequestReviewContributions": n % 3,
+            "restrictedContributionsCount": 0,
+        },
+    }
+
+
+def _rank_range(query_string, total):
+    """Returns the [first, last] ranks matched by a stars:/followers: qualifier.
+
+    Values fall with rank (SYNTHETIC_TOP // (n + 1)), so a value window maps to
+    one contiguous rank window; ``created:`` qualifiers are ignored.
+    """
+    match = _QUALIFIER_RE.search(query_string or "")
+    if not match:
+        return 0, total - 1
+    low = max(int(match.group(2)), 1)
+    high = low if match.group(1) is None and match.group(3) is None else None
+    if match.group(3) is not None:
+        high = int(match.group(3))
+    first = 0 if high is None else SYNTHETIC_TOP // (high + 1)
+    last = min(SYNTHETIC_TOP // low - 1, total - 1)
+    return first, last
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+    disable_nagle_algorithm = True # headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers):
+        body = json.dumps(body).encode() if not isinstance(body, str) else body.encode()
+        self.send_response(status)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server.owner
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(server.latency)
+        operation_name = payload.get("operationName")
+        variables = payload.get("variables") or {}
+
+        replayed = server.next_recorded(operation_name, variables)
+        if replayed is not None:
+            if replayed.get("error"):
+                # A recorded network error: drop the connection without answering
+                self.close_connection = True
+                return
+            self._send(replayed["status"] or 502, replayed["body"], replayed["headers"])
+            return
+
+        remaining, reset_at = server.spend(1)
+        headers = {"X-RateLimit-Limit": server.rate_limit, "X-RateLimit-Remaining": max(remaining, 0),
+                   "X-RateLimit-Reset": int(reset_at)}
+        if remaining < 0:
+            headers["Retry-After"] = max(int(reset_at - time.time()) + 1, 1)
+            self._send(429, {"message": "API rate limit exceeded"}, headers)
+            return
+        first = variables.get("number_of_repos") or variables.get("number_of_users")
+        if server.should_fail(first):
+            self._send(502, "Bad Gateway", headers)
+            return
+        self._send(200, {"data": server.synthetic_data(payload["query"], variables, remaining, reset_at)}, headers)
+
+
+class FakeGraphQLServer:
+    """Replays recorded GraphQL exchanges, or synthesises them, on 127.0.0.1 from a background thread."""
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 total: int = 1000,
+                 tls: bool = False,
+                 cassette: Optional[str] = None,
+                 rate_limit: int = 5000,
+                 rate_limit_window: float = 3600,
+                 failure_rate: float = 0.0,
+                 max_page_size: Optional[int] = None,
+                 seed: int = 0):
+        """
+        Args:
+            latency (float): Seconds to wait before answering each request.
+            total (int): Number of synthetic repos and users a search can return.
+            tls (bool): Serve HTTPS with a temporary self-signed certificate.
+            cassette (Optional[str]): JSON Lines file recorded with ``--record`` to replay.
+            rate_limit (int): Points per rate-limit window; exhausting them returns 429.
+            rate_limit_window (float): Length of a rate-limit window in seconds.
+            failure_rate (float): Probability that a synthetic response is a 502.
+            max_page_size (Optional[int]): Search pages larger than this always get a 502.
+            seed (int): Seed for the failure injection.
+        """
+        self.latency = latency
+        self.total = total
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.failure_rate = failure_rate
+        self.max_page_size = max_page_size
+        self.requests = 0
+        self.replayed = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._remaining = rate_limit
+        self._reset_at = time.time() + rate_limit_window
+        self._cassette = load_cassette(cassette) if cassette else {}
+        self._positions = {}
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.tls = tls
+        self._cert_dir = None
+        self.cert_file = None
+        if tls:
+            self._cert_dir = tempfile.mkdtemp(prefix="fake_graphql_")
+            self.cert_file = os.path.join(self._cert_dir, "cert.pem")
+            key_file = os.path.join(self._cert_dir, "key.pem")
+            subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                            "-keyout", key_file, "-out", self.cert_file],
+                           check=True, capture_output=True)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.cert_file, key_file)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def next_recorded(self, operation_name, variables):
+        """Returns the next recorded exchange for this request (the last one repeats), or None."""
+        with self._lock:
+            self.requests += 1
+            exchanges = self._cassette.get(exchange_key(operation_name, variables))
+            if not exchanges:
+                return None
+            key = exchanges[0]["key"]
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.replayed += 1
+            return exchanges[min(position, len(exchanges) - 1)]
+
+    def spend(self, points):
+        """Spends points of the current window; returns (remaining, reset_at)."""
+        with self._lock:
+            now = time.time()
+            if now >= self._reset_at:
+                self._remaining = self.rate_limit
+                self._reset_at = now + self.rate_limit_window
+            self._remaining -= points
+            return self._remaining, self._reset_at
+
+    def should_fail(self, page_size):
+        """Whether to inject a 502 for this request."""
+        with self._lock:
+            fail = ((self.max_page_size is not None and page_size is not None and page_size > self.max_page_size)
+                    or self._random.random() < self.failure_rate)
+            self.failures += fail
+            return fail
+
+    def synthetic_data(self, query, variables, remaining, reset_at):
+        """Builds the ``data`` object of a synthetic response."""
+        data = {"rateLimit": {"cost": 1, "remaining": max(remaining, 0),
+                              "resetAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(reset_at))}}
+        users = "type: USER" in query or variables.get("type") == "USER" or "... on User" in query
+        make = _user_node if users else _repo_node
+        if "search(" in query:
+            first_rank, last_rank = _rank_range(variables.get("queryString"), self.total)
+            count = max(0, last_rank - first_rank + 1)
+            data["search"] = {"repositoryCount": count, "userCount": count}
+            if "edges" in query:
+                page = variables.get("number_of_repos") or variables.get("number_of_users") or 1
+                offset = int(variables.get("cursor") or 0)
+                end = min(offset + page, count)
+                data["search"]["edges"] = [{"cursor": str(i + 1), "node": make(first_rank + i)}
+                                           for i in range(offset, end)]
+        for alias, variable in _ALIAS_RE.findall(query):
+            data[alias] = [dict(make(_database_id(node_id)), id=node_id) for node_id in variables.get(variable, [])]
+        return data
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
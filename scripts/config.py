@@ -4,16 +4,17 @@ import logging
 import os
 
 # 配置日志记录
+# 日志文件路径，默认为项目根目录下的 codeLegend.log；CODELEGEND_LOG_FILE 为空字符串时只输出到控制台
+LOG_FILE = os.getenv(
+    "CODELEGEND_LOG_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'codeLegend.log')) # 项目根目录
+_log_handlers = [logging.StreamHandler()] # 输出到控制台
+if LOG_FILE:
+    _log_handlers.append(logging.FileHandler(LOG_FILE)) # 输出到文件
 logging.basicConfig(
     level=logging.INFO, # 日志级别
     format='%(asctime)s [codeLegend] %(levelname)s - %(message)s - [%(filename)s][%(lineno)d]', # 日志格式
-    handlers=[
-        logging.StreamHandler(), # 输出到控制台
-        logging.FileHandler( # 输出到文件
-            os.path.join(
-                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), # 项目根目录
-                'codeLegend.log')) # 日志文件名
-    ])
+    handlers=_log_handlers)
 logger = logging.getLogger(__name__) # 获取 logger 实例
 # --- 基础目录 --- 
 # 计算 BASE_DIR 相对于此配置文件位置 (scripts/config.py)
@@ -27,10 +28,20 @@ SQLITE_DB_DIR = os.path.join(BASE_DIR, "db") # SQLite 数据库文件存储目
 USERS_SQLITE_DB_PATH = os.path.join(SQLITE_DB_DIR, "sqlite/users.db") # 用户信息数据库路径
 REPOS_SQLITE_DB_PATH = os.path.join(SQLITE_DB_DIR, "sqlite/repos.db") # 仓库信息数据库路径
 GITHUB_DB_INFO_PATH = os.path.join(SQLITE_DB_DIR, "sqlite/github_info.db") # GitHub 信息数据库路径
+STAR_HISTORY_DB_PATH = os.path.join(SQLITE_DB_DIR, "sqlite/star_history.db") # 每日 Star 数历史数据库路径
 SQLITE_DB_PATHS = [ # 所有 SQLite 数据库路径列表
-    USERS_SQLITE_DB_PATH, REPOS_SQLITE_DB_PATH, GITHUB_DB_INFO_PATH
+    USERS_SQLITE_DB_PATH, REPOS_SQLITE_DB_PATH, GITHUB_DB_INFO_PATH,
+    STAR_HISTORY_DB_PATH
 ]
 DB_DIR = SQLITE_DB_DIR # 数据库目录 (与 SQLITE_DB_DIR 相同)
+SQLITE_POOL_SIZE = 5 # 每个数据库引擎的连接池大小
+SQLITE_BUSY_TIMEOUT = 30 # 数据库被锁定时的等待时间 (秒)
+SQLITE_PRAGMAS = { # 每个新连接上设置的 PRAGMA
+    "journal_mode": "WAL", # 读写并发，减少 fsync
+    "synchronous": "NORMAL", # WAL 模式下安全且更快
+    "mmap_size": 268435456, # 256MB 内存映射读取
+    "cache_size": -65536, # 64MB 页缓存 (负数单位为 KiB)
+}
 
 # --- GitHub API --- 
 GITHUB_TOKEN = os.getenv("GH_TOKEN") # 从环境变量获取 GitHub Token
@@ -48,16 +59,20 @@ HEADERS = { # API 请求头
     "Content-Type": "application/json"
 }
 
-API_BASE_URL = "https://api.github.com" # GitHub API 基础 URL
+API_BASE_URL = os.getenv("GITHUB_API_URL", "https://api.github.com") # GitHub API 基础 URL (可指向本地回放服务器)
 # 默认请求参数 (可在函数调用中覆盖)
 DEFAULT_PER_PAGE = 100 # 每页默认记录数
 DEFAULT_PAGES = 2 # 默认请求页数
 DEFAULT_TIMEOUT = 60  # 默认请求超时时间 (秒)
 USER_DETAILS_TIMEOUT = 30  # 获取用户详情的超时时间 (秒)
+HTTP_CONNECT_TIMEOUT = 10 # 建立连接的超时时间 (秒)
+HTTP_READ_TIMEOUT = DEFAULT_TIMEOUT # 等待响应数据的超时时间 (秒)
+HTTP_POOL_SIZE = 10 # HTTP 连接池大小 (keep-alive 连接数)，应不小于并发抓取线程数
+HTTP_ACCEPT_ENCODING = "gzip, deflate" # 请求压缩传输的响应
 
 # --- API 搜索查询/参数 --- 
-# 趋势仓库查询模板，'since' 日期将在代码中格式化
-TRENDING_REPO_QUERY_TEMPLATE = "created:>{since}" # 趋势仓库查询模板
+# 新建仓库计数查询模板，'day' (YYYY-MM-DD) 和 'language' 将在代码中格式化
+NEW_REPOS_QUERY_TEMPLATE = 'created:{day} language:"{language}"' # 语言榜单每天每种语言的新建仓库数查询
 TOP_REPO_QUERY = "stars:>1" # 热门仓库查询条件 (Star 数大于 1)
 TOP_USER_QUERY = "followers:>1000" # 热门用户查询条件 (粉丝数大于 1000)
 REPO_SORT_STARS = "stars" # 仓库排序字段：Star 数
@@ -77,22 +92,44 @@ ORI_TOP_REPOS_FILENAME = "original_top_repos.json" # 原始热门仓库数据文
 TOP_REPOS_FILENAME = "top_repos_list.json" # 处理后的热门仓库列表文件名
 ORI_TOP_USERS_FILENAME = "original_top_users_list.json" # 原始热门用户数据文件名
 TOP_USERS_FILENAME = "top_users_list.json" # 处理后的热门用户列表文件名
-ARCHIVE_INDEX_FILENAME = "archive_index.json" # 归档索引文件名
+ARCHIVE_INDEX_FILENAME = "archive_index.json" # 归档索引文件名 (列出各月索引分片)
+ARCHIVE_INDEX_DIRNAME = "index" # 归档目录下按月分片的索引目录 (archive/index/YYYY-MM.json)
 UPDATE_TIME_FILENAME = "update_time.txt" # 更新时间记录文件名
 
 
 
 # --- 数据库 --- 
 
-# 从 GitHub API 获取数据 | GitHub API 限制为 1000 条
+# 从 GitHub API 获取数据 | GitHub API 单个搜索限制为 1000 条，超出部分通过分片抓取
 DEFAULT_QUERY_LIMIT = 1000 # 默认查询限制
 MAX_USERS = 500 # 最大用户数
 MAX_REPOS = 1000 # 最大仓库数 (-1 表示无限制)
 USER_TOP_REPOSITORIES_COUNT = 10 # 每个用户获取其 Top 仓库的数量
-REPOS_ONE_TIME = 100 # 每次请求获取的仓库数量 (`first` 参数限制为 100)
-USERS_ONE_TIME = 20 # 每次请求获取的用户数量
-
-WAIT_TIME_PER_REQUEST = 5 # 请求之间的等待时间 (秒)
+REPOS_ONE_TIME = 100 # 每次请求获取的仓库数量的初始值 (`first` 参数限制为 100)
+USERS_ONE_TIME = 20 # 每次请求获取的用户数量的初始值
+# 搜索分页大小自适应：502/超时减半，响应快且便宜时逐步放大
+ADAPTIVE_PAGE_MIN_SIZE = 5 # 最小页大小
+ADAPTIVE_PAGE_MAX_SIZE = 100 # 最大页大小 (`first` 参数限制为 100)
+ADAPTIVE_PAGE_FAST_SECONDS = 2.0 # 响应耗时不超过该值 (秒) 时视为快速响应，可以放大页大小
+ADAPTIVE_PAGE_SLOW_SECONDS = 8.0 # 响应耗时超过该值 (秒) 时缩小页大小
+ADAPTIVE_PAGE_MAX_COST = 10 # 单页允许消耗的最大 GraphQL 点数
+# 搜索结果超过 1000 条时按 stars:a..b / followers:a..b 窗口分片抓取
+REPO_SHARD_MIN_STARS = 1 # 仓库分片的最小 Star 数 (对应 stars:>0)
+USER_SHARD_MIN_FOLLOWERS = 1 # 用户分片的最小粉丝数 (对应 followers:>0)
+# 两级刷新：搜索只返回计数，完整元数据 (描述、语言、头像等) 只为新条目和轮换到期的条目获取
+METADATA_REFRESH_DAYS = 7 # 元数据轮换刷新周期 (天)，每次运行刷新约 1/N 的已有条目
+NODES_BATCH_SIZE = 100 # 每个 nodes(ids:) 字段的节点数 (GitHub 上限为 100)，也是探测批次的大小
+NODES_MAX_ALIASES = 10 # 单个查询最多合并的带别名 nodes(ids:) 字段数
+NODES_MAX_QUERY_COST = 20 # 按 id 批量查询时单个查询允许的最大点数，批次大小据此自适应
+REFRESH_STALE_COUNTS = True # 通过 nodes(ids:) 刷新本次搜索未覆盖的已有条目的计数
+
+# --- 并发抓取与限流 --- 
+FETCH_MAX_WORKERS = 4 # 并发抓取线程数
+PIPELINE_MAX_WORKERS = 2 # 同时执行的管道步骤数 (仓库和用户两条分支)
+RATE_LIMIT_REQUESTS_PER_SECOND = 2.0 # 本地令牌桶的最大请求速率 (次/秒)
+RATE_LIMIT_BURST = 4 # 令牌桶容量 (允许的最大突发请求数)
+RATE_LIMIT_RESERVE_POINTS = 50 # 保留的 GraphQL 点数，低于该值时等待限流重置
+RATE_LIMIT_RETRY_AFTER = 60 # 429/二级限流且未返回 Retry-After 时的等待时间 (秒)
 
 # --- GitHub API 速率限制 --- 
 # "https://docs.github.com/rest/overview/resources-in-the-rest-api#rate-limiting"
@@ -106,9 +143,63 @@ TOP_REPOS_LIMIT = -1 # 热门仓库数量限制 (-1 表示全部)
 TOP_USERS_LIMIT = 1000 # 热门用户数量限制
 TRENDING_REPO_LIMIT = 500 # 趋势仓库数量限制
 
+# --- Star 时间序列分析 ---
+STAR_VELOCITY_WINDOWS = [3, 14, 90] # 生成速度榜单的窗口天数 (velocity_{N}d.json)
+STAR_VELOCITY_LIMIT = 100 # 每个速度 / breakout 榜单的仓库数量
+STAR_VELOCITY_FILENAME = "velocity_{days}d.json" # 速度榜单文件名模板
+BREAKOUT_WINDOW_DAYS = 7 # breakout 榜单的窗口天数 (None 表示不生成)
+BREAKOUT_BASELINE_DAYS = 90 # breakout 分数的基线天数 (紧接在窗口之前)
+BREAKOUT_FILENAME = "breakout_{days}d.json" # breakout 榜单文件名模板
+STAR_HISTORY_MAX_GAP_DAYS = 14 # 缺失快照时允许线性插值的最大连续天数
+
+# --- 语言榜单 ---
+LANGUAGE_ROLLUP_DAYS = 30 # 每月最热语言榜单统计的天数
+LANGUAGE_SEARCH_LIMIT = 100 # 统计新建仓库数的语言数量 (抓取到的仓库中仓库数最多的语言)，每种语言每天一次计数查询
+LANGUAGE_CATCHUP_DAYS = 3 # 最多补统计最近几天缺失的新建仓库数 (管道中断或查询失败时)
+LANGUAGE_LEADERBOARD_LIMIT = 50 # 语言榜单的语言数量
+LANGUAGES_FILENAME = "languages_{days}d.json" # 语言榜单文件名模板
+
+# --- 最活跃用户榜单 ---
+# 每次运行通过 contributionsCollection(from:, to:) 抓取候选用户前一天 (UTC) 的贡献数并保存，
+# 多天榜单由已保存的每日记录求和得到
+CONTRIBUTION_CANDIDATES = 1000 # 候选用户数 (粉丝数最多的用户)
+CONTRIBUTION_WINDOWS = [1, 7, 30] # 生成最活跃用户榜单的窗口天数 (top_committers_{N}d.json)
+CONTRIBUTION_CATCHUP_DAYS = 3 # 最多补抓最近几天缺失的贡献记录 (管道中断或批次失败时)
+CONTRIBUTION_HISTORY_DAYS = 90 # 贡献记录的保留天数
+CONTRIBUTIONS_BATCH_SIZE = 50 # 每个查询的用户数 (contributionsCollection 的服务端开销较大，批次不宜过大)
+TOP_COMMITTERS_LIMIT = 100 # 每个最活跃用户榜单的用户数量
+TOP_COMMITTERS_FILENAME = "top_committers_{days}d.json" # 最活跃用户榜单文件名模板
+
+# --- 发布格式 --- 
+PUBLISH_COMPACT_JSON = True # 输出无缩进的紧凑 JSON
+PUBLISH_COMPRESSED_FORMATS = ["gz"] # 为榜单 JSON 生成的预压缩副本 ("gz" 由前端加载；"br" 需要安装 brotli，且只在托管服务按 Accept-Encoding 提供时才有用)
+PUBLISH_BROTLI_QUALITY = 5 # 生成 .br 副本时的 brotli 压缩等级 (11 最慢)
+PUBLISH_COLUMNAR = False # 额外生成列式榜单文件 (*.columnar.json)；前端只在没有分页清单时才加载，开启分页时无需生成
+PUBLISH_PAGE_SIZE = 100 # 榜单分页文件每页的记录数 ({name}/page-0001.json)，0 表示不分页
+
+# --- 运行指标 ---
+RUN_METRICS_FILENAME = "run_metrics.json" # 每次运行各步骤耗时和计数器的报告 (写入 DATA_DIR)
+PROFILE_DIR = os.path.join(BASE_DIR, "profiles") # --profile 生成的各步骤 .prof 文件目录
+METRICS_HISTORY_RUNS = 7 # 与最近多少次运行的步骤耗时比较
+METRICS_REGRESSION_FACTOR = 1.5 # 步骤耗时超过历史中位数的该倍数时记录警告
+
 # ARCHIVE_INDEX_FILENAME 在上面已定义
 ARCHIVE_FILES = [ # 需要归档的文件列表
     DAILY_TRENDING_FILENAME, WEEKLY_TRENDING_FILENAME,
     MONTHLY_TRENDING_FILENAME, TOP_REPOS_FILENAME, TOP_USERS_FILENAME,
     ORI_TOP_REPOS_FILENAME, ORI_TOP_USERS_FILENAME, UPDATE_TIME_FILENAME
 ]
+# 归档存储方式：
+#   "copy"     每天复制一份完整文件 (旧方式)
+#   "hardlink" 文件按内容哈希保存在 archive/blobs/，每天的目录中是指向 blob 的硬链接 (git 不保留硬链接)
+#   "manifest" 每天的目录中只有 manifest.json (记录文件名到 blob 的映射) 和 star 快照旁路文件
+ARCHIVE_STORAGE = "manifest"
+ARCHIVE_RECORD_DEDUP = True # manifest 方式下，榜单记录按内容哈希保存在 archive/records/，不变的记录只保存一次
+ARCHIVE_VOLATILE_FIELDS = [ # 记录级去重时不参与哈希、按列单独保存的字段 (每天都会变化)，记录的其余字段不变时哈希不变
+    "updatedAt", "metadataUpdatedAt",
+    "accumulatedStars", "accumulatedStars_1d", "accumulatedStars_7d", "accumulatedStars_30d",
+    "followersCount", "topRepositories_starsgazerCount",
+]
+ARCHIVE_COMPACT_KEEP_MONTHS = 2 # 保留按天目录的最近月数 (含当月)，更早的月份压缩为 archive/bundles/YYYY-MM.zip，0 表示不压缩
+ARCHIVE_STARS_SIDECAR = "stars.bin" # 每天归档目录中的 star 快照旁路文件 (升序 int64 databaseId + int32 star 数，可内存映射)
+STAR_SNAPSHOT_CACHE_BYTES = 32 * 1024 * 1024 # 进程内 LRU 缓存已载入的 star 快照的总字节数上限
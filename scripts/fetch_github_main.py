@@ -1,53 +1,192 @@
+import argparse
 import datetime
-from functools import wraps
+from functools import lru_cache, wraps
 import os
+import threading
 import time
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 
 
 # Import configuration
 import config
 import requests
 from config import logger
-from utils.archive_utils import (archive_data,
-                                 read_archived_top_repos_1d_before_today,
-                                 read_archived_top_repos_7d_before_today,
-                                 read_archived_top_repos_30d_before_today,
-                                 save_json, save_update_time)
+from utils.archive_utils import (JsonStreamWriter, archive_data,
+                                 backfill_star_history, build_star_sidecars,
+                                 compact_archive, dedup_archive,
+                                 get_bytes_written,
+                                 read_archived_stars_days_before,
+                                 rebuild_archive_index, record_star_history,
+                                 star_snapshot_cache_stats, verify_archive_index,
+                                 publish_json, save_update_time)
+from utils.adaptive_pager import AdaptivePager
+from utils.fetch_engine import FetchEngine
+from utils.github_client import GitHubClient
+from utils.graphql_recorder import GraphQLRecorder
+from utils.node_batcher import NODES_FIELD_LIMIT, NodeBatcher
+from utils.pipeline_dag import STATUS_OK, PipelineDAG, PipelineStep
+from utils.pipeline_metrics import PipelineMetrics, find_regressions
+from utils.rate_limiter import RateLimiter
+from utils.shard_planner import SEARCH_RESULT_CAP, SearchShard, ShardPlanner, shard_limits
+from utils.star_analytics import (date_to_day, interpolate_gaps, load_star_series,
+                                  star_velocity_rankings)
 # Import utility functions
-from utils.db_utils import (batch_update_accumulated_stars, get_repos_hot,
-                            get_repos_hot_order_by_range_day,
+from utils.db_utils import (bulk_update_star_deltas, dispose_engines,
+                            finish_crawl_run, get_engine_stats,
+                            get_latest_crawl_run, get_repo_rankings,
+                            get_top_contributor_users,
                             get_top_followergazer_count_users,
-                            get_total_count_by_datetime, save_repositories,
-                            save_users, update_total_count, init_db)
+                            get_node_ids, get_node_ids_by_database_ids,
+                            get_node_ids_for_metadata_refresh,
+                            get_node_ids_with_stale_counts,
+                            get_contribution_candidates,
+                            get_current_stars, get_language_new_repo_days,
+                            get_language_rankings, get_tracked_languages,
+                            get_latest_total_counts,
+                            get_recent_pipeline_step_metrics,
+                            get_repos_by_database_ids,
+                            iter_crawled_rows, prune_user_contributions,
+                            save_crawl_checkpoint, save_language_new_repos,
+                            save_pipeline_step_metrics,
+                            save_repositories,
+                            save_repository_counts, save_user_contributions,
+                            save_user_counts,
+                            save_users, start_crawl_run, update_language_rollup,
+                            update_total_count, init_db)
+from utils.models import Repository, User
 
 # --- Constants ---
 # Define a constant for the datetime format string
 DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
-
-GET_TOP_REPOS_QUERY = """
-query getToprepos($queryString: String!, $number_of_repos: Int, $cursor: String){
-  search(query:$queryString, type: REPOSITORY, first: $number_of_repos, after: $cursor) {
+# Exit codes: the CI workflow still commits and publishes on EXIT_PARTIAL, then fails the job
+EXIT_OK = 0
+EXIT_FAILED = 1  # nothing to publish
+EXIT_PARTIAL = 2  # some branches failed, the leaderboards of the others were generated
+
+# Shared by every request so concurrent crawls draw from one rate-limit budget
+rate_limiter = RateLimiter(requests_per_second=config.RATE_LIMIT_REQUESTS_PER_SECOND,
+                           burst=config.RATE_LIMIT_BURST,
+                           reserve_points=config.RATE_LIMIT_RESERVE_POINTS)
+# One pooled, keep-alive HTTP session for every request of the run
+github_client = GitHubClient(config.API_BASE_URL, headers=config.HEADERS, rate_limiter=rate_limiter,
+                             pool_size=config.HTTP_POOL_SIZE,
+                             connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+                             read_timeout=config.HTTP_READ_TIMEOUT,
+                             accept_encoding=config.HTTP_ACCEPT_ENCODING,
+                             retry_after=config.RATE_LIMIT_RETRY_AFTER)
+
+# Shard crawls run in parallel; serialize their page writes to each SQLite file
+_db_write_lock = threading.Lock()
+
+COUNT_SEARCH_QUERY = """
+query countSearch($queryString: String!, $type: SearchType!) {
+  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
+  search(query: $queryString, type: $type, first: 1) {
     repositoryCount
-    edges {
-			cursor
-      node {
+    userCount
+  }
+}
+"""
+
+# Search results only carry what changes daily (counts); the full metadata is
+# fetched by node id for new entities and on a slow rotation, see _refresh_nodes.
+REPO_COUNT_FIELDS = """
         ... on Repository {
-					databaseId
-					id
+          databaseId
+          id
+          stargazerCount
+        }
+"""
+
+REPO_METADATA_FIELDS = """
+        ... on Repository {
+          databaseId
+          id
           name
           url
-					languages (first: 3, orderBy: {field: SIZE,direction: DESC} ) {
-						nodes {
-							name
-						}
-					}
+          languages (first: 3, orderBy: {field: SIZE,direction: DESC} ) {
+            nodes {
+              name
+            }
+          }
           stargazerCount
-					description
-					createdAt
+          description
+          createdAt
+        }
+"""
+
+USER_COUNT_FIELDS = """
+        ... on User {
+          id
+          databaseId
+          followers {
+            totalCount
+          }
+          topRepositories(
+            first: $usertopRepositories_count
+            orderBy: { field: STARGAZERS, direction: DESC }
+          ) {
+            nodes {
+              stargazerCount
+            }
+          }
+        }
+"""
+
+USER_METADATA_FIELDS = """
+        ... on User {
+          id
+          databaseId
+          name
+          location
+          followers {
+            totalCount
+          }
+          login
+          url
+          avatarUrl
+          topRepositories(
+            first: $usertopRepositories_count
+            orderBy: { field: STARGAZERS, direction: DESC }
+          ) {
+            nodes {
+              stargazerCount
+            }
+          }
+        }
+"""
 
+# One UTC day of contributions per user; the daily counts are summed for longer windows
+USER_CONTRIBUTION_FIELDS = """
+        ... on User {
+          id
+          databaseId
+          contributionsCollection(from: $from, to: $to) {
+            totalCommitContributions
+            totalIssueContributions
+            totalPullRequestContributions
+            totalPullRequestReviewContributions
+            restrictedContributionsCount
+          }
         }
-      }
+"""
+
+GET_TOP_REPOS_QUERY = """
+query getToprepos($queryString: String!, $number_of_repos: Int, $cursor: String){
+  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
+  search(query:$queryString, type: REPOSITORY, first: $number_of_repos, after: $cursor) {
+    repositoryCount
+    edges {
+      cursor
+      node {""" + REPO_COUNT_FIELDS + """      }
     }
   }
 }
@@ -55,48 +194,57 @@ query getToprepos($queryString: String!, $number_of_repos: Int, $cursor: String)
 
 GET_TOP_USERS_QUERY = """
 query getTopUsers(
-	$queryString: String!
-	$number_of_users: Int!
-	$usertopRepositories_count: Int!,
-	$cursor: String
+  $queryString: String!
+  $number_of_users: Int!
+  $usertopRepositories_count: Int!,
+  $cursor: String
 ) {
-	search(
-		query: $queryString
-		type: USER
-		first: $number_of_users
-		after: $cursor
-		
-	) {
-		userCount
-		edges {
-			cursor
-			node {
-				... on User {
-					id
-					databaseId
-					name
-                    location
-					followers {
-						totalCount
-					}
-					login
-					url
-					avatarUrl
-					topRepositories(
-						first: $usertopRepositories_count
-						orderBy: { field: STARGAZERS, direction: DESC }
-					) {
-						nodes {
-							stargazerCount
-						}
-					}
-				}
-			}
-		}
-	}
+  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
+  search(
+    query: $queryString
+    type: USER
+    first: $number_of_users
+    after: $cursor
+  ) {
+    userCount
+    edges {
+      cursor
+      node {""" + USER_COUNT_FIELDS + """      }
+    }
+  }
 }
 """
 
+
+# nodes(ids:) lookups by operation name: (inline fragment, extra variable definitions)
+NODES_QUERIES = {
+    "getRepoCounts": (REPO_COUNT_FIELDS, ""),
+    "getRepoMetadata": (REPO_METADATA_FIELDS, ""),
+    "getUserCounts": (USER_COUNT_FIELDS, ", $usertopRepositories_count: Int!"),
+    "getUserMetadata": (USER_METADATA_FIELDS, ", $usertopRepositories_count: Int!"),
+    "getUserContributions": (USER_CONTRIBUTION_FIELDS, ", $from: DateTime!, $to: DateTime!"),
+}
+
+
+@lru_cache(maxsize=None)
+def _nodes_query(operation_name: str, aliases: int = 1) -> str:
+    """Builds a query with ``aliases`` aliased ``nodes(ids: $idsN)`` fields (b0, b1, ...).
+
+    Each field takes at most NODES_FIELD_LIMIT ids, so aliasing lets one request
+    look up several hundred nodes.
+    """
+    fields, variable_definitions = NODES_QUERIES[operation_name]
+    id_variables = ", ".join(f"$ids{i}: [ID!]!" for i in range(aliases))
+    nodes_fields = "".join(f"  b{i}: nodes(ids: $ids{i}) {{{fields}  }}\n" for i in range(aliases))
+    return (f"query {operation_name}({id_variables}{variable_definitions}) {{\n"
+            "  rateLimit {\n    cost\n    remaining\n    resetAt\n  }\n"
+            f"{nodes_fields}}}\n")
+
+
 # --- GitHub API Fetching ---
 # 使用github graphQL API to fetch top repos and add retry logic for internet connection errors
 
@@ -148,6 +296,23 @@ def retry_on_network_error(max_retries=3, delay=5, allowed_exceptions=(requests.
     return decorator
 
 
+def _send_graphql_request(query: str, operation_name: str, variables: Dict) -> Tuple[Dict, float]:
+    """Makes a single GraphQL request to the GitHub API, without retries.
+
+    Args:
+        query (str): The GraphQL query string.
+        operation_name (str): The name of the GraphQL operation.
+        variables (Dict): The variables for the GraphQL query.
+
+    Returns:
+        Tuple[Dict, float]: The JSON response and the server response time in seconds.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+    """
+    return github_client.graphql(query, operation_name, variables)
+
+
 @retry_on_network_error(max_retries=3, delay=2)
 def _make_graphql_request(query: str, operation_name: str, variables: Dict):
     """Makes a GraphQL request to the GitHub API with retry logic.
@@ -163,57 +328,64 @@ def _make_graphql_request(query: str, operation_name: str, variables: Dict):
     Raises:
         requests.exceptions.RequestException: If the request fails after retries.
     """
-    url = f"{config.API_BASE_URL}/graphql"
-    payload = {
-        "query": query,
-        "operationName": operation_name,
-        "variables": variables
-    }
-    time.sleep(config.WAIT_TIME_PER_REQUEST)
-    response = requests.request("POST",
-                                url,
-                                json=payload,
-                                headers=config.HEADERS)
-
-
-    # handle rate limit
-    # Check rate limit info of response headers
-    if "X-RateLimit-Remaining" in response.headers:
-        remaining = int(response.headers["x-ratelimit-remaining"])
-        x_ratelimit_limit = int(response.headers["x-ratelimit-limit"])
-        x_ratelimit_reset = int(response.headers["x-ratelimit-reset"])
-        x_ratelimit_used = int(response.headers["x-ratelimit-used"])
-        logger.info(f"Rate limit: {remaining}/{x_ratelimit_limit} | Reset at: {x_ratelimit_reset}")
-        if x_ratelimit_used > remaining * 0.8 or remaining < 10:
-            logger.warning(
-                f"Used more than limit ({remaining}/{x_ratelimit_limit}), sleeping until reset")
-          # sleeping until reset
-            time.sleep(x_ratelimit_reset - time.time())
-        
-    if response.status_code == 429:
-        logger.warning("Too many requests (429), sleeping for 10 seconds")
-        time.sleep(10)
-        # Retry the same request after waiting - handled by decorator now
-        # return _make_graphql_request(query, operation_name, variables)
-        # Raise status to let the decorator handle retry
-        response.raise_for_status()
-    elif response.status_code == 403:
-        # Log forbidden errors specifically
-        logger.error(f"Forbidden (403) error accessing GitHub API: {response.text}")
-        response.raise_for_status() # Raise to trigger retry or fail
-    elif response.status_code != 200:
-        logger.warning(f"Non-200 status code: {response.status_code}|{response.text}")
-        response.raise_for_status() # Raise to trigger retry or fail
-
-    return response.json()
+    return _send_graphql_request(query, operation_name, variables)[0]
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """Whether a failed request is worth retrying with a smaller page (502s and timeouts)."""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code >= 500
+
+
+def _fetch_search_page(pager: AdaptivePager, query: str, operation_name: str, variables: Dict,
+                       size_variable: str, limit: int) -> Tuple[Dict, int]:
+    """Fetches one search page at the pager's current size, shrinking it on 502s and timeouts.
+
+    Cursors do not depend on the page size, so a failed page is simply requested
+    again with a smaller ``first``. Once the pager is at its minimum size the
+    regular retry with backoff takes over. Other errors (401, 403, 422, ...)
+    are raised straight away instead of being sent again.
+
+    Returns:
+        Tuple[Dict, int]: The JSON response and the page size it was requested with.
+    """
+    while True:
+        size = min(pager.size(), limit)
+        try:
+            result, seconds = _send_graphql_request(query, operation_name, {**variables, size_variable: size})
+        except requests.exceptions.RequestException as e:
+            if not _is_transient_error(e):
+                raise
+            if size <= pager.min_size:
+                break
+            pager.record_failure(size, e)
+            continue
+        pager.record_success(size, seconds, ((result.get("data") or {}).get("rateLimit") or {}).get("cost"))
+        return result, size
+    return _make_graphql_request(query, operation_name, {**variables, size_variable: size}), size
+
+
+def _search_pager(operation_name: str, initial_size: int) -> AdaptivePager:
+    """Creates the page-size controller shared by every shard of one crawl."""
+    return AdaptivePager(operation_name, initial_size,
+                         max_size=config.ADAPTIVE_PAGE_MAX_SIZE,
+                         min_size=config.ADAPTIVE_PAGE_MIN_SIZE,
+                         fast_seconds=config.ADAPTIVE_PAGE_FAST_SECONDS,
+                         slow_seconds=config.ADAPTIVE_PAGE_SLOW_SECONDS,
+                         max_cost=config.ADAPTIVE_PAGE_MAX_COST)
+
 
 # Removed retry decorator from here
 def fetch_top_users_by_graphql(number_of_users: int = 5,
                                usertopRepositories_count: int = 10,
-                               cursor: Optional[str] = None):
-    logger.info("Fetching top users using GraphQL...")
+                               cursor: Optional[str] = None,
+                               query_string: str = "type:user followers:>0 sort:followers-desc"):
+    logger.info(f"Fetching top users using GraphQL ({query_string})...")
     variables = {
-        "queryString": "type:user followers:>0 sort:followers-desc",
+        "queryString": query_string,
         "number_of_users": number_of_users,
         "usertopRepositories_count": usertopRepositories_count,
         "cursor": cursor
@@ -229,51 +401,104 @@ def fetch_top_users_by_graphql(number_of_users: int = 5,
         raise e # Or return {} or None depending on caller expectation
 
 
-# define the function of calling fetch_top_users_by_graphql to fetch all users and save to db
+def _count_search_results(shard: SearchShard, search_type: str) -> int:
+    """Returns the number of search hits for a shard (repositoryCount / userCount)."""
+    query_string = shard.qualifier() if search_type == "REPOSITORY" else f"type:user {shard.qualifier()}"
+    result = _make_graphql_request(COUNT_SEARCH_QUERY, "countSearch",
+                                   {"queryString": query_string, "type": search_type})
+    search = result["data"]["search"]
+    return search["repositoryCount"] if search_type == "REPOSITORY" else search["userCount"]
 
 
-def fetch_all_users_by_graphql(max_number_of_users,
-                               number_of_users_one_time=20,
-                               usertopRepositories_count=10):
-    # how to aggregate the data
-    cursor = None  # initialize the cursor
-    all_number_of_users_fetched = 0
-    users_total_count = 0
-    all_users_data = {"meta": {}, "top_users": []}
-    while all_number_of_users_fetched < max_number_of_users:
-        users_data_info = fetch_top_users_by_graphql(number_of_users_one_time,
-                                                     usertopRepositories_count,
-                                                     cursor)
+def _crawl_user_shard(checkpoint: Dict, pager: AdaptivePager, usertopRepositories_count: int,
+                      writer: JsonStreamWriter, limit: int = SEARCH_RESULT_CAP) -> int:
+    """Follows the cursor chain of one user shard, saving every page to the db and the writer.
+
+    Starts from the checkpointed cursor and commits the new cursor together with
+    each page, so an interrupted shard resumes at the first uncommitted page.
+    Page sizes come from the shared pager. Stops after ``limit`` users (the
+    shard's share of MAX_USERS). Returns the number of users fetched; pages
+    are not kept in memory.
+    """
+    shard = SearchShard.from_dict(checkpoint)
+    checkpoint = dict(checkpoint)
+    query_string = f"type:user {shard.qualifier()} sort:followers-desc"
+    while checkpoint["fetched"] < limit:
+        logger.info(f"Fetching top users using GraphQL ({query_string})...")
+        variables = {
+            "queryString": query_string,
+            "usertopRepositories_count": usertopRepositories_count,
+            "cursor": checkpoint["cursor"]
+        }
+        users_data_info, page_size = _fetch_search_page(pager, GET_TOP_USERS_QUERY, "getTopUsers", variables,
+                                                        "number_of_users", limit - checkpoint["fetched"])
         users_data_fetched = users_data_info["data"]["search"]['edges']
-        # Check if data was fetched before accessing cursor
         if not users_data_fetched:
-            logger.warning("No user data fetched in this iteration, stopping pagination.")
-            break # Exit loop if no more data
-        # update the cursor
-        cursor = users_data_fetched[-1]["cursor"]
-        number_of_users_fetched = len(users_data_fetched)
-        all_number_of_users_fetched += number_of_users_fetched
-
-        # the total count of github users
-        users_total_count = users_data_info["data"]["search"]["userCount"]
-        logger.info(f"Fetched {all_number_of_users_fetched}/{max_number_of_users} users | Total users: {users_total_count} ")
-        # update update_at field with current datetime using the constant format
-        updated_at = datetime.datetime.now().strftime(DATETIME_FORMAT)
-        all_users_data['meta'].update({
-            "updated_at": updated_at,
-            "users_total_count": users_total_count,
-            "top_users_count": all_number_of_users_fetched
-        })
-        # accumulate the users_data_fetched into the all_users_data
-
-        # Update total counts including fetched counts
+            break
+        users_data_fetched_adjusted_list = _process_user_counts(users_data_fetched)
+        checkpoint["cursor"] = users_data_fetched[-1]["cursor"]
+        checkpoint["fetched"] += len(users_data_fetched_adjusted_list)
+        checkpoint["done"] = (len(users_data_fetched) < page_size
+                              or checkpoint["fetched"] >= limit)
+        # save users_data_fetched_adjusted_list to sqlite specified db
+        with _db_write_lock:
+            save_user_counts(config.USERS_SQLITE_DB_PATH, users_data_fetched_adjusted_list, checkpoint)
+        writer.write_items(users_data_fetched_adjusted_list)
+        if checkpoint["done"]:
+            break
+    if not checkpoint["done"]:
+        checkpoint["done"] = True
+        with _db_write_lock:
+            save_crawl_checkpoint(config.USERS_SQLITE_DB_PATH, checkpoint)
+    logger.info(f"Shard '{shard.key}': fetched {checkpoint['fetched']}/{shard.count} users")
+    return checkpoint["fetched"]
 
-        users_data_fetched_adjusted_list = _process_user_data(users_data_fetched, updated_at)
 
-        all_users_data["top_users"] += users_data_fetched_adjusted_list
-        # save users_data_fetched_adjusted_list to sqlite specified db
-        save_users(config.USERS_SQLITE_DB_PATH,
-                   users_data_fetched_adjusted_list)
+def fetch_all_users_by_graphql(max_number_of_users,
+                               number_of_users_one_time=20,
+                               usertopRepositories_count=10,
+                               resume=False):
+    """Fetches the top users by crawling follower-range shards in parallel.
+
+    A single search is capped at 1000 results, so the user space is split into
+    ``followers:a..b`` windows that each stay under the cap; the shards share
+    the ``max_number_of_users`` budget, highest followers first. Pages are streamed
+    to the db and to ``original_top_users_list.json`` as they arrive. With
+    ``resume`` the last interrupted run continues from its checkpoints.
+    ``number_of_users_one_time`` is only the initial page size; it adapts to
+    502s, timeouts and response times while crawling.
+    """
+    db_path = config.USERS_SQLITE_DB_PATH
+    planner = ShardPlanner(lambda shard: _count_search_results(shard, "USER"),
+                           "followers", low=config.USER_SHARD_MIN_FOLLOWERS)
+    run = _plan_or_resume_crawl(db_path, planner, max_number_of_users, resume)
+    users_total_count = run["totalCount"]
+    if run["finishedAt"] is not None:
+        logger.info(f"User crawl run {run['runId']} is already complete, nothing to resume")
+        all_number_of_users_fetched = run["fetchedCount"]
+    else:
+        pending = _pending_shards(run, max_number_of_users)
+        engine = FetchEngine(max_workers=config.FETCH_MAX_WORKERS)
+        pager = _search_pager("getTopUsers", number_of_users_one_time)
+        filename = os.path.join(config.DATA_DIR, config.ORI_TOP_USERS_FILENAME)
+        with JsonStreamWriter(filename, "top_users", compress=True, unique_key="databaseId") as writer:
+            # Users committed before an interruption are replayed from the db
+            for rows in iter_crawled_rows(db_path, User.__table__, run["runId"]):
+                writer.write_items([_user_row_to_item(row) for row in rows])
+            results = engine.map(
+                lambda shard: _crawl_user_shard(shard[0], pager, usertopRepositories_count, writer, shard[1]),
+                pending)
+            failed = _check_shard_results([checkpoint["shardKey"] for checkpoint, _ in pending], results)
+            logger.info(f"User search page sizes: {pager.stats()}")
+            all_number_of_users_fetched = writer.count
+            writer.meta = {
+                "updated_at": datetime.datetime.now().strftime(DATETIME_FORMAT),
+                "users_total_count": users_total_count,
+                "top_users_count": all_number_of_users_fetched
+            }
+        _finish_crawl(db_path, run["runId"], failed, all_number_of_users_fetched)
+    logger.info(f"Fetched {all_number_of_users_fetched}/{max_number_of_users} users | Total users: {users_total_count} ")
+    _refresh_users(run["startedAt"], usertopRepositories_count)
 
     # Update total counts including fetched counts after the loop finishes
     update_total_count(db_path=config.GITHUB_DB_INFO_PATH,
@@ -281,11 +506,347 @@ def fetch_all_users_by_graphql(max_number_of_users,
                        fetched_users_count=all_number_of_users_fetched,
                        repo_total_count=0,
                        fetched_repos_count=0)
+    return {"users_total_count": users_total_count, "top_users_count": all_number_of_users_fetched}
+
+
+def _check_shard_results(shard_keys: List[str], results: List) -> int:
+    """Logs failed shards and raises if every shard failed.
+
+    Returns the number of failed shards; their checkpoints stay open so a
+    ``--resume`` run continues them.
+    """
+    errors = []
+    for key, result in zip(shard_keys, results):
+        if isinstance(result, Exception):
+            logger.error(f"Shard '{key}' failed: {result}")
+            errors.append(result)
+    if errors and len(errors) == len(shard_keys):
+        raise errors[0]
+    return len(errors)
+
+
+def _fetch_nodes(operation_name: str, ids: List[str], variables: Optional[Dict] = None) -> Tuple[List[Dict], Optional[int]]:
+    """Fetches one batch of nodes by node id, wrapped as search-style edges.
+
+    The batch is split over aliased ``nodes(ids:)`` fields of at most
+    NODES_FIELD_LIMIT ids each. Ids that no longer resolve (deleted or renamed
+    away) come back as null and are skipped. Returns the edges and the query's
+    ``rateLimit.cost``.
+    """
+    chunks = [ids[i:i + NODES_FIELD_LIMIT] for i in range(0, len(ids), NODES_FIELD_LIMIT)]
+    chunk_variables = {f"ids{i}": chunk for i, chunk in enumerate(chunks)}
+    result = _make_graphql_request(_nodes_query(operation_name, len(chunks)), operation_name,
+                                   {**chunk_variables, **(variables or {})})
+    data = result.get("data") or {}
+    nodes = [node for i in range(len(chunks)) for node in (data.get(f"b{i}") or [])]
+    missing = sum(1 for node in nodes if not node)
+    if missing or result.get("errors"):
+        logger.debug(f"{operation_name}: {missing}/{len(ids)} ids did not resolve")
+    return [{"node": node} for node in nodes if node], (data.get("rateLimit") or {}).get("cost")
+
+
+def _refresh_nodes(ids: List[str], operation_name: str, process, save, db_path: str,
+                   variables: Optional[Dict] = None, max_batch_size: Optional[int] = None) -> int:
+    """Fetches the given node ids in cost-sized batches and saves each batch.
+
+    The first batch probes the per-node cost; later batches are grown (as aliased
+    ``nodes(ids:)`` fields) up to NODES_MAX_QUERY_COST points per query and
+    fetched FETCH_MAX_WORKERS at a time. ``max_batch_size`` caps the batch for
+    fields that are expensive to resolve server-side regardless of their cost.
+    """
+    if not ids:
+        return 0
+    max_size = max_batch_size or config.NODES_BATCH_SIZE * config.NODES_MAX_ALIASES
+    batcher = NodeBatcher(max_size=max_size,
+                          max_query_cost=config.NODES_MAX_QUERY_COST,
+                          initial_size=min(config.NODES_BATCH_SIZE, max_size))
+    engine = FetchEngine(max_workers=config.FETCH_MAX_WORKERS)
+
+    def refresh_batch(batch):
+        edges, cost = _fetch_nodes(operation_name, batch, variables)
+        batcher.observe(len(batch), cost)
+        items = process(edges)
+        with _db_write_lock:
+            save(db_path, items)
+        return len(items)
+
+    pending = list(ids)
+    refreshed = queries = failed = 0
+    while pending:
+        probing = not batcher.observed
+        batches = batcher.take(pending, config.FETCH_MAX_WORKERS)
+        results = engine.map(refresh_batch, batches)
+        queries += len(batches)
+        for result in results:
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error(f"{operation_name}: batch failed: {result}")
+            else:
+                refreshed += result
+        if probing and pending:
+            batcher.log_estimate(operation_name, len(pending))
+    if failed:
+        logger.error(f"{operation_name}: {failed}/{queries} batches failed")
+    logger.info(f"{operation_name}: refreshed {refreshed}/{len(ids)} nodes in {queries} queries")
+    return refreshed
+
+
+def _resolve_node_ids(db_path: str, table, ids: List) -> List[str]:
+    """Maps databaseIds (ints) to stored node ids; node ids (strings) are kept as they are."""
+    database_ids = [i for i in ids if isinstance(i, int)]
+    node_ids = get_node_ids_by_database_ids(db_path, table, database_ids) if database_ids else {}
+    unknown = len(set(database_ids) - node_ids.keys())
+    if unknown:
+        logger.warning(f"{unknown} databaseIds have no stored node id in {table.name}, skipping them")
+    resolved = [node_ids.get(i) if isinstance(i, int) else i for i in ids]
+    return [node_id for node_id in resolved if node_id]
 
-    # save all_users_data to json file
-    save_json(all_users_data,
-              os.path.join(config.DATA_DIR, config.ORI_TOP_USERS_FILENAME))
-    return all_users_data
+
+def fetch_repos_by_ids(ids: List, counts_only: bool = False) -> int:
+    """Refreshes known repositories by ``databaseId`` or node ``id`` without a search crawl.
+
+    Args:
+        ids (List): databaseIds (int) or node ids (str) from the repositories table.
+        counts_only (bool): Only refresh stargazerCount instead of the full metadata.
+
+    Returns:
+        int: The number of repositories refreshed.
+    """
+    db_path = config.REPOS_SQLITE_DB_PATH
+    node_ids = _resolve_node_ids(db_path, Repository.__table__, ids)
+    if counts_only:
+        return _refresh_nodes(node_ids, "getRepoCounts", _process_repo_counts,
+                              save_repository_counts, db_path)
+    return _refresh_nodes(node_ids, "getRepoMetadata", _process_repo_data, save_repositories, db_path)
+
+
+def fetch_users_by_ids(ids: List, counts_only: bool = False,
+                       usertopRepositories_count: int = config.USER_TOP_REPOSITORIES_COUNT) -> int:
+    """Refreshes known users by ``databaseId`` or node ``id`` without a search crawl.
+
+    Args:
+        ids (List): databaseIds (int) or node ids (str) from the users table.
+        counts_only (bool): Only refresh followers and top-repository stars instead of the full metadata.
+        usertopRepositories_count (int): Number of top repositories summed per user.
+
+    Returns:
+        int: The number of users refreshed.
+    """
+    db_path = config.USERS_SQLITE_DB_PATH
+    node_ids = _resolve_node_ids(db_path, User.__table__, ids)
+    variables = {"usertopRepositories_count": usertopRepositories_count}
+    if counts_only:
+        return _refresh_nodes(node_ids, "getUserCounts", _process_user_counts,
+                              save_user_counts, db_path, variables)
+    return _refresh_nodes(node_ids, "getUserMetadata",
+                          lambda edges: _process_user_data(edges, datetime.datetime.now().strftime(DATETIME_FORMAT)),
+                          save_users, db_path, variables)
+
+
+def _refresh_repos(started_at: datetime.datetime):
+    """Second refresh tier for repos: stale counts and missing/expired metadata by node id."""
+    db_path = config.REPOS_SQLITE_DB_PATH
+    if config.REFRESH_STALE_COUNTS:
+        fetch_repos_by_ids(get_node_ids_with_stale_counts(db_path, Repository.__table__, started_at),
+                           counts_only=True)
+    fetch_repos_by_ids(get_node_ids_for_metadata_refresh(db_path, Repository.__table__, "name",
+                                                         config.METADATA_REFRESH_DAYS))
+
+
+def _refresh_users(started_at: datetime.datetime, usertopRepositories_count: int):
+    """Second refresh tier for users: stale counts and missing/expired metadata by node id."""
+    db_path = config.USERS_SQLITE_DB_PATH
+    if config.REFRESH_STALE_COUNTS:
+        fetch_users_by_ids(get_node_ids_with_stale_counts(db_path, User.__table__, started_at),
+                           counts_only=True, usertopRepositories_count=usertopRepositories_count)
+    fetch_users_by_ids(get_node_ids_for_metadata_refresh(db_path, User.__table__, "login",
+                                                         config.METADATA_REFRESH_DAYS),
+                       usertopRepositories_count=usertopRepositories_count)
+
+
+def refresh_known_repos() -> Dict:
+    """Refreshes every stored repository by node id instead of crawling search.
+
+    Counts are refreshed for all rows; metadata follows the usual rotation.
+    """
+    db_path = config.REPOS_SQLITE_DB_PATH
+    refreshed = fetch_repos_by_ids(get_node_ids(db_path, Repository.__table__), counts_only=True)
+    fetch_repos_by_ids(get_node_ids_for_metadata_refresh(db_path, Repository.__table__, "name",
+                                                         config.METADATA_REFRESH_DAYS))
+    update_total_count(db_path=config.GITHUB_DB_INFO_PATH, fetched_repos_count=refreshed)
+    return {"top_repos_count": refreshed}
+
+
+def refresh_known_users(usertopRepositories_count: int = config.USER_TOP_REPOSITORIES_COUNT) -> Dict:
+    """Refreshes every stored user by node id instead of crawling search.
+
+    Counts are refreshed for all rows; metadata follows the usual rotation.
+    """
+    db_path = config.USERS_SQLITE_DB_PATH
+    refreshed = fetch_users_by_ids(get_node_ids(db_path, User.__table__), counts_only=True,
+                                   usertopRepositories_count=usertopRepositories_count)
+    fetch_users_by_ids(get_node_ids_for_metadata_refresh(db_path, User.__table__, "login",
+                                                         config.METADATA_REFRESH_DAYS),
+                       usertopRepositories_count=usertopRepositories_count)
+    update_total_count(db_path=config.GITHUB_DB_INFO_PATH, fetched_users_count=refreshed)
+    return {"top_users_count": refreshed}
+
+
+def _process_user_contributions(users_data_fetched):
+    """Processes the contributionsCollection of user nodes returned by nodes(ids:)."""
+    processed = []
+    for user_data in users_data_fetched:
+        node = user_data.get('node', {})
+        collection = node.get('contributionsCollection')
+        if not node or collection is None:
+            logger.warning(f"Skipping user contributions due to missing data: {user_data}")
+            continue
+        commits = collection.get('totalCommitContributions') or 0
+        processed.append({
+            "databaseId": node.get('databaseId'),
+            "commits": commits,
+            "contributions": commits + sum(collection.get(key) or 0 for key in (
+                'totalIssueContributions', 'totalPullRequestContributions',
+                'totalPullRequestReviewContributions', 'restrictedContributionsCount')),
+        })
+    return processed
+
+
+def fetch_user_contributions(days: Optional[List[datetime.date]] = None) -> Dict[int, int]:
+    """Crawls one UTC day of contributionsCollection for the candidate users.
+
+    By default the last CONTRIBUTION_CATCHUP_DAYS complete days are covered, but
+    only users without a stored row for a day are queried, so a normal run
+    costs one day of lookups and an interrupted one is completed by the next.
+    Returns the number of users fetched per day (YYYYMMDD).
+    """
+    db_path = config.USERS_SQLITE_DB_PATH
+    yesterday = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    if days is None:
+        days = [yesterday - datetime.timedelta(days=offset)
+                for offset in reversed(range(config.CONTRIBUTION_CATCHUP_DAYS))]
+    fetched = {}
+    for date in days:
+        day = date_to_day(date)
+        ids = get_contribution_candidates(db_path, day, config.CONTRIBUTION_CANDIDATES)
+        variables = {"from": f"{date.isoformat()}T00:00:00Z", "to": f"{date.isoformat()}T23:59:59Z"}
+        fetched[day] = _refresh_nodes(ids, "getUserContributions", _process_user_contributions,
+                                      lambda path, items, day=day: save_user_contributions(path, day, items),
+                                      db_path, variables, max_batch_size=config.CONTRIBUTIONS_BATCH_SIZE)
+    oldest = yesterday - datetime.timedelta(days=config.CONTRIBUTION_HISTORY_DAYS)
+    pruned = prune_user_contributions(db_path, date_to_day(oldest))
+    if pruned:
+        logger.info(f"Pruned {pruned} contribution rows older than {oldest}")
+    return fetched
+
+
+def _last_complete_utc_day() -> datetime.date:
+    """Returns yesterday (UTC), the last complete day of GitHub's ``created:`` dates."""
+    return datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+
+
+def _count_new_repos(language: str, date: datetime.date) -> int:
+    """Returns the number of repositories on GitHub created on ``date`` in ``language``."""
+    query_string = config.NEW_REPOS_QUERY_TEMPLATE.format(day=date.isoformat(), language=language)
+    result = _make_graphql_request(COUNT_SEARCH_QUERY, "countSearch",
+                                   {"queryString": query_string, "type": "REPOSITORY"})
+    return result["data"]["search"]["repositoryCount"]
+
+
+def fetch_language_new_repos(days: Optional[List[datetime.date]] = None) -> Dict[int, int]:
+    """Counts the repositories created per UTC day for the most tracked languages.
+
+    Every language and day costs one ``created:`` count search. By default the
+    last LANGUAGE_CATCHUP_DAYS complete days without stored counts are covered,
+    so a normal run counts one day and an interrupted one is completed by the
+    next. A day is saved only once every language was counted.
+    Returns the number of languages counted per day (YYYYMMDD).
+    """
+    db_path = config.REPOS_SQLITE_DB_PATH
+    last = _last_complete_utc_day()
+    if days is None:
+        days = [last - datetime.timedelta(days=offset)
+                for offset in reversed(range(config.LANGUAGE_CATCHUP_DAYS))]
+        done = set(get_language_new_repo_days(db_path, date_to_day(days[0]), date_to_day(days[-1])))
+        days = [date for date in days if date_to_day(date) not in done]
+    languages = get_tracked_languages(db_path, date_to_day(last), config.LANGUAGE_SEARCH_LIMIT)
+    engine = FetchEngine(max_workers=config.FETCH_MAX_WORKERS)
+    counted = {}
+    failed = []
+    for date in days:
+        results = engine.map(lambda language: _count_new_repos(language, date), languages)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.error(f"{len(errors)}/{len(languages)} new repo counts for {date} failed: {errors[0]}")
+            failed.append(date.isoformat())
+            continue
+        save_language_new_repos(db_path, date_to_day(date), dict(zip(languages, results)))
+        counted[date_to_day(date)] = len(languages)
+    if failed:
+        raise RuntimeError(f"Failed to count new repos for {', '.join(failed)}")
+    return counted
+
+
+def _plan_or_resume_crawl(db_path: str, planner: ShardPlanner, max_results: int, resume: bool) -> Dict:
+    """Returns the crawl run to work on, with its shard checkpoints.
+
+    With ``resume``, the latest run is continued if it is unfinished or was
+    started today; its stored plan is reused, so no count queries are spent.
+    Otherwise the search space is planned again and a new run is started.
+    """
+    if resume:
+        run = get_latest_crawl_run(db_path)
+        today = datetime.date.today().strftime("%Y%m%d")
+        if run is not None and (run["finishedAt"] is None or run["runId"].startswith(today)):
+            done = sum(1 for checkpoint in run["shards"] if checkpoint["done"])
+            logger.info(f"Resuming crawl run {run['runId']}: {done}/{len(run['shards'])} shards done")
+            return run
+        logger.info(f"No crawl run to resume in {db_path}, starting a new one")
+    shards, total_count = planner.plan(max_results)
+    run_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    start_crawl_run(db_path, run_id, total_count, [shard.as_dict() for shard in shards])
+    return get_latest_crawl_run(db_path)
+
+
+def _pending_shards(run: Dict, max_results: int) -> List[Tuple[Dict, int]]:
+    """Returns the unfinished shard checkpoints of a run with their fetch limits.
+
+    The limits split ``max_results`` over the shards in plan (highest first)
+    order, so the crawl as a whole stops at the configured maximum; shards
+    with no budget left are not crawled at all.
+    """
+    limits = shard_limits([checkpoint["count"] or 0 for checkpoint in run["shards"]], max_results)
+    return [(checkpoint, limit) for checkpoint, limit in zip(run["shards"], limits)
+            if not checkpoint["done"] and checkpoint["fetched"] < limit]
+
+
+def _finish_crawl(db_path: str, run_id: str, failed: int, fetched_count: int):
+    """Closes the crawl run unless some shards failed and still need a resume."""
+    if failed:
+        logger.warning(f"{failed} shards of crawl run {run_id} failed, "
+                       f"rerun with --resume to fetch only the missing pages")
+    else:
+        finish_crawl_run(db_path, run_id, fetched_count)
+
+
+def _process_user_counts(users_data_fetched):
+    """Processes the counts-only user nodes returned by search / nodes(ids:)."""
+    processed_users = []
+    for user_data in users_data_fetched:
+        node = user_data.get('node', {})
+        if not node: # Skip if node is missing or empty
+            logger.warning(f"Skipping user data due to missing 'node': {user_data}")
+            continue
+        top_repos_nodes = node.get('topRepositories', {}).get('nodes', [])
+        processed_users.append({
+            "databaseId": node.get('databaseId'),
+            "id": node.get('id'),
+            "followersCount": node.get('followers', {}).get('totalCount'),
+            "topRepositories_starsgazerCount": sum(
+                repos.get("stargazerCount", 0) for repos in top_repos_nodes
+            ),
+        })
+    return processed_users
 
 
 def _process_user_data(users_data_fetched, updated_at):
@@ -319,10 +880,11 @@ def _process_user_data(users_data_fetched, updated_at):
 
 # Removed retry decorator from here
 def fetch_top_repos_by_graphql(number_of_repos: int = 10,
-                               cursor: Optional[str] = None):
-    logger.info("Fetching top repos using GraphQL...")
+                               cursor: Optional[str] = None,
+                               query_string: str = "stars:>0 sort:stars-desc"):
+    logger.info(f"Fetching top repos using GraphQL ({query_string})...")
     variables = {
-        "queryString": "stars:>0 sort:stars-desc",
+        "queryString": query_string,
         "number_of_repos": number_of_repos,
         "cursor": cursor
     }
@@ -335,83 +897,127 @@ def fetch_top_repos_by_graphql(number_of_repos: int = 10,
         return None # Return None as the original function did on 403/other errors
 
 
-def fetch_all_repos_by_graphql(max_number_of_repos: int = 200,
-                               number_of_repos_one_time: int = 100):
-    # how to aggregate the data
-    cursor = None  # initialize the cursor
-    all_number_of_repos_fetched = 0
-    repos_total_count = 0
-    all_repos_data = {
-        "meta": {
-            "updated_at": "2016-01-01T00:00:00Z",
-            "repos_total_count": 0,
-            "top_repos_count": 0,
-            "order_by": "stars",
-            "order_direction": "desc"
-        },
-        "top_repos": []
-    }
-    if max_number_of_repos == -1:
-        logger.info("No limit, fetching all repos from GitHub")
-    while ((max_number_of_repos == -1) or (all_number_of_repos_fetched < max_number_of_repos)):
-        repos_data_info = fetch_top_repos_by_graphql(number_of_repos_one_time,
-                                                     cursor)
-        if not repos_data_info:
-            logger.warning("No repos data fetched in this iteration, stopping pagination.")
-            break # Exit loop if no more data
+def _crawl_repo_shard(checkpoint: Dict, pager: AdaptivePager, writer: JsonStreamWriter,
+                      limit: int = SEARCH_RESULT_CAP) -> int:
+    """Follows the cursor chain of one repo shard, saving every page to the db and the writer.
+
+    Starts from the checkpointed cursor and commits the new cursor together with
+    each page, so an interrupted shard resumes at the first uncommitted page.
+    Page sizes come from the shared pager. Stops after ``limit`` repos (the
+    shard's share of MAX_REPOS). Returns the number of repos fetched; pages
+    are not kept in memory.
+    """
+    shard = SearchShard.from_dict(checkpoint)
+    checkpoint = dict(checkpoint)
+    query_string = f"{shard.qualifier()} sort:stars-desc"
+    while checkpoint["fetched"] < limit:
+        logger.info(f"Fetching top repos using GraphQL ({query_string})...")
+        variables = {"queryString": query_string, "cursor": checkpoint["cursor"]}
+        repos_data_info, page_size = _fetch_search_page(pager, GET_TOP_REPOS_QUERY, "getToprepos", variables,
+                                                        "number_of_repos", limit - checkpoint["fetched"])
         try:
             repos_data_fetched = repos_data_info["data"]["search"]['edges']
         except Exception as e:
             logger.exception(f"Error fetching top repos: [{e}]")
             logger.info(repos_data_info)
             raise e
-        # Check if data was fetched before accessing cursor
         if not repos_data_fetched:
-            logger.warning("No repo data fetched in this iteration, stopping pagination.")
-            logger.info(f"cursors:{last_cursor} | current repos data info: {repos_data_info}")
-            break # Exit loop if no more data
-        # update the cursor
-        cursor = repos_data_fetched[-1]["cursor"]
-        ## debug
-        last_cursor =cursor
-        number_of_repos_fetched = len(repos_data_fetched)
-        all_number_of_repos_fetched += number_of_repos_fetched
-        # the total count of github users
-        repos_total_count = repos_data_info["data"]["search"]["repositoryCount"]
-        # update the total count of github repos
-        if  max_number_of_repos == -1:
-            max_number_of_repos = repos_total_count
-         # update update_at field with current datetime using the constant format
-        updated_at = datetime.datetime.now().strftime(DATETIME_FORMAT)
-        all_repos_data['meta'].update({
-            "updated_at": updated_at,
-            "repos_total_count": repos_total_count,
-            "top_repos_count": all_number_of_repos_fetched
-        })
-        # Process and accumulate the fetched repo data
-        repos_data_fetched_adjusted_list = _process_repo_data(repos_data_fetched)
-        all_repos_data["top_repos"] += repos_data_fetched_adjusted_list
-
-        logger.info(
-            f"Fetched {all_number_of_repos_fetched}/{max_number_of_repos} repos | Total repos: {repos_total_count} "
-        )
+            break
+        repos_data_fetched_adjusted_list = _process_repo_counts(repos_data_fetched)
+        checkpoint["cursor"] = repos_data_fetched[-1]["cursor"]
+        checkpoint["fetched"] += len(repos_data_fetched_adjusted_list)
+        checkpoint["done"] = (len(repos_data_fetched) < page_size
+                              or checkpoint["fetched"] >= limit)
         # save repos_data_fetched_adjusted_list to sqlite specified db
-        save_repositories(config.REPOS_SQLITE_DB_PATH,
-                          repos_data_fetched_adjusted_list)
+        with _db_write_lock:
+            save_repository_counts(config.REPOS_SQLITE_DB_PATH, repos_data_fetched_adjusted_list, checkpoint)
+        writer.write_items(repos_data_fetched_adjusted_list)
+        if checkpoint["done"]:
+            break
+    if not checkpoint["done"]:
+        checkpoint["done"] = True
+        with _db_write_lock:
+            save_crawl_checkpoint(config.REPOS_SQLITE_DB_PATH, checkpoint)
+    logger.info(f"Shard '{shard.key}': fetched {checkpoint['fetched']}/{shard.count} repos")
+    return checkpoint["fetched"]
+
+
+def fetch_all_repos_by_graphql(max_number_of_repos: int = 200,
+                               number_of_repos_one_time: int = 100,
+                               resume: bool = False):
+    """Fetches the top repos by crawling star-range shards in parallel.
+
+    A single search is capped at 1000 results, so the repo space is split into
+    ``stars:a..b`` (and, if needed, ``created:``) windows that each stay under
+    the cap. The shards share the ``max_number_of_repos`` budget, highest stars
+    first; ``max_number_of_repos == -1`` crawls every shard. Pages are streamed
+    to the db and to ``original_top_repos.json`` as they arrive, so memory use is
+    bounded by the page size rather than the crawl size. With ``resume`` the
+    last interrupted run continues from its checkpoints.
+    ``number_of_repos_one_time`` is only the initial page size; it adapts to
+    502s, timeouts and response times while crawling.
+    """
+    if max_number_of_repos == -1:
+        logger.info(f"No limit, fetching all repos with at least {config.REPO_SHARD_MIN_STARS} stars from GitHub")
+    db_path = config.REPOS_SQLITE_DB_PATH
+    planner = ShardPlanner(lambda shard: _count_search_results(shard, "REPOSITORY"),
+                           "stars", low=config.REPO_SHARD_MIN_STARS)
+    run = _plan_or_resume_crawl(db_path, planner, max_number_of_repos, resume)
+    repos_total_count = run["totalCount"]
+    filename = os.path.join(config.DATA_DIR, config.ORI_TOP_REPOS_FILENAME)
+    if run["finishedAt"] is not None:
+        logger.info(f"Repo crawl run {run['runId']} is already complete, nothing to resume")
+        all_number_of_repos_fetched = run["fetchedCount"]
+    else:
+        pending = _pending_shards(run, max_number_of_repos)
+        engine = FetchEngine(max_workers=config.FETCH_MAX_WORKERS)
+        pager = _search_pager("getToprepos", number_of_repos_one_time)
+        with JsonStreamWriter(filename, "top_repos", compress=True, unique_key="databaseId") as writer:
+            # Repos committed before an interruption are replayed from the db
+            for rows in iter_crawled_rows(db_path, Repository.__table__, run["runId"]):
+                writer.write_items([_repo_row_to_item(row) for row in rows])
+            results = engine.map(
+                lambda shard: _crawl_repo_shard(shard[0], pager, writer, shard[1]),
+                pending)
+            failed = _check_shard_results([checkpoint["shardKey"] for checkpoint, _ in pending], results)
+            logger.info(f"Repo search page sizes: {pager.stats()}")
+            all_number_of_repos_fetched = writer.count
+            # Shards finish in any order, so this file is in crawl order; the ranked
+            # top_repos_list.json is generated from the db afterwards.
+            writer.meta = {
+                "updated_at": datetime.datetime.now().strftime(DATETIME_FORMAT),
+                "repos_total_count": repos_total_count,
+                "top_repos_count": all_number_of_repos_fetched,
+            }
+        _finish_crawl(db_path, run["runId"], failed, all_number_of_repos_fetched)
+    logger.info(
+        f"Fetched {all_number_of_repos_fetched}/{max_number_of_repos} repos | Total repos: {repos_total_count} "
+    )
+    _refresh_repos(run["startedAt"])
 
     # Update total counts including fetched counts after the loop finishes
     update_total_count(db_path=config.GITHUB_DB_INFO_PATH,
                        repo_total_count=repos_total_count,
                        fetched_repos_count=all_number_of_repos_fetched)
 
-    # save all_repos_data to json file
-    save_json(all_repos_data,
-              os.path.join(config.DATA_DIR, config.ORI_TOP_REPOS_FILENAME))
-    
-    logger.info(
-        f"All repos data saved to {os.path.join(config.DATA_DIR, config.ORI_TOP_REPOS_FILENAME)}"
-    )
-    return all_repos_data
+    logger.info(f"All repos data saved to {filename}")
+    return {"repos_total_count": repos_total_count, "top_repos_count": all_number_of_repos_fetched}
+
+def _process_repo_counts(repos_data_fetched: List[Dict]):
+    """Processes the counts-only repository nodes returned by search / nodes(ids:)."""
+    processed_repos = []
+    for repo_data in repos_data_fetched:
+        node = (repo_data or {}).get('node')
+        if not node: # Skip if node is missing or empty
+            logger.warning(f"Skipping repo data due to missing 'node': {repo_data}")
+            continue
+        processed_repos.append({
+            "databaseId": node.get('databaseId'),
+            "id": node.get('id'),
+            "accumulatedStars": node.get('stargazerCount'),
+        })
+    return processed_repos
+
 
 def _process_repo_data(repos_data_fetched: List[Dict]):
     """Processes raw repository data fetched from GraphQL API."""
@@ -440,55 +1046,71 @@ def _process_repo_data(repos_data_fetched: List[Dict]):
     return processed_repos
 
 
+def _repo_row_to_item(row: Dict) -> Dict:
+    """Converts a repositories row back to the shape produced by _process_repo_data."""
+    created_at = row.get("createdAt")
+    return {
+        "databaseId": row.get("databaseId"),
+        "id": row.get("id"),
+        "name": row.get("name"),
+        "url": row.get("url"),
+        "accumulatedStars": row.get("accumulatedStars"),
+        "description": row.get("description"),
+        "createdAt": created_at.replace(" ", "T") + "Z" if created_at else None,
+        "languages": row["language"].split(" | ") if row.get("language") else [],
+    }
+
+
+def _user_row_to_item(row: Dict) -> Dict:
+    """Converts a users row back to the shape produced by _process_user_data."""
+    item = dict(row)
+    if item.get("updatedAt"):
+        item["updatedAt"] = item["updatedAt"].strftime(DATETIME_FORMAT)
+    return item
+
+
 # --- Data Update Functions ---
 
-def update_accumulatedStars_1d():
-    """更新数据库中 accumulatedStars_1d 字段的值"""
-    logger.info("Updating accumulatedStars_1d field...") # Changed print to logger.info
-    repo_db_path = config.REPOS_SQLITE_DB_PATH
-    # 1. 获取昨天的日期
-    archived_top_repos = read_archived_top_repos_1d_before_today()
-    if archived_top_repos is None:
-        logger.warning("No archived top repos 1d before found.")
-        return
-    else:
-        batch_update_accumulated_stars(repo_db_path, archived_top_repos,
-                                       "accumulatedStars_1d")
-
-
-def update_accumulatedStars_7d():
-    """更新数据库中 accumulatedStars_7d 字段的值"""
-    logger.info("Updating accumulatedStars_7d field...") # Changed print to logger.info
-    repo_db_path = config.REPOS_SQLITE_DB_PATH
-    archived_top_repos = read_archived_top_repos_7d_before_today()
-    if archived_top_repos is None:
-        logger.warning("No archived top repos found.")
-        return
-    else:
-        batch_update_accumulated_stars(repo_db_path, archived_top_repos,
-                                       "accumulatedStars_7d")
+# Star delta field -> number of days to look back in the archive
+STAR_DELTA_RANGES = {
+    "accumulatedStars_1d": 1,
+    "accumulatedStars_7d": 7,
+    "accumulatedStars_30d": 30,
+}
 
 
-def update_accumulatedStars_30d():
-    """更新数据库中 accumulatedStars_30d 字段的值"""
-    logger.info("Updating accumulatedStars_30d field...") # Changed print to logger.info
-    repo_db_path = config.REPOS_SQLITE_DB_PATH
-    archived_top_repos = read_archived_top_repos_30d_before_today()
+def update_accumulated_stars():
+    """更新数据库中 accumulatedStars_1d/7d/30d 字段的值"""
+    logger.info("Updating accumulatedStars_1d/7d/30d fields...")
+    archived_stars = {}
+    series = None
+    for key, days in STAR_DELTA_RANGES.items():
+        archived_stars[key] = read_archived_stars_days_before(days)
+        if archived_stars[key] is None:
+            # No snapshot on exactly that day: interpolate it from the surrounding days of the star history
+            if series is None:
+                series = _interpolated_star_series(max(STAR_DELTA_RANGES.values()) + config.STAR_HISTORY_MAX_GAP_DAYS + 1)
+            archived_stars[key] = series.snapshot(days) if series is not None else None
+            if archived_stars[key] is not None:
+                logger.info(f"No archived top repos {days}d before, interpolated {key} from the star history.")
+            else:
+                logger.warning(f"No archived top repos {days}d before found, {key} will be NULL.")
+    bulk_update_star_deltas(config.REPOS_SQLITE_DB_PATH, archived_stars)
 
-    if archived_top_repos is None:
-        logger.warning("No archived top repos found.")
-        return
-    else:
-        batch_update_accumulated_stars(repo_db_path, archived_top_repos,
-                                       "accumulatedStars_30d")
+
+def _interpolated_star_series(length):
+    """Star history of the current repos over the last ``length`` days, gaps interpolated."""
+    series = load_star_series(config.STAR_HISTORY_DB_PATH, length,
+                              current=get_current_stars(config.REPOS_SQLITE_DB_PATH))
+    if series is not None:
+        series.stars = interpolate_gaps(series.stars, config.STAR_HISTORY_MAX_GAP_DAYS)
+    return series
 
 
 # --- JSON Generation ---
 
-def _generate_and_save_json(data_fetch_func, db_path, filename, data_key, count_key, order_by, order_direction, base_meta, **kwargs):
-    """Helper function to fetch data, generate JSON structure, and save it."""
-    logger.info(f"Generating {filename}...")
-    items = data_fetch_func(db_path, **kwargs)
+def _save_ranking_json(items, filename, data_key, count_key, order_by, order_direction, base_meta):
+    """Wrap ranking items with a meta block and publish them."""
     data_structure = {
         "meta": {
             "updated_at": datetime.datetime.now().strftime(DATETIME_FORMAT), # Use constant format
@@ -499,70 +1121,77 @@ def _generate_and_save_json(data_fetch_func, db_path, filename, data_key, count_
         data_key: items
     }
     data_structure['meta'].update(base_meta)
-    save_json(data_structure, os.path.join(config.DATA_DIR, filename))
+    publish_json(data_structure, os.path.join(config.DATA_DIR, filename), data_key)
     logger.info(f"Generated {filename} with {len(items)} items.")
 
+
+def _generate_and_save_json(data_fetch_func, db_path, filename, data_key, count_key, order_by, order_direction, base_meta, **kwargs):
+    """Helper function to fetch data, generate JSON structure, and save it."""
+    logger.info(f"Generating {filename}...")
+    items = data_fetch_func(db_path, **kwargs)
+    _save_ranking_json(items, filename, data_key, count_key, order_by, order_direction, base_meta)
+
+
+def _raise_if_failed(filenames: List[str]):
+    """Fails the generating step once every file has been tried.
+
+    The other files of the step are still written, but the step's artifact
+    must not count as produced, so its dependents (archiving) are skipped.
+    """
+    if filenames:
+        raise RuntimeError(f"Failed to generate {', '.join(filenames)}")
+
+
 def generate_repo_json_files(base_meta):
-    """Generate JSON files related to repositories."""
+    """Generate JSON files related to repositories.
+
+    All repository rankings are computed from a single scan of the repositories table.
+    """
     logger.info("Generating repository JSON files...")
-    repo_db_path = config.REPOS_SQLITE_DB_PATH
     repo_tasks = [
         {
-            "func": get_repos_hot,
-            "db": repo_db_path,
+            "column": "accumulatedStars",
+            "limit": config.TOP_REPOS_LIMIT,
             "file": config.TOP_REPOS_FILENAME,
-            "data_key": "top_repos",
-            "count_key": "top_repos_count",
             "order": "stars",
-            "dir": "desc",
-            "kwargs": {'limit': config.TOP_REPOS_LIMIT}
         },
         {
-            "func": get_repos_hot_order_by_range_day,
-            "db": repo_db_path,
+            "column": "accumulatedStars_1d",
+            "limit": config.TRENDING_REPO_LIMIT,
             "file": config.DAILY_TRENDING_FILENAME,
-            "data_key": "top_repos",
-            "count_key": "top_repos_count",
             "order": "stars_1d",
-            "dir": "desc",
-            "kwargs": {"range_day": 1, "limit": config.TRENDING_REPO_LIMIT}
         },
         {
-            "func": get_repos_hot_order_by_range_day,
-            "db": repo_db_path,
+            "column": "accumulatedStars_7d",
+            "limit": 100,
             "file": config.WEEKLY_TRENDING_FILENAME,
-            "data_key": "top_repos",
-            "count_key": "top_repos_count",
             "order": "stars_7d",
-            "dir": "desc",
-            "kwargs": {"range_day": 7}
         },
         {
-            "func": get_repos_hot_order_by_range_day,
-            "db": repo_db_path,
+            "column": "accumulatedStars_30d",
+            "limit": 100,
             "file": config.MONTHLY_TRENDING_FILENAME,
-            "data_key": "top_repos",
-            "count_key": "top_repos_count",
             "order": "stars_30d",
-            "dir": "desc",
-            "kwargs": {"range_day": 30}
         },
     ]
+    rankings = get_repo_rankings(config.REPOS_SQLITE_DB_PATH,
+                                 {task["column"]: task["limit"] for task in repo_tasks})
+    failed = []
     for task in repo_tasks:
         try:
-            _generate_and_save_json(
-                data_fetch_func=task["func"],
-                db_path=task["db"],
+            _save_ranking_json(
+                items=rankings[task["column"]],
                 filename=task["file"],
-                data_key=task["data_key"],
-                count_key=task["count_key"],
+                data_key="top_repos",
+                count_key="top_repos_count",
                 order_by=task["order"],
-                order_direction=task["dir"],
+                order_direction="desc",
                 base_meta=base_meta,
-                **task["kwargs"]
             )
         except Exception as e:
             logger.error(f"Failed to generate {task['file']}: {e}", exc_info=True)
+            failed.append(task["file"])
+    _raise_if_failed(failed)
     logger.info("Finished generating repository JSON files.")
 
 def generate_user_json_files(base_meta):
@@ -581,6 +1210,7 @@ def generate_user_json_files(base_meta):
             "kwargs": {'limit': config.TOP_USERS_LIMIT}
         },
     ]
+    failed = []
     for task in user_tasks:
         try:
             _generate_and_save_json(
@@ -596,25 +1226,109 @@ def generate_user_json_files(base_meta):
             )
         except Exception as e:
             logger.error(f"Failed to generate {task['file']}: {e}", exc_info=True)
+            failed.append(task["file"])
+    _raise_if_failed(failed)
     logger.info("Finished generating user JSON files.")
 
-def generate_trending_json_files():
-    """从数据库查询数据并生成 JSON 文件 (Deprecated, use generate_repo_json_files and generate_user_json_files)"""
-    logger.warning("generate_trending_json_files is deprecated. Use generate_repo_json_files and generate_user_json_files instead.")
-    # Keep the old logic for compatibility or remove if sure it's not needed
+def generate_star_velocity_json_files(base_meta):
+    """Generate the star velocity leaderboards (one per window) and the breakout leaderboard.
+
+    Computed from the full daily star history, so a missing archive day is
+    interpolated instead of emptying the ranking.
+    """
+    logger.info("Generating star velocity JSON files...")
+    rankings = star_velocity_rankings(config.STAR_HISTORY_DB_PATH,
+                                      get_current_stars(config.REPOS_SQLITE_DB_PATH),
+                                      windows=config.STAR_VELOCITY_WINDOWS,
+                                      baseline=config.BREAKOUT_BASELINE_DAYS,
+                                      limit=config.STAR_VELOCITY_LIMIT,
+                                      max_gap=config.STAR_HISTORY_MAX_GAP_DAYS,
+                                      breakout_window=config.BREAKOUT_WINDOW_DAYS)
+    boards = [(f"velocity_{days}d", config.STAR_VELOCITY_FILENAME.format(days=days))
+              for days in config.STAR_VELOCITY_WINDOWS]
+    if config.BREAKOUT_WINDOW_DAYS:
+        boards.append((f"breakout_{config.BREAKOUT_WINDOW_DAYS}d",
+                       config.BREAKOUT_FILENAME.format(days=config.BREAKOUT_WINDOW_DAYS)))
+    repos = get_repos_by_database_ids(config.REPOS_SQLITE_DB_PATH,
+                                      sorted({entry["databaseId"] for entries in rankings.values() for entry in entries}))
+    failed = []
+    for name, filename in boards:
+        try:
+            items = [{**repos[entry["databaseId"]], **entry}
+                     for entry in rankings.get(name, []) if entry["databaseId"] in repos]
+            _save_ranking_json(items, filename, "top_repos", "top_repos_count", name, "desc", base_meta)
+        except Exception as e:
+            logger.error(f"Failed to generate {filename}: {e}", exc_info=True)
+            failed.append(filename)
+    _raise_if_failed(failed)
+    logger.info("Finished generating star velocity JSON files.")
+
+
+def generate_contributor_json_files(base_meta):
+    """Generate the most-active-users leaderboards (one per CONTRIBUTION_WINDOWS entry).
+
+    Each board sums the stored daily contribution rows of the window ending
+    yesterday (UTC), the last complete day.
+    """
+    logger.info("Generating top committer JSON files...")
+    last = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    failed = []
+    for days in config.CONTRIBUTION_WINDOWS:
+        filename = config.TOP_COMMITTERS_FILENAME.format(days=days)
+        try:
+            items = get_top_contributor_users(config.USERS_SQLITE_DB_PATH,
+                                              date_to_day(last - datetime.timedelta(days=days - 1)),
+                                              date_to_day(last), limit=config.TOP_COMMITTERS_LIMIT)
+            _save_ranking_json(items, filename, "top_users", "top_users_count", "commits", "desc",
+                               {**base_meta, "days": days, "last_day": last.isoformat()})
+        except Exception as e:
+            logger.error(f"Failed to generate {filename}: {e}", exc_info=True)
+            failed.append(filename)
+    _raise_if_failed(failed)
+    logger.info("Finished generating top committer JSON files.")
+
+
+def generate_language_json_files(base_meta):
+    """Generate the monthly most popular languages leaderboard from the rollup table.
 
+    The board is a range sum over the last LANGUAGE_ROLLUP_DAYS rows of
+    language_daily_stats, so it never rescans the repositories table. The
+    window ends yesterday (UTC), the last day with ``created:`` counts.
+    """
+    days = config.LANGUAGE_ROLLUP_DAYS
+    filename = config.LANGUAGES_FILENAME.format(days=days)
+    logger.info(f"Generating {filename}...")
+    last = _last_complete_utc_day()
+    items = get_language_rankings(config.REPOS_SQLITE_DB_PATH,
+                                  date_to_day(last - datetime.timedelta(days=days - 1)),
+                                  date_to_day(last), limit=config.LANGUAGE_LEADERBOARD_LIMIT)
+    _save_ranking_json(items, filename, "languages", "languages_count", "newRepos", "desc",
+                       {**base_meta, "days": days, "last_day": last.isoformat()})
+
+
+def _ranking_base_meta():
+    """Meta fields shared by every leaderboard: the latest total repo and user counts.
+
+    The other branch of the pipeline may not have stored today's count yet, so
+    each count falls back to the most recent day that has one.
+    """
     try:
-        repos_total_count, user_total_count, _, _  = get_total_count_by_datetime(
-            config.GITHUB_DB_INFO_PATH,
-            datetime.datetime.now().strftime("%Y%m%d"))
+        repos_total_count, user_total_count = get_latest_total_counts(config.GITHUB_DB_INFO_PATH)
     except Exception as e:
         logger.error(f"Failed to get total counts: {e}")
-        repos_total_count, user_total_count, _, _ = 0, 0, 0, 0
+        repos_total_count, user_total_count = 0, 0
 
-    base_meta = {
+    return {
         "repos_total_count": repos_total_count,
         "user_total_count": user_total_count,
     }
+
+
+def generate_trending_json_files():
+    """从数据库查询数据并生成 JSON 文件 (Deprecated, use generate_repo_json_files and generate_user_json_files)"""
+    logger.warning("generate_trending_json_files is deprecated. Use generate_repo_json_files and generate_user_json_files instead.")
+    # Keep the old logic for compatibility or remove if sure it's not needed
+    base_meta = _ranking_base_meta()
     generate_repo_json_files(base_meta)
     generate_user_json_files(base_meta)
 
@@ -648,30 +1362,120 @@ def initialize_database():
     os.makedirs(config.DATA_DIR, exist_ok=True)
 
 
-def fetch_data():
-    """获取GitHub用户和仓库数据"""
+def fetch_repos(resume=False, refresh_by_id=False):
+    """获取GitHub仓库数据
+
+    Args:
+        resume (bool): 从上一次中断的抓取断点继续，而不是重新开始
+        refresh_by_id (bool): 不进行搜索抓取，只按 node id 批量刷新数据库中已有的仓库
+    """
+    logger.info("Starting Repo Fetching")
+    if refresh_by_id:
+        refresh_known_repos()
+    else:
+        fetch_all_repos_by_graphql(max_number_of_repos=config.MAX_REPOS, number_of_repos_one_time=config.REPOS_ONE_TIME, resume=resume)
+    logger.info("Finished Repo Fetching")
+
+
+def fetch_users(resume=False, refresh_by_id=False):
+    """获取GitHub用户数据
+
+    Args:
+        resume (bool): 从上一次中断的抓取断点继续，而不是重新开始
+        refresh_by_id (bool): 不进行搜索抓取，只按 node id 批量刷新数据库中已有的用户
+    """
+    logger.info("Starting User Fetching")
+    if refresh_by_id:
+        refresh_known_users(usertopRepositories_count=config.USER_TOP_REPOSITORIES_COUNT)
+    else:
+        fetch_all_users_by_graphql(max_number_of_users=config.MAX_USERS, number_of_users_one_time=config.USERS_ONE_TIME, usertopRepositories_count=config.USER_TOP_REPOSITORIES_COUNT, resume=resume)
+    logger.info("Finished User Fetching")
+
+
+def fetch_data(resume=False, refresh_by_id=False):
+    """获取GitHub用户和仓库数据 (两个抓取并发执行，任一失败时抛出其异常)
+
+    Args:
+        resume (bool): 从上一次中断的抓取断点继续，而不是重新开始
+        refresh_by_id (bool): 不进行搜索抓取，只按 node id 批量刷新数据库中已有的仓库和用户
+    """
     logger.info("Starting Data Fetching")
-    try:
-        fetch_all_repos_by_graphql(max_number_of_repos=config.MAX_REPOS, number_of_repos_one_time=config.REPOS_ONE_TIME)
-        fetch_all_users_by_graphql(max_number_of_users=config.MAX_USERS, number_of_users_one_time=config.USERS_ONE_TIME, usertopRepositories_count=config.USER_TOP_REPOSITORIES_COUNT)
-        logger.info("Finished Data Fetching")
-    except Exception as e:
-        logger.exception(f"Data fetching failed: {e}:")
-        raise
+    engine = FetchEngine(max_workers=config.FETCH_MAX_WORKERS)
+    # The repo and user crawls are independent and share one rate limiter
+    results = engine.run({
+        "repos": lambda: fetch_repos(resume=resume, refresh_by_id=refresh_by_id),
+        "users": lambda: fetch_users(resume=resume, refresh_by_id=refresh_by_id),
+    })
+    logger.info(f"Rate limiter stats: {rate_limiter.stats()}")
+    logger.info(f"GitHub client stats: {github_client.stats()}")
+    errors = {name: result for name, result in results.items() if isinstance(result, Exception)}
+    if errors:
+        for name, e in errors.items():
+            logger.error(f"Data fetching failed for {name}: {e}")
+        raise next(iter(errors.values()))
+    logger.info("Finished Data Fetching")
 
 
 def update_stars_data():
     """更新星标统计数据"""
     logger.info("Updating Stars Data")
     try:
-        update_accumulatedStars_1d()
-        update_accumulatedStars_7d()
-        update_accumulatedStars_30d()
+        update_accumulated_stars()
     except Exception as e:
         logger.error(f"Failed to update stars data: {e}")
         raise
 
 
+def generate_repo_json():
+    """生成仓库榜单JSON文件"""
+    logger.info("Starting Repo JSON Generation")
+    generate_repo_json_files(_ranking_base_meta())
+
+
+def generate_star_velocity_json():
+    """生成Star速度和breakout榜单JSON文件"""
+    logger.info("Starting Star Velocity JSON Generation")
+    generate_star_velocity_json_files(_ranking_base_meta())
+
+
+def fetch_contributions():
+    """获取候选用户的每日贡献数据"""
+    logger.info("Starting Contribution Fetching")
+    fetch_user_contributions()
+    logger.info("Finished Contribution Fetching")
+
+
+def generate_contributor_json():
+    """生成最活跃用户榜单JSON文件"""
+    logger.info("Starting Top Committer JSON Generation")
+    generate_contributor_json_files(_ranking_base_meta())
+
+
+def update_language_rollup_data():
+    """更新每日语言汇总表 (按 UTC 昨天记录，与 newRepos 的日期一致)"""
+    logger.info("Updating Language Rollup")
+    update_language_rollup(config.REPOS_SQLITE_DB_PATH, date_to_day(_last_complete_utc_day()))
+
+
+def count_language_new_repos():
+    """统计各语言每天的新建仓库数"""
+    logger.info("Starting New Repo Counting")
+    fetch_language_new_repos()
+    logger.info("Finished New Repo Counting")
+
+
+def generate_language_json():
+    """生成语言榜单JSON文件"""
+    logger.info("Starting Language JSON Generation")
+    generate_language_json_files(_ranking_base_meta())
+
+
+def generate_user_json():
+    """生成用户榜单JSON文件"""
+    logger.info("Starting User JSON Generation")
+    generate_user_json_files(_ranking_base_meta())
+
+
 def generate_json_files():
     """生成JSON文件"""
     logger.info("Starting JSON Generation")
@@ -688,6 +1492,7 @@ def archive_and_save():
     logger.info("Starting Archiving")
     try:
         archive_data()
+        record_star_history()
         save_update_time()
         logger.info("Finished Archiving")
     except Exception as e:
@@ -695,36 +1500,187 @@ def archive_and_save():
         raise
 
 
-def run_pipeline():
-    """Runs the full data fetching and processing pipeline."""
-    steps = [
-        ("Initializing Database", initialize_database),
-        ("Fetching Data", fetch_data),
-        ("Updating Stars Data", update_stars_data),
-        ("Generating JSON Files", generate_json_files),
-        ("Archiving Data", archive_and_save),
-        ("Checking DB Size", check_db_size),
+def compact_archive_months():
+    """把已结束的月份压缩为归档包"""
+    logger.info("Starting Archive Compaction")
+    months = compact_archive()
+    logger.info(f"Finished Archive Compaction ({len(months)} months compacted)")
+
+
+def _total_db_stats():
+    """Sums the counters of every database engine"""
+    totals = {}
+    for stats in get_engine_stats().values():
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def save_run_metrics(metrics):
+    """Writes run_metrics.json, appends the steps to the history table and logs slow steps."""
+    try:
+        metrics.save(os.path.join(config.DATA_DIR, config.RUN_METRICS_FILENAME))
+        history = get_recent_pipeline_step_metrics(config.GITHUB_DB_INFO_PATH, config.METRICS_HISTORY_RUNS,
+                                                   exclude_run_id=metrics.run_id)
+        save_pipeline_step_metrics(config.GITHUB_DB_INFO_PATH, metrics.run_id, metrics.steps)
+        for regression in find_regressions(metrics.steps, history, config.METRICS_REGRESSION_FACTOR):
+            logger.warning(f"Slower than usual: {regression}")
+    except Exception as e:
+        # Metrics must never fail the run
+        logger.error(f"Failed to save run metrics: {e}", exc_info=True)
+
+
+def pipeline_steps(resume=False, refresh_by_id=False) -> List[PipelineStep]:
+    """Declares the pipeline steps and the artifacts each one reads and produces.
+
+    The repo and user branches only meet at archiving, so the users leaderboard
+    is still published when the repo crawl fails (and vice versa). Archiving
+    needs both leaderboards: archiving yesterday's files as today's would
+    corrupt the star history.
+    """
+    return [
+        PipelineStep("Initializing Database", initialize_database, outputs=["data_dir"]),
+        PipelineStep("Fetching Repos", lambda: fetch_repos(resume=resume, refresh_by_id=refresh_by_id),
+                     inputs=["data_dir"], outputs=["repos_db"]),
+        PipelineStep("Fetching Users", lambda: fetch_users(resume=resume, refresh_by_id=refresh_by_id),
+                     inputs=["data_dir"], outputs=["users_db"]),
+        PipelineStep("Updating Stars Data", update_stars_data, inputs=["repos_db"], outputs=["star_deltas"]),
+        PipelineStep("Generating Repo JSON", generate_repo_json, inputs=["repos_db", "star_deltas"],
+                     outputs=["repo_json"]),
+        PipelineStep("Generating Star Velocity JSON", generate_star_velocity_json, inputs=["repos_db"],
+                     outputs=["velocity_json"]),
+        PipelineStep("Updating Language Rollup", update_language_rollup_data, inputs=["star_deltas"],
+                     outputs=["language_rollup"]),
+        PipelineStep("Counting New Repos", count_language_new_repos, inputs=["language_rollup"],
+                     outputs=["language_new_repos"]),
+        PipelineStep("Generating Language JSON", generate_language_json,
+                     inputs=["language_rollup", "language_new_repos"], outputs=["language_json"]),
+        PipelineStep("Generating User JSON", generate_user_json, inputs=["users_db"], outputs=["user_json"]),
+        PipelineStep("Fetching Contributions", fetch_contributions, inputs=["users_db"],
+                     outputs=["contributions_db"]),
+        PipelineStep("Generating Top Committer JSON", generate_contributor_json, inputs=["contributions_db"],
+                     outputs=["contributor_json"]),
+        PipelineStep("Archiving Data", archive_and_save, inputs=["repo_json", "user_json"],
+                     outputs=["archive"]),
+        PipelineStep("Compacting Archive", compact_archive_months, inputs=["archive"],
+                     outputs=["archive_bundles"]),
+        PipelineStep("Checking DB Size", check_db_size, inputs=["repos_db", "users_db", "archive"],
+                     run_on_failure=True),
     ]
 
-    for name, step_func in steps:
-        logger.info(f"--- Starting Step: {name} ---")
-        try:
-            step_func()
-            logger.info(f"--- Finished Step: {name} ---")
-        except Exception as e:
-            logger.error(f"--- Step Failed: {name} - {e} ---")
-            # Optionally re-raise the exception if one step failure should stop the whole pipeline
-            # raise
-            return False # Indicate failure
-    return True # Indicate success
-
-def main():
-    if run_pipeline():
+
+def run_pipeline(resume=False, refresh_by_id=False, profile=False, trace_memory=False):
+    """Runs the full data fetching and processing pipeline.
+
+    The steps form a DAG (see ``pipeline_steps``): independent branches run
+    concurrently and a failed step only skips the steps that depend on it.
+    With ``resume`` the fetch steps continue the last interrupted crawl instead
+    of starting over; the later steps are idempotent and simply run again.
+    With ``refresh_by_id`` the fetch steps refresh the stored repos and users
+    through batched ``nodes(ids:)`` lookups instead of crawling search.
+    Every step is timed and its counters (HTTP requests, rate-limit sleep, DB
+    statements and rows, bytes written) are saved to ``run_metrics.json`` and
+    the metrics history table; ``profile`` and ``trace_memory`` add cProfile
+    and tracemalloc data per step.
+
+    Returns:
+        int: EXIT_OK when every step succeeded, EXIT_PARTIAL when some steps
+        failed but at least one leaderboard was generated, EXIT_FAILED otherwise.
+    """
+    metrics = PipelineMetrics(profile=profile, trace_memory=trace_memory, profile_dir=config.PROFILE_DIR)
+    metrics.add_counter_source("http", github_client.stats,
+                               keys=["requests", "errors", "bytes_received", "bytes_decoded", "points_used"])
+    metrics.add_counter_source("rate_limit", rate_limiter.stats, keys=["sleep_seconds"])
+    metrics.add_counter_source("db", _total_db_stats)
+    metrics.add_counter_source("files", lambda: {"bytes_written": get_bytes_written()})
+    metrics.add_counter_source("star_cache", star_snapshot_cache_stats, keys=["hits", "misses", "evictions"])
+
+    dag = PipelineDAG(pipeline_steps(resume=resume, refresh_by_id=refresh_by_id))
+    status = dag.run(max_workers=config.PIPELINE_MAX_WORKERS, wrap=metrics.step,
+                     on_skip=lambda name, failed: metrics.skip(name, f"upstream failed: {', '.join(failed)}"))
+    logger.info(f"Rate limiter stats: {rate_limiter.stats()}")
+    logger.info(f"GitHub client stats: {github_client.stats()}")
+    logger.info(f"Pipeline step status: {status}")
+    save_run_metrics(metrics)
+    return _pipeline_exit_code(dag, status)
+
+
+def _pipeline_exit_code(dag: PipelineDAG, status: Dict[str, str]) -> int:
+    """Maps the step status to the exit code that decides whether CI still publishes."""
+    if all(result == STATUS_OK for result in status.values()):
+        return EXIT_OK
+    published = [name for name, result in status.items()
+                 if result == STATUS_OK and any(output.endswith("_json") for output in dag.steps[name].outputs)]
+    if published:
+        logger.error(f"Pipeline partially failed, leaderboards generated by: {', '.join(published)}")
+        return EXIT_PARTIAL
+    logger.error("Pipeline failed, no leaderboard was generated")
+    return EXIT_FAILED
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch GitHub data and generate the CodeLegend leaderboards.")
+    parser.add_argument("--backfill-star-history", action="store_true",
+                        help="Import the existing JSON archive into the star history store and exit.")
+    parser.add_argument("--rebuild-archive-index", action="store_true",
+                        help="Rebuild every monthly archive index shard from the archive tree and exit.")
+    parser.add_argument("--verify-archive-index", action="store_true",
+                        help="Check the monthly archive index shards against the archive tree and exit.")
+    parser.add_argument("--dedup-archive", action="store_true",
+                        help="Convert the existing archive days to config.ARCHIVE_STORAGE (content-addressed blobs) and exit.")
+    parser.add_argument("--compact-archive", action="store_true",
+                        help="Compact closed archive months into one zip bundle per month and exit.")
+    parser.add_argument("--build-star-sidecars", action="store_true",
+                        help="Write the binary star snapshot sidecar of every archived day that lacks one and exit.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last interrupted crawl from its checkpoints instead of starting over.")
+    parser.add_argument("--refresh-by-id", action="store_true",
+                        help="Refresh the repos and users already in the db by node id instead of crawling search.")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Append every GraphQL request and response to a JSON Lines file for offline replay.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile every pipeline step with cProfile (.prof files go to config.PROFILE_DIR).")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record the peak memory and top allocations of every pipeline step with tracemalloc.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.record:
+        github_client.recorder = GraphQLRecorder(args.record)
+    try:
+        if args.backfill_star_history:
+            backfill_star_history()
+            exit_code = EXIT_OK
+        elif args.rebuild_archive_index:
+            rebuild_archive_index()
+            exit_code = EXIT_OK
+        elif args.verify_archive_index:
+            exit_code = EXIT_OK if verify_archive_index() else EXIT_FAILED
+        elif args.dedup_archive:
+            dedup_archive()
+            exit_code = EXIT_OK
+        elif args.compact_archive:
+            compact_archive()
+            exit_code = EXIT_OK
+        elif args.build_star_sidecars:
+            build_star_sidecars()
+            exit_code = EXIT_OK
+        else:
+            exit_code = run_pipeline(resume=args.resume, refresh_by_id=args.refresh_by_id,
+                                     profile=args.profile, trace_memory=args.trace_memory)
+    finally:
+        logger.info(f"Database engine stats: {get_engine_stats()}")
+        dispose_engines()
+        github_client.close()
+        if github_client.recorder is not None:
+            github_client.recorder.close()
+    if exit_code == EXIT_OK:
         logger.info("Script finished successfully")
-        return 0
     else:
         logger.error("Script finished with errors")
-        return 1
+    return exit_code
 
 
 if __name__ == "__main__":
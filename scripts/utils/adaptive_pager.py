@@ -0,0 +1,114 @@
+import threading
+from typing import Dict, Optional
+
+from config import logger
+
+
+class AdaptivePager:
+    """根据响应耗时、GraphQL 查询成本和失败情况自适应调整搜索分页大小。
+
+    嵌套较深的大页面容易触发 GitHub 的 502 和超时，固定的页大小要么过大
+    (反复失败重试)，要么过小 (浪费请求次数)。失败时页大小减半；连续几页
+    响应既快又便宜时逐步放大，但不再超过已经失败过的大小；响应变慢或成本
+    超出上限时适当缩小。同一次抓取的所有分片线程共享一个实例。
+    """
+
+    def __init__(self,
+                 name: str,
+                 initial_size: int,
+                 max_size: int = 100,
+                 min_size: int = 5,
+                 fast_seconds: float = 2.0,
+                 slow_seconds: float = 8.0,
+                 max_cost: int = 10,
+                 growth: float = 1.25,
+                 grow_after: int = 2):
+        """
+        Args:
+            name (str): 用于日志的名称 (如查询的 operation name)。
+            initial_size (int): 初始页大小。
+            max_size (int): 最大页大小 (GitHub 的 ``first`` 上限为 100)。
+            min_size (int): 最小页大小，失败时不再继续缩小。
+            fast_seconds (float): 响应耗时不超过该值才视为快速响应。
+            slow_seconds (float): 响应耗时超过该值时缩小页大小。
+            max_cost (int): 单页允许消耗的最大点数。
+            growth (float): 每次放大的倍数。
+            grow_after (int): 连续多少个快速且便宜的页面后放大一次。
+        """
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.min_size = max(1, min(min_size, self.max_size))
+        self.fast_seconds = fast_seconds
+        self.slow_seconds = slow_seconds
+        self.max_cost = max_cost
+        self.growth = growth
+        self.grow_after = max(1, grow_after)
+
+        self._lock = threading.Lock()
+        self._size = max(self.min_size, min(initial_size, self.max_size))
+        self._streak = 0
+        self._ceiling = self.max_size  # 放大时的上限，失败后降到失败页大小以下
+
+        # 统计信息
+        self.pages = 0
+        self.failures = 0
+        self.smallest = self._size
+        self.largest = self._size
+
+    def size(self) -> int:
+        """返回下一页应请求的大小。"""
+        with self._lock:
+            return self._size
+
+    def _resize(self, size: int, reason: str):
+        """在持有锁时调整页大小并记录日志。"""
+        size = max(self.min_size, min(size, self._ceiling))
+        if size == self._size:
+            return
+        logger.info(f"{self.name}: page size {self._size} -> {size} ({reason})")
+        self._size = size
+        self._streak = 0
+        self.smallest = min(self.smallest, size)
+        self.largest = max(self.largest, size)
+
+    def record_success(self, size: int, seconds: float, cost: Optional[int] = None):
+        """记录一个成功的页面。
+
+        Args:
+            size (int): 该页请求的大小。
+            seconds (float): 服务端响应耗时 (秒)。
+            cost (Optional[int]): 响应中 ``rateLimit.cost`` 报告的点数。
+        """
+        with self._lock:
+            self.pages += 1
+            too_expensive = cost is not None and cost > self.max_cost
+            if seconds > self.slow_seconds or too_expensive:
+                self._resize(int(size * 0.75), f"{seconds:.1f}s, cost {cost}")
+            elif seconds <= self.fast_seconds and size >= self._size:
+                # 只有按当前 (或更大) 页大小请求的页面才能说明可以继续放大
+                self._streak += 1
+                if self._streak >= self.grow_after:
+                    self._resize(max(size + 1, int(size * self.growth)), f"{seconds:.1f}s, cost {cost}")
+
+    def record_failure(self, size: int, error: Exception):
+        """记录一次 502/超时失败，页大小减半。
+
+        Args:
+            size (int): 失败请求的页大小。
+            error (Exception): 失败原因。
+        """
+        with self._lock:
+            self.failures += 1
+            self._ceiling = max(self.min_size, min(self._ceiling, size - 1))
+            self._resize(min(self._size, size // 2), f"{type(error).__name__}")
+
+    def stats(self) -> Dict:
+        """返回分页器的统计信息。"""
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "failures": self.failures,
+                "size": self._size,
+                "smallest": self.smallest,
+                "largest": self.largest,
+            }
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import zipfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import logger
+
+# 归档目录下的内容寻址存储
+BLOBS_DIRNAME = "blobs"  # 整个文件按 sha256 存储：blobs/ab/<sha256>.json
+RECORDS_DIRNAME = "records"  # 榜单记录按哈希存储：records/ab.jsonl，每行 ["<hash>", {记录}]
+MANIFEST_FILENAME = "manifest.json"  # 每天的归档目录中，文件名到 blob 路径的映射
+BUNDLES_DIRNAME = "bundles"  # 按月压缩的归档包：bundles/YYYY-MM.zip，成员名为 YYYY/MM/DD/<文件名>
+
+RECORDS_FORMAT = "records"
+# 记录哈希的十六进制位数 (64 位)，几十万条记录的碰撞概率可以忽略
+_RECORD_HASH_CHARS = 16
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _atomic_write(path: str, payload: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def put_blob(archive_dir: str, payload: bytes, ext: str = ".json") -> Tuple[str, int]:
+    """按内容哈希保存文件，内容已存在时不再写入。
+
+    Args:
+        archive_dir (str): 归档根目录。
+        payload (bytes): 文件内容。
+        ext (str): blob 文件的扩展名 (保留原文件的扩展名，便于静态站点按类型返回)。
+
+    Returns:
+        Tuple[str, int]: blob 相对 archive_dir 的路径 (使用 /)，以及实际写出的字节数。
+    """
+    digest = hashlib.sha256(payload).hexdigest()
+    rel_path = f"{BLOBS_DIRNAME}/{digest[:2]}/{digest}{ext}"
+    path = os.path.join(archive_dir, *rel_path.split("/"))
+    if os.path.exists(path):
+        return rel_path, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, payload)
+    return rel_path, len(payload)
+
+
+def read_manifest(day_dir: str) -> Optional[Dict[str, str]]:
+    """读取某天的归档清单 {文件名: blob 相对路径}，不存在时返回 None。"""
+    path = os.path.join(day_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+
+def write_manifest(day_dir: str, files: Dict[str, str]) -> int:
+    """写入某天的归档清单，返回写出的字节数。"""
+    payload = json.dumps({"files": dict(sorted(files.items()))}, ensure_ascii=False, indent=2).encode("utf-8")
+    os.makedirs(day_dir, exist_ok=True)
+    _atomic_write(os.path.join(day_dir, MANIFEST_FILENAME), payload)
+    return len(payload)
+
+
+def split_records(data) -> Optional[str]:
+    """返回榜单文件中记录列表所在的键 ({"meta": ..., key: [dict, ...]})，不是这种结构时返回 None。"""
+    if not isinstance(data, dict):
+        return None
+    keys = [key for key, value in data.items()
+            if isinstance(value, list) and all(isinstance(item, dict) for item in value)]
+    return keys[0] if len(keys) == 1 else None
+
+
+class RecordStore:
+    """按内容哈希保存榜单记录，每条不变的记录只保存一次。
+
+    记录按哈希前两位分到 256 个只追加的 JSON Lines 分片中 (``records/ab.jsonl``)，
+    每天只追加新出现的记录。写入时只需载入分片中的哈希，读取时才解析记录本身。
+    """
+
+    def __init__(self, archive_dir: str):
+        self.root = os.path.join(archive_dir, RECORDS_DIRNAME)
+        self._hashes: Dict[str, set] = {}
+        self._records: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _shard_path(self, prefix: str) -> str:
+        return os.path.join(self.root, f"{prefix}.jsonl")
+
+    def _iter_lines(self, prefix: str):
+        path = self._shard_path(prefix)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield line
+
+    def _shard_hashes(self, prefix: str) -> set:
+        hashes = self._hashes.get(prefix)
+        if hashes is None:
+            # 每行以 ["<hash>", 开头，不必解析记录
+            hashes = {line[2:2 + _RECORD_HASH_CHARS] for line in self._iter_lines(prefix)}
+            self._hashes[prefix] = hashes
+        return hashes
+
+    def _shard_records(self, prefix: str) -> Dict[str, dict]:
+        records = self._records.get(prefix)
+        if records is None:
+            records = dict(json.loads(line) for line in self._iter_lines(prefix))
+            self._records[prefix] = records
+        return records
+
+    def put(self, records: Iterable[dict]) -> Tuple[List[str], int]:
+        """保存记录，返回每条记录的哈希和实际写出的字节数。"""
+        hashes = []
+        new_lines: Dict[str, List[str]] = {}
+        with self._lock:
+            for record in records:
+                text = _dumps(record)
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:_RECORD_HASH_CHARS]
+                hashes.append(digest)
+                prefix = digest[:2]
+                known = self._shard_hashes(prefix)
+                if digest not in known:
+                    known.add(digest)
+                    if prefix in self._records:
+                        self._records[prefix][digest] = record
+                    new_lines.setdefault(prefix, []).append(f'["{digest}",{text}]\n')
+            written = 0
+            if new_lines:
+                os.makedirs(self.root, exist_ok=True)
+            for prefix, lines in new_lines.items():
+                payload = "".join(lines).encode("utf-8")
+                with open(self._shard_path(prefix), "ab") as f:
+                    f.write(payload)
+                written += len(payload)
+        return hashes, written
+
+    def get_many(self, hashes: List[str]) -> List[dict]:
+        """按哈希读取记录 (顺序与 hashes 一致)。
+
+        Raises:
+            KeyError: 记录不存在 (存储被截断或损坏)。
+        """
+        with self._lock:
+            return [self._shard_records(digest[:2])[digest] for digest in hashes]
+
+
+def encode_records(data: dict, data_key: str, store: RecordStore,
+                   volatile_fields: List[str]) -> Tuple[dict, int]:
+    """把榜单文件转换为记录引用格式，记录本身写入 store。
+
+    ``volatile_fields`` (如每次抓取都会变化的 updatedAt) 从记录中剥离，按列保存在文件中，
+    其余字段不变的记录在不同日期、不同榜单之间只保存一次。
+
+    Returns:
+        Tuple[dict, int]: 引用格式的文件内容，以及写入 store 的字节数。
+    """
+    records = data[data_key]
+    stripped = [{key: value for key, value in record.items() if key not in volatile_fields}
+                for record in records]
+    hashes, written = store.put(stripped)
+    fields = {}
+    for field in volatile_fields:
+        if any(field in record for record in records):
+            fields[field] = [record.get(field) for record in records]
+    doc = {
+        "format": RECORDS_FORMAT,
+        "data_key": data_key,
+        "keys": list(data),
+        **{key: value for key, value in data.items() if key != data_key},
+        "records": hashes,
+        "fields": fields,
+    }
+    return doc, written
+
+
+def decode_records(doc: dict, store: RecordStore) -> dict:
+    """还原记录引用格式的文件内容 (encode_records 的逆操作)。"""
+    data_key = doc["data_key"]
+    records = [dict(record) for record in store.get_many(doc["records"])]
+    for field, values in doc.get("fields", {}).items():
+        for record, value in zip(records, values):
+            record[field] = value
+    reserved = {"format", "data_key", "keys", "records", "fields"}
+    return {key: records if key == data_key else doc[key]
+            for key in doc.get("keys", [k for k in doc if k not in reserved] + [data_key])}
+
+
+def is_records_doc(data) -> bool:
+    return isinstance(data, dict) and data.get("format") == RECORDS_FORMAT and "records" in data
+
+
+def link_or_copy(src: str, dst: str) -> bool:
+    """为 src 创建硬链接 dst (已存在时替换)，文件系统不支持时复制，返回是否创建了硬链接。"""
+    tmp = f"{dst}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        linked = True
+    except OSError as e:
+        logger.debug(f"Hardlink {src} -> {dst} failed ({e}), copying instead")
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            fdst.write(fsrc.read())
+        linked = False
+    os.replace(tmp, dst)
+    return linked
+
+
+def bundle_path(archive_dir: str, month_key: str) -> str:
+    """返回某月 (YYYY-MM) 归档包的路径"""
+    return os.path.join(archive_dir, BUNDLES_DIRNAME, f"{month_key}.zip")
+
+
+def append_bundle(path: str, members: Iterable[Tuple[str, bytes]]) -> Dict[str, str]:
+    """把成员追加到一个 zip 归档包，返回本次给出的每个成员名到其内容 sha256 的映射。
+
+    已有的归档包先复制为临时文件，新成员追加在其后 (已有成员不重新解压和压缩)，
+    通过 CRC 校验后再原子替换；迭代 members 或写入时出错，原归档包保持不变。
+    每个成员单独 deflate 压缩，zip 末尾的中央目录记录每个成员的偏移量，
+    因此读取任一成员只需定位并解压该成员本身，而不必解压整个月份。
+
+    Raises:
+        ValueError: 归档包中已有同名但内容不同的成员。
+        IOError: 写出的归档包没有通过 CRC 校验。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    if os.path.exists(path):
+        shutil.copyfile(path, tmp)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+    digests = {}
+    try:
+        with zipfile.ZipFile(tmp, "a", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as bundle:
+            existing = set(bundle.namelist())
+            for name, payload in members:
+                digests[name] = hashlib.sha256(payload).hexdigest()
+                if name in existing:
+                    # 上次压缩在删除按天目录前中断：内容相同的成员无需再写
+                    if bundle.read(name) != payload:
+                        raise ValueError(f"Member {name} of bundle {path} differs from the archived file")
+                    continue
+                # 固定时间戳，内容不变时成员逐字节相同
+                bundle.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), payload,
+                                compress_type=zipfile.ZIP_DEFLATED, compresslevel=9)
+                existing.add(name)
+        with zipfile.ZipFile(tmp) as bundle:
+            bad = bundle.testzip()
+        if bad is not None:
+            raise IOError(f"Bundle {path} failed verification at member {bad}")
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return digests
+
+
+def verify_bundle(path: str, digests: Dict[str, str]) -> List[str]:
+    """逐个读取归档包中的成员并与期望的 sha256 比较，返回缺失或内容不一致的成员名"""
+    if not os.path.exists(path):
+        return sorted(digests)
+    bad = []
+    with zipfile.ZipFile(path) as bundle:
+        names = set(bundle.namelist())
+        for name, digest in sorted(digests.items()):
+            if name not in names or hashlib.sha256(bundle.read(name)).hexdigest() != digest:
+                bad.append(name)
+    return bad
+
+
+def bundle_members(path: str) -> List[str]:
+    """列出归档包中的成员名 (只读取中央目录)，归档包不存在时返回空列表"""
+    if not os.path.exists(path):
+        return []
+    with zipfile.ZipFile(path) as bundle:
+        return bundle.namelist()
+
+
+def read_bundle_member(path: str, name: str) -> Optional[bytes]:
+    """按中央目录中的偏移量读取并解压一个成员，归档包或成员不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    with zipfile.ZipFile(path) as bundle:
+        try:
+            return bundle.read(name)
+        except KeyError:
+            return None
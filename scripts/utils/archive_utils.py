@@ -1,10 +1,28 @@
 import datetime
+import gzip
 import json
 import os
+import re
 import shutil
+import threading
 
 import config
 
+try:
+    import brotli  # 可选依赖，未安装时不生成 .br 文件
+except ImportError:
+    brotli = None
+
+from .archive_store import (BLOBS_DIRNAME, MANIFEST_FILENAME, RecordStore,
+                            append_bundle, bundle_members, bundle_path, decode_records,
+                            encode_records, is_records_doc, link_or_copy,
+                            put_blob, read_bundle_member, read_manifest,
+                            split_records, verify_bundle, write_manifest)
+from .db_utils import (get_current_stars, get_star_history_days,
+                       get_star_snapshot, save_star_snapshot)
+from .star_sidecar import (SnapshotCache, StarSnapshot, decode_star_sidecar,
+                           load_star_sidecar, write_star_sidecar)
+
 logger = config.logger
 # 数据和归档目录路径
 # 这些路径需要从主脚本传递或在此处重新定义/计算
@@ -13,21 +31,73 @@ logger = config.logger
 # ARCHIVE_DIR = os.path.join(DATA_DIR, "archive") # Defined in config
 
 
-def save_json(data, filename):
-    """将数据保存为 JSON 文件"""
+# 写出的发布和归档文件的累计字节数，供管道指标统计
+_bytes_written = 0
+_bytes_written_lock = threading.Lock()
+
+
+def _count_bytes_written(n):
+    global _bytes_written
+    with _bytes_written_lock:
+        _bytes_written += n
+
+
+def get_bytes_written():
+    """返回本进程写出的 JSON、预压缩副本和归档文件的累计字节数"""
+    return _bytes_written
+
+
+def _json_serial(obj):
+    """Convert datetime objects to strings"""
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+def _dumps_json(data, compact=None):
+    """序列化为 JSON 字符串，compact 为 None 时使用 config.PUBLISH_COMPACT_JSON"""
+    if compact is None:
+        compact = config.PUBLISH_COMPACT_JSON
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_serial)
+    return json.dumps(data, ensure_ascii=False, indent=2, default=_json_serial)
+
+
+def _write_compressed_siblings(filename, payload: bytes):
+    """写出 .gz / .br 预压缩副本，供静态站点直接下载"""
+    for fmt in config.PUBLISH_COMPRESSED_FORMATS:
+        if fmt == "gz":
+            # mtime=0 keeps the output byte-identical across runs when the data is unchanged
+            compressed = gzip.compress(payload, compresslevel=9, mtime=0)
+        elif fmt == "br":
+            if brotli is None:
+                logger.debug(f"brotli is not installed, skipping {filename}.br")
+                continue
+            compressed = brotli.compress(payload, quality=config.PUBLISH_BROTLI_QUALITY)
+        else:
+            logger.warning(f"Unknown compressed format '{fmt}', skipping")
+            continue
+        with open(f"{filename}.{fmt}", "wb") as f:
+            f.write(compressed)
+        _count_bytes_written(len(compressed))
+
+
+def save_json(data, filename, compact=None, compress=False):
+    """将数据保存为 JSON 文件
+    Args:
+        data: 要保存的数据
+        filename (str): 文件路径
+        compact (bool or None): 是否输出无缩进的紧凑 JSON，默认使用 config.PUBLISH_COMPACT_JSON
+        compress (bool): 是否同时写出 .gz/.br 预压缩副本
+    """
     try:
-        # Convert datetime objects to strings
-        def json_serial(obj):
-            if isinstance(obj, (datetime.datetime, datetime.date)):
-                return obj.isoformat()
-            raise TypeError(f"Type {type(obj)} not serializable")
-
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data,
-                      f,
-                      ensure_ascii=False,
-                      indent=2,
-                      default=json_serial)
+        text = _dumps_json(data, compact)
+        payload = text.encode("utf-8")
+        with open(filename, "wb") as f:
+            f.write(payload)
+        _count_bytes_written(len(payload))
+        if compress:
+            _write_compressed_siblings(filename, payload)
         logger.debug(f"Successfully saved JSON to {filename}")
     except IOError as e:
         logger.error(f"I/O error saving JSON to {filename}: {e}")
@@ -42,8 +112,240 @@ def save_json(data, filename):
     # No finally block needed if we raise on critical errors like IOError
 
 
+class JsonStreamWriter:
+    """增量写出 {data_key: [item, ...], "meta": {...}} 结构的 JSON 文件
+
+    记录在到达时逐页追加写入临时文件，内存占用只与单页大小有关；
+    正常退出 with 块时写入 meta 并原子地重命名为目标文件，出错时删除临时文件、保留旧文件。
+    meta 在抓取结束后才能确定，因此写在记录列表之后。
+
+    用法:
+        with JsonStreamWriter(filename, "top_repos", unique_key="databaseId") as writer:
+            writer.write_items(page)
+            writer.meta = {...}
+    """
+
+    def __init__(self, filename, data_key, compact=None, compress=False, unique_key=None):
+        """
+        Args:
+            filename (str): 目标文件路径
+            data_key (str): 记录列表所在的键，如 "top_repos"
+            compact (bool or None): 是否输出紧凑 JSON，默认使用 config.PUBLISH_COMPACT_JSON
+            compress (bool): 是否同时流式写出 .gz 副本
+            unique_key (str or None): 按该字段去重，重复的记录只保留第一次写入的
+        """
+        self.filename = filename
+        self.data_key = data_key
+        self.compact = config.PUBLISH_COMPACT_JSON if compact is None else compact
+        self.compress = compress
+        self.unique_key = unique_key
+        self.meta = {}
+        self.count = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._files = []  # [(临时文件路径, 目标文件路径, 文件对象)]
+
+    def _write(self, text):
+        payload = text.encode("utf-8")
+        for _, _, f in self._files:
+            f.write(payload)
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        targets = [self.filename] + ([f"{self.filename}.gz"] if self.compress else [])
+        for target in targets:
+            tmp = f"{target}.tmp"
+            if target.endswith(".gz"):
+                f = gzip.GzipFile(tmp, "wb", compresslevel=6, mtime=0)
+            else:
+                f = open(tmp, "wb")
+            self._files.append((tmp, target, f))
+        self._write("{" + json.dumps(self.data_key) + ":[")
+        return self
+
+    def write_items(self, items):
+        """追加一页记录 (线程安全)
+
+        Returns:
+            int: 实际写入的记录数 (不含重复记录)
+        """
+        written = 0
+        with self._lock:
+            for item in items:
+                if self.unique_key is not None:
+                    key = item.get(self.unique_key)
+                    if key in self._seen:
+                        continue
+                    self._seen.add(key)
+                separator = "" if self.count == 0 else ("," if self.compact else ",\n")
+                self._write(separator + _dumps_json(item, self.compact))
+                self.count += 1
+                written += 1
+        return written
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._write("]," + json.dumps("meta") + ":" + _dumps_json(self.meta, self.compact) + "}")
+        finally:
+            for _, _, f in self._files:
+                f.close()
+        if exc_type is None:
+            for tmp, target, _ in self._files:
+                _count_bytes_written(os.path.getsize(tmp))
+                os.replace(tmp, target)
+            logger.debug(f"Streamed {self.count} items to {self.filename}")
+        else:
+            for tmp, _, _ in self._files:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            logger.error(f"Discarded partial output for {self.filename}: {exc}")
+        return False
+
+
+def to_columnar(data, data_key):
+    """将 {"meta": ..., data_key: [record, ...]} 转换为列式结构
+    所有记录共享一张字段名表 keys，每个字段的值保存为一个数组，避免重复的长字段名。
+    Args:
+        data (dict): 榜单数据
+        data_key (str): 记录列表所在的键，如 "top_repos"
+    Returns:
+        dict: {"meta", "format": "columnar", "data_key", "keys", "columns"}
+    """
+    records = data.get(data_key) or []
+    keys = []
+    for record in records:
+        for key in record:
+            if key not in keys:
+                keys.append(key)
+    return {
+        "meta": data.get("meta", {}),
+        "format": "columnar",
+        "data_key": data_key,
+        "keys": keys,
+        "columns": [[record.get(key) for record in records] for key in keys],
+    }
+
+
+def columnar_filename(filename):
+    """返回列式文件名，如 top_repos_list.json -> top_repos_list.columnar.json"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.columnar{ext}"
+
+
+def publish_pages(data, filename, data_key, page_size=None):
+    """将榜单切分为固定大小的分页文件，并写出分页清单
+    输出 {name}/page-0001.json ... 以及 {name}/manifest.json，前端只需下载当前页，
+    首屏耗时与榜单总长度无关。
+    Args:
+        data (dict): 榜单数据
+        filename (str): 榜单文件路径，分页目录与其同名 (去掉 .json)
+        data_key (str): 记录列表所在的键，如 "top_repos"
+        page_size (int or None): 每页记录数，默认使用 config.PUBLISH_PAGE_SIZE
+    """
+    page_size = page_size or config.PUBLISH_PAGE_SIZE
+    records = data.get(data_key) or []
+    pages_dir = os.path.splitext(filename)[0]
+    os.makedirs(pages_dir, exist_ok=True)
+    total_pages = max(1, -(-len(records) // page_size))
+    for page in range(1, total_pages + 1):
+        start = (page - 1) * page_size
+        save_json({"page": page, data_key: records[start:start + page_size]},
+                  os.path.join(pages_dir, f"page-{page:04d}.json"), compact=True, compress=True)
+    # 榜单变短时删除多余的旧分页
+    for fname in os.listdir(pages_dir):
+        match = re.fullmatch(r"page-(\d+)\.json(\.gz|\.br)?", fname)
+        if match and int(match.group(1)) > total_pages:
+            os.remove(os.path.join(pages_dir, fname))
+    manifest = {
+        "meta": data.get("meta", {}),
+        "format": "paged",
+        "data_key": data_key,
+        "total": len(records),
+        "page_size": page_size,
+        "pages": total_pages,
+    }
+    save_json(manifest, os.path.join(pages_dir, "manifest.json"), compact=True, compress=True)
+
+
+def publish_json(data, filename, data_key):
+    """发布前端使用的榜单 JSON：紧凑 JSON 及其预压缩副本，以及可选的列式版本和分页文件
+    Args:
+        data (dict): 榜单数据
+        filename (str): 文件路径
+        data_key (str): 记录列表所在的键，如 "top_repos"
+    """
+    save_json(data, filename, compress=True)
+    if config.PUBLISH_COLUMNAR:
+        save_json(to_columnar(data, data_key), columnar_filename(filename), compact=True, compress=True)
+    else:
+        # 前端优先加载列式文件，关闭后删除旧文件，避免加载过期数据
+        for path in (columnar_filename(filename), f"{columnar_filename(filename)}.gz",
+                     f"{columnar_filename(filename)}.br"):
+            if os.path.exists(path):
+                os.remove(path)
+    if config.PUBLISH_PAGE_SIZE > 0:
+        publish_pages(data, filename, data_key)
+
+
+# 每个归档目录一个 RecordStore，缓存已载入的记录分片
+_record_stores = {}
+_record_stores_lock = threading.Lock()
+
+
+def _record_store():
+    with _record_stores_lock:
+        store = _record_stores.get(config.ARCHIVE_DIR)
+        if store is None:
+            store = _record_stores[config.ARCHIVE_DIR] = RecordStore(config.ARCHIVE_DIR)
+        return store
+
+
+def _store_archive_blob(payload: bytes, fname: str) -> str:
+    """把一个归档文件的内容保存为 blob，返回相对 ARCHIVE_DIR 的路径
+    开启记录级去重时，榜单文件先转换为记录引用格式，记录本身写入记录存储。
+    """
+    ext = os.path.splitext(fname)[1]
+    if config.ARCHIVE_RECORD_DEDUP and ext == ".json":
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            data = None
+        data_key = split_records(data)
+        if data_key is not None:
+            doc, written = encode_records(data, data_key, _record_store(), config.ARCHIVE_VOLATILE_FIELDS)
+            _count_bytes_written(written)
+            payload = json.dumps(doc, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    rel_path, written = put_blob(config.ARCHIVE_DIR, payload, ext)
+    _count_bytes_written(written)
+    return rel_path
+
+
+def _archive_file(src: str, day_dir: str, fname: str, manifest: dict):
+    """按 config.ARCHIVE_STORAGE 归档一个文件 (manifest 方式时把 blob 路径记入 manifest)"""
+    dst = os.path.join(day_dir, fname)
+    if config.ARCHIVE_STORAGE == "copy":
+        shutil.copy2(src, dst) # Use copy2 to preserve metadata
+        _count_bytes_written(os.path.getsize(dst))
+        return
+    with open(src, "rb") as f:
+        payload = f.read()
+    if config.ARCHIVE_STORAGE == "hardlink":
+        rel_path, written = put_blob(config.ARCHIVE_DIR, payload, os.path.splitext(fname)[1])
+        _count_bytes_written(written)
+        link_or_copy(os.path.join(config.ARCHIVE_DIR, *rel_path.split("/")), dst)
+        return
+    manifest[fname] = _store_archive_blob(payload, fname)
+    # 同一天重复运行时，删除旧方式留下的完整副本，以 manifest 为准
+    if os.path.exists(dst):
+        os.remove(dst)
+
+
 def archive_data():
-    """归档当天生成的 JSON 文件并更新索引"""
+    """归档当天生成的 JSON 文件、写入 star 快照旁路文件并更新索引
+    文件的存储方式见 config.ARCHIVE_STORAGE：相同内容的文件只保存一份 blob，
+    manifest 方式下每天的目录只包含 manifest.json 和旁路文件。
+    """
     logger.info("Archiving generated JSON files...")
     os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
     today = datetime.date.today()
@@ -55,76 +357,206 @@ def archive_data():
 
     current_archive_dir = os.path.join(config.ARCHIVE_DIR, year, month, day)
     os.makedirs(current_archive_dir, exist_ok=True)
+    manifest = read_manifest(current_archive_dir) or {}
 
     for fname in archive_files_to_move:
         src = os.path.join(config.DATA_DIR, fname)
         if os.path.exists(src):
-            dst = os.path.join(current_archive_dir, fname)
             try:
-                shutil.copy2(src, dst) # Use copy2 to preserve metadata
-                logger.info(f"Archived {fname} to {dst}")
+                _archive_file(src, current_archive_dir, fname, manifest)
+                logger.info(f"Archived {fname} to {current_archive_dir} ({config.ARCHIVE_STORAGE})")
             except OSError as e:
-                logger.error(f"OS error copying {src} to {dst}: {e}")
+                logger.error(f"OS error archiving {src} to {current_archive_dir}: {e}")
             except Exception as e:
                 logger.error(f"Unexpected error archiving {fname}: {e}", exc_info=True)
         else:
             logger.warning(
                 f"Warning: {fname} not found in {config.DATA_DIR} for archiving."
             )
+    if manifest:
+        _count_bytes_written(write_manifest(current_archive_dir, manifest))
+    try:
+        _write_star_sidecar(today.strftime("%Y-%m-%d"), get_current_stars(config.REPOS_SQLITE_DB_PATH))
+    except Exception as e:
+        logger.error(f"Failed to write the star sidecar for {today}: {e}", exc_info=True)
 
     # --- Update archive_index.json ---
-    logger.info("Updating archive index...")
-    index_file_path = os.path.join(config.DATA_DIR,
-                                   config.ARCHIVE_INDEX_FILENAME)
-    index = {}
-    # Load existing index if it exists
-    if os.path.exists(index_file_path):
-        try:
-            with open(index_file_path, 'r', encoding='utf-8') as f:
-                index = json.load(f)
-        except json.JSONDecodeError:
-            logger.warning(
-                f"Warning: Could not decode existing {index_file_path}. Starting fresh index."
-            )
-        except IOError as e:
-            logger.warning(
-                f"Warning: Could not read existing {index_file_path}: {e}. Starting fresh index."
-            )
+    update_archive_index(today)
+
 
-    # Walk the archive directory to build/update the index
-    for root, dirs, files in os.walk(config.ARCHIVE_DIR):
-        # Skip the top-level archive directory itself
-        if root == config.ARCHIVE_DIR:
+def dedup_archive():
+    """把已有的归档目录转换为 config.ARCHIVE_STORAGE 指定的存储方式 (按需手动执行)
+    Returns:
+        int: 转换的天数
+    """
+    if config.ARCHIVE_STORAGE == "copy":
+        logger.info("ARCHIVE_STORAGE is 'copy', nothing to deduplicate")
+        return 0
+    converted = 0
+    for date_str in _iter_archive_dates(include_bundles=False):
+        day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+        manifest = read_manifest(day_dir) or {}
+        # star 快照旁路文件保留在目录中 (需要直接内存映射)
+        files = [fname for fname in sorted(os.listdir(day_dir))
+                 if fname not in (MANIFEST_FILENAME, config.ARCHIVE_STARS_SIDECAR)
+                 and os.path.isfile(os.path.join(day_dir, fname)) and not fname.endswith(".tmp")]
+        if not files:
+            continue
+        if config.ARCHIVE_STORAGE == "hardlink" and all(
+                os.stat(os.path.join(day_dir, fname)).st_nlink > 1 for fname in files):
             continue
-        for file in files:
-            if file.endswith(".json"):
-                # Construct relative path from data_dir for web accessibility
-                full_file_path = os.path.join(root, file)
-                rel_path_from_data = os.path.relpath(full_file_path,
-                                                     config.DATA_DIR)
-                # Extract date and key from path structure: archive/YYYY/MM/DD/filename.json
-                parts = rel_path_from_data.split(os.sep)
-                if len(parts) >= 5 and parts[
-                        0] == 'archive':  # Ensure correct structure
-                    try:
-                        y, m, d, fname = parts[1], parts[2], parts[3], parts[4]
-                        date_str = f"{y}-{m}-{d}"
-                        # Validate date format
-                        datetime.datetime.strptime(date_str, '%Y-%m-%d')
-                        key = fname.replace(".json", "")
-                        if date_str not in index:
-                            index[date_str] = {}
-                        # Store relative path using forward slashes for web compatibility
-                        index[date_str][key] = rel_path_from_data.replace(
-                            os.sep, "/")
-                    except (ValueError, IndexError) as e:
-                        logger.warning(
-                            f"Warning: Could not parse date/key from path '{rel_path_from_data}': {e}"
-                        )
-
-    # Save the updated index
-    save_json(index, index_file_path)
-    logger.info(f"Archive index updated and saved to {index_file_path}")
+        for fname in files:
+            _archive_file(os.path.join(day_dir, fname), day_dir, fname, manifest)
+        if manifest:
+            write_manifest(day_dir, manifest)
+        converted += 1
+    logger.info(f"Converted {converted} archived days to '{config.ARCHIVE_STORAGE}' storage")
+    rebuild_archive_index()
+    return converted
+
+
+def _month_index_path(month_key: str) -> str:
+    """返回月度索引分片的路径，month_key 格式为 YYYY-MM"""
+    return os.path.join(config.ARCHIVE_DIR, config.ARCHIVE_INDEX_DIRNAME, f"{month_key}.json")
+
+
+def _load_json_or_none(path: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"Warning: Could not read existing {path}: {e}. Rebuilding it.")
+        return None
+
+
+def _scan_archive_day(date_str: str) -> dict:
+    """扫描某一天的归档目录，返回 {key: 相对 DATA_DIR 的路径}
+    manifest 方式归档的文件指向其 blob (记录级去重的 blob 需要通过 read_archived_json 还原)。
+    """
+    day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+    entries = {}
+    if os.path.isdir(day_dir):
+        for fname, blob in (read_manifest(day_dir) or {}).items():
+            if fname.endswith(".json"):
+                rel_path = os.path.relpath(os.path.join(config.ARCHIVE_DIR, *blob.split("/")), config.DATA_DIR)
+                entries[fname[:-len(".json")]] = rel_path.replace(os.sep, "/")
+        for fname in sorted(os.listdir(day_dir)):
+            if fname.endswith(".json") and fname != MANIFEST_FILENAME:
+                rel_path = os.path.relpath(os.path.join(day_dir, fname), config.DATA_DIR)
+                # Store relative path using forward slashes for web compatibility
+                entries[fname[:-len(".json")]] = rel_path.replace(os.sep, "/")
+    return dict(sorted(entries.items()))
+
+
+def _bundle_entries(month_key: str) -> dict:
+    """列出某月归档包中的文件，返回 {YYYY-MM-DD: {文件名: 成员名}}"""
+    entries = {}
+    for member in bundle_members(bundle_path(config.ARCHIVE_DIR, month_key)):
+        year, month, day, fname = member.split("/", 3)
+        entries.setdefault(f"{year}-{month}-{day}", {})[fname] = member
+    return entries
+
+
+def _scan_archive_month(month_key: str) -> dict:
+    """扫描某个月的所有归档目录和归档包，返回该月的索引分片内容
+    归档包中的文件以 ``archive/bundles/YYYY-MM.zip#YYYY/MM/DD/<文件名>`` 表示。
+    """
+    month_index = {}
+    bundle_rel = os.path.relpath(bundle_path(config.ARCHIVE_DIR, month_key), config.DATA_DIR).replace(os.sep, "/")
+    for date_str, files in _bundle_entries(month_key).items():
+        entries = {fname[:-len(".json")]: f"{bundle_rel}#{member}"
+                   for fname, member in files.items() if fname.endswith(".json")}
+        if entries:
+            month_index[date_str] = dict(sorted(entries.items()))
+    year, month = month_key.split('-')
+    month_dir = os.path.join(config.ARCHIVE_DIR, year, month)
+    if os.path.isdir(month_dir):
+        for day in sorted(os.listdir(month_dir)):
+            date_str = f"{year}-{month}-{day}"
+            try:
+                datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            except ValueError:
+                logger.warning(f"Warning: Could not parse date from archive path '{month_dir}/{day}'")
+                continue
+            entries = _scan_archive_day(date_str)
+            if entries:
+                month_index[date_str] = {**month_index.get(date_str, {}), **entries}
+    return dict(sorted(month_index.items()))
+
+
+def _save_archive_manifest():
+    """根据已有的月度索引分片重新生成顶层 archive_index.json（只列目录，不扫描归档）"""
+    index_dir = os.path.join(config.ARCHIVE_DIR, config.ARCHIVE_INDEX_DIRNAME)
+    months = {}
+    if os.path.isdir(index_dir):
+        for fname in sorted(os.listdir(index_dir)):
+            if fname.endswith(".json"):
+                month_key = fname[:-len(".json")]
+                rel_path = os.path.relpath(os.path.join(index_dir, fname), config.DATA_DIR)
+                months[month_key] = rel_path.replace(os.sep, "/")
+    manifest = {"months": months, "latest_month": max(months) if months else None}
+    index_file_path = os.path.join(config.DATA_DIR, config.ARCHIVE_INDEX_FILENAME)
+    save_json(manifest, index_file_path)
+    logger.info(f"Archive index manifest with {len(months)} months saved to {index_file_path}")
+
+
+def update_archive_index(date: datetime.date):
+    """增量更新归档索引：只把指定日期的条目加入所在月份的索引分片
+    索引按月分片保存在 archive/index/YYYY-MM.json，分片不存在或损坏时只扫描该月重建。
+    Args:
+        date (datetime.date): 新归档的日期
+    """
+    logger.info("Updating archive index...")
+    month_key = date.strftime("%Y-%m")
+    month_index_path = _month_index_path(month_key)
+    month_index = _load_json_or_none(month_index_path)
+    if month_index is None:
+        month_index = _scan_archive_month(month_key)
+    date_str = date.strftime("%Y-%m-%d")
+    entries = _scan_archive_day(date_str)
+    if entries:
+        month_index[date_str] = entries
+    os.makedirs(os.path.dirname(month_index_path), exist_ok=True)
+    save_json(dict(sorted(month_index.items())), month_index_path)
+    _save_archive_manifest()
+    logger.info(f"Archive index updated for {date_str} in {month_index_path}")
+
+
+def _archive_months():
+    """列出归档目录中所有的月份 (YYYY-MM)"""
+    return sorted({date_str[:7] for date_str in _iter_archive_dates()})
+
+
+def rebuild_archive_index():
+    """全量扫描归档目录，重建所有月度索引分片和顶层索引（按需手动执行）"""
+    logger.info("Rebuilding archive index from scratch...")
+    for month_key in _archive_months():
+        month_index_path = _month_index_path(month_key)
+        os.makedirs(os.path.dirname(month_index_path), exist_ok=True)
+        save_json(_scan_archive_month(month_key), month_index_path)
+    _save_archive_manifest()
+
+
+def verify_archive_index():
+    """校验月度索引分片与归档目录是否一致
+    Returns:
+        bool: 全部一致时返回 True
+    """
+    ok = True
+    for month_key in _archive_months():
+        expected = _scan_archive_month(month_key)
+        actual = _load_json_or_none(_month_index_path(month_key)) or {}
+        if actual != expected:
+            missing = sorted(set(expected) - set(actual))
+            stale = sorted(set(actual) - set(expected))
+            logger.warning(f"Archive index for {month_key} is out of date "
+                           f"(missing: {missing}, stale: {stale}, changed: "
+                           f"{sorted(d for d in set(actual) & set(expected) if actual[d] != expected[d])})")
+            ok = False
+    logger.info(f"Archive index verification {'passed' if ok else 'failed'}")
+    return ok
 
 
 def save_update_time():
@@ -139,6 +571,42 @@ def save_update_time():
         logger.error(f"Error saving update time to {filepath}: {e}")
 
 
+def _read_stored_archive_file(date_str: str, fname: str):
+    """读取某天归档目录中 fname 的存储内容 (目录中的文件或 manifest 指向的 blob)，没有时返回 None"""
+    day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+    path = os.path.join(day_dir, fname)
+    if not os.path.exists(path):
+        blob = (read_manifest(day_dir) or {}).get(fname)
+        if blob is None:
+            return None
+        path = os.path.join(config.ARCHIVE_DIR, *blob.split("/"))
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_archived_json(date_str: str, fname: str):
+    """读取某一天归档的 JSON 文件，不论其以哪种方式存储
+    依次查找归档目录中的文件 (copy / hardlink 方式)、manifest 指向的 blob 和该月的归档包
+    (只解压这一个成员)，记录引用格式的内容会从记录存储还原为原始内容。
+    Args:
+        date_str (str): 日期字符串，格式为 YYYY-MM-DD
+        fname (str): 归档的文件名，如 top_repos_list.json
+    Returns:
+        dict or None: 文件内容，没有该文件时返回 None
+    """
+    payload = _read_stored_archive_file(date_str, fname)
+    if payload is None:
+        year, month, day = date_str.split('-')
+        payload = read_bundle_member(bundle_path(config.ARCHIVE_DIR, f"{year}-{month}"),
+                                     f"{year}/{month}/{day}/{fname}")
+        if payload is None:
+            return None
+    data = json.loads(payload)
+    if is_records_doc(data):
+        data = decode_records(data, _record_store())
+    return data
+
+
 # 读取指定时间的归档的 top_repos.json 文件
 def read_archived_top_repos_by_date(date_str: str):
     """读取指定时间的归档的 top_repos.json
@@ -152,17 +620,12 @@ def read_archived_top_repos_by_date(date_str: str):
     except ValueError:
         raise ValueError(
             "Invalid date string format. Expected format is YYYY-MM-DD.")
-    # archive_path format: archive/YYYY/MM/DD/top_repos.json
-    # convert YYYY-MM-DD to YYYY/MM/DD
-    archive_path = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'),
-                                config.TOP_REPOS_FILENAME)
-    if not os.path.exists(archive_path):
+    data = read_archived_json(date_str, config.TOP_REPOS_FILENAME)
+    if data is None:
         logger.warning(
-            f"Archive file at date {date_str} not found at {archive_path}, skip "
+            f"Archive file {config.TOP_REPOS_FILENAME} at date {date_str} not found, skip "
         )
-        return None
-    with open(archive_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return data
 
 
 def read_archived_top_repos_days_before(days: int):
@@ -191,3 +654,326 @@ def read_archived_top_repos_7d_before_today():
 def read_archived_top_repos_30d_before_today():
     """读取30天前的归档的 top_repos.json"""
     return read_archived_top_repos_days_before(30)
+
+
+def archived_stars_from_top_repos(top_repos_data):
+    """将归档的 top_repos 数据转换为 {databaseId: accumulatedStars} 映射
+    Args:
+        top_repos_data (dict or None): top_repos.json 的内容
+    Returns:
+        dict or None: {databaseId: accumulatedStars}，数据为空时返回 None
+    """
+    if not top_repos_data or 'top_repos' not in top_repos_data:
+        return None
+    return {item['databaseId']: item['accumulatedStars']
+            for item in top_repos_data['top_repos']
+            if item.get('databaseId') is not None and item.get('accumulatedStars') is not None}
+
+
+def _date_str_to_day(date_str: str) -> int:
+    """将 YYYY-MM-DD 转换为历史表使用的 YYYYMMDD 整数"""
+    return int(datetime.datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y%m%d'))
+
+
+def read_archived_stars_from_json(date_str: str):
+    """从归档的 JSON 文件中读取指定日期的 star 数快照
+    top_repos_list.json 中的 star 数可能为空，此时使用同日的 original_top_repos.json 补全。
+    Args:
+        date_str (str): 日期字符串，格式为 YYYY-MM-DD
+    Returns:
+        dict or None: {databaseId: accumulatedStars}，如果找不到归档则返回 None
+    """
+    stars = archived_stars_from_top_repos(read_archived_top_repos_by_date(date_str)) or {}
+    original = read_archived_json(date_str, config.ORI_TOP_REPOS_FILENAME)
+    for repo_id, count in (archived_stars_from_top_repos(original) or {}).items():
+        stars.setdefault(repo_id, count)
+    return stars or None
+
+
+# 已载入的 star 快照，键为 (ARCHIVE_DIR, YYYY-MM-DD)
+_star_snapshot_cache = SnapshotCache(config.STAR_SNAPSHOT_CACHE_BYTES)
+
+
+def star_snapshot_cache_stats():
+    """返回 star 快照缓存的当前大小和命中、未命中、淘汰次数"""
+    return _star_snapshot_cache.stats()
+
+
+def _write_star_sidecar(date_str: str, stars) -> bool:
+    """把某天的 star 快照写入该天归档目录中的旁路文件，快照为空时不写
+    Args:
+        date_str (str): 日期字符串，格式为 YYYY-MM-DD
+        stars (dict): {databaseId: star 数}
+    Returns:
+        bool: 是否写入了旁路文件
+    """
+    if not stars:
+        return False
+    day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+    os.makedirs(day_dir, exist_ok=True)
+    path = os.path.join(day_dir, config.ARCHIVE_STARS_SIDECAR)
+    _count_bytes_written(write_star_sidecar(path, StarSnapshot.from_dict(stars)))
+    _star_snapshot_cache.invalidate((config.ARCHIVE_DIR, date_str))
+    return True
+
+
+def _read_star_sidecar(date_str: str):
+    """读取某天的 star 快照旁路文件，没有 (或文件无效) 时返回 None
+    归档目录中的文件直接内存映射；已压缩的月份只从归档包中解压这一个成员。
+    """
+    year, month, day = date_str.split('-')
+    path = os.path.join(config.ARCHIVE_DIR, year, month, day, config.ARCHIVE_STARS_SIDECAR)
+    try:
+        if os.path.exists(path):
+            return load_star_sidecar(path)
+        payload = read_bundle_member(bundle_path(config.ARCHIVE_DIR, f"{year}-{month}"),
+                                     f"{year}/{month}/{day}/{config.ARCHIVE_STARS_SIDECAR}")
+        return decode_star_sidecar(payload) if payload is not None else None
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid star sidecar of {date_str}: {e}")
+        return None
+
+
+def read_star_snapshot_by_date(date_str: str):
+    """读取指定日期的 star 快照 (StarSnapshot)，结果保存在进程内的 LRU 缓存中
+    依次查找归档的旁路文件、star 历史库和归档的 JSON 文件；有旁路文件时只需映射两个数组，
+    不必解析完整的榜单 JSON。
+    Args:
+        date_str (str): 日期字符串，格式为 YYYY-MM-DD
+    Returns:
+        StarSnapshot or None: 该日的快照，如果找不到归档则返回 None
+    """
+    try:
+        day = _date_str_to_day(date_str)
+    except ValueError:
+        raise ValueError(
+            "Invalid date string format. Expected format is YYYY-MM-DD.")
+    key = (config.ARCHIVE_DIR, date_str)
+    snapshot = _star_snapshot_cache.get(key)
+    if snapshot is not None:
+        return snapshot
+    snapshot = _read_star_sidecar(date_str)
+    if snapshot is None:
+        stars = get_star_snapshot(config.STAR_HISTORY_DB_PATH, day)
+        if stars is None:
+            logger.info(f"No star sidecar or star history for {date_str}, falling back to archived JSON")
+            stars = read_archived_stars_from_json(date_str)
+        if not stars:
+            return None
+        snapshot = StarSnapshot.from_dict(stars)
+    _star_snapshot_cache.put(key, snapshot)
+    return snapshot
+
+
+def read_archived_stars_by_date(date_str: str):
+    """读取指定日期归档的 star 数快照 (见 read_star_snapshot_by_date)
+    Args:
+        date_str (str): 日期字符串，格式为 YYYY-MM-DD
+    Returns:
+        dict or None: {databaseId: accumulatedStars}，如果找不到归档则返回 None
+    """
+    snapshot = read_star_snapshot_by_date(date_str)
+    return snapshot.to_dict() if snapshot is not None else None
+
+
+def read_archived_stars_days_before(days: int):
+    """读取指定天数前归档的 star 数快照
+    Args:
+        days (int): 要回溯的天数
+    Returns:
+        dict or None: {databaseId: accumulatedStars}，如果找不到归档则返回 None
+    """
+    if not isinstance(days, int) or days < 0:
+        raise ValueError("Days must be a non-negative integer.")
+    target_date = datetime.date.today() - datetime.timedelta(days=days)
+    return read_archived_stars_by_date(target_date.strftime("%Y-%m-%d"))
+
+
+def _iter_archive_dates(include_bundles: bool = True):
+    """按日期升序遍历归档目录 (以及归档包中的日期)，生成 YYYY-MM-DD 字符串"""
+    if not os.path.isdir(config.ARCHIVE_DIR):
+        return
+    dates = set()
+    for year in sorted(os.listdir(config.ARCHIVE_DIR)):
+        year_dir = os.path.join(config.ARCHIVE_DIR, year)
+        if not (year.isdigit() and os.path.isdir(year_dir)):
+            continue
+        for month in sorted(os.listdir(year_dir)):
+            month_dir = os.path.join(year_dir, month)
+            if not (month.isdigit() and os.path.isdir(month_dir)):
+                continue
+            for day in sorted(os.listdir(month_dir)):
+                if day.isdigit() and os.path.isdir(os.path.join(month_dir, day)):
+                    dates.add(f"{year}-{month}-{day}")
+    if include_bundles:
+        for month_key in _bundled_months():
+            dates.update(_bundle_entries(month_key))
+    yield from sorted(dates)
+
+
+def _bundled_months():
+    """列出已压缩为归档包的月份 (YYYY-MM)"""
+    bundles_dir = os.path.dirname(bundle_path(config.ARCHIVE_DIR, "0000-00"))
+    if not os.path.isdir(bundles_dir):
+        return []
+    return sorted(fname[:-len(".zip")] for fname in os.listdir(bundles_dir) if fname.endswith(".zip"))
+
+
+def _remove_unreferenced_blobs():
+    """删除不再被任何归档目录引用的 blob (manifest 或硬链接)，返回删除的个数"""
+    referenced = set()
+    for date_str in _iter_archive_dates(include_bundles=False):
+        day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+        referenced.update((read_manifest(day_dir) or {}).values())
+    blobs_dir = os.path.join(config.ARCHIVE_DIR, BLOBS_DIRNAME)
+    removed = 0
+    if os.path.isdir(blobs_dir):
+        for prefix in os.listdir(blobs_dir):
+            prefix_dir = os.path.join(blobs_dir, prefix)
+            for fname in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, fname)
+                if f"{BLOBS_DIRNAME}/{prefix}/{fname}" not in referenced and os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+    return removed
+
+
+def _archived_month_members(days):
+    """逐个产出某月各天归档的 (成员名, 存储内容)，成员名为 YYYY/MM/DD/<文件名>
+
+    清单引用的文件读不到时抛出 IOError，使该月不被压缩。
+    """
+    for date_str in days:
+        day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'))
+        fnames = set(read_manifest(day_dir) or {}) | {
+            fname for fname in os.listdir(day_dir)
+            if fname != MANIFEST_FILENAME and not fname.endswith(".tmp")
+            and os.path.isfile(os.path.join(day_dir, fname))}
+        for fname in sorted(fnames):
+            try:
+                payload = _read_stored_archive_file(date_str, fname)
+            except OSError as e:
+                raise IOError(f"Archived file {date_str}/{fname} is unreadable: {e}") from e
+            if payload is None:
+                raise IOError(f"Archived file {date_str}/{fname} is missing")
+            yield f"{date_str.replace('-', '/')}/{fname}", payload
+
+
+def compact_archive(keep_months=None):
+    """把已结束的月份压缩为每月一个归档包 (archive/bundles/YYYY-MM.zip)
+    每个文件以 YYYY/MM/DD/<文件名> 为成员名、按其存储内容 (原文件或 blob) 单独压缩并追加到
+    该月的归档包中 (已有成员不重写)。逐个核对按天目录和清单引用的每个文件都能从归档包中原样读出后，
+    才删除该月的按天目录和不再被引用的 blob；核对失败的月份保留按天目录，其它月份照常压缩，
+    最后抛出 IOError。read_archived_json 和归档索引会透明地解析归档包中的文件。
+    Args:
+        keep_months (int or None): 保留按天目录的最近月数 (含当月)，默认使用
+            config.ARCHIVE_COMPACT_KEEP_MONTHS，0 表示不压缩
+    Returns:
+        list: 本次压缩的月份
+    """
+    keep_months = config.ARCHIVE_COMPACT_KEEP_MONTHS if keep_months is None else keep_months
+    if keep_months <= 0:
+        return []
+    today = datetime.date.today()
+    first_kept = today.year * 12 + today.month - 1 - (keep_months - 1)
+    cutoff = f"{first_kept // 12:04d}-{first_kept % 12 + 1:02d}"
+    months = sorted({date_str[:7] for date_str in _iter_archive_dates(include_bundles=False)
+                     if date_str[:7] < cutoff})
+    compacted = []
+    for month_key in months:
+        path = bundle_path(config.ARCHIVE_DIR, month_key)
+        year, month = month_key.split('-')
+        month_dir = os.path.join(config.ARCHIVE_DIR, year, month)
+        days = [date_str for date_str in _iter_archive_dates(include_bundles=False) if date_str[:7] == month_key]
+        size_before = os.path.getsize(path) if os.path.exists(path) else 0
+        try:
+            digests = append_bundle(path, _archived_month_members(days))
+        except Exception as e:
+            logger.error(f"Failed to compact {month_key} into {path}, keeping its archive days: {e}", exc_info=True)
+            continue
+        size = os.path.getsize(path)
+        _count_bytes_written(size - size_before)
+        # 删除按天目录前，逐个核对清单引用的每个文件都能从归档包中原样读出
+        bad = verify_bundle(path, digests)
+        if bad:
+            logger.error(f"Bundle {path} is missing or differs in {len(bad)} archived files "
+                         f"(e.g. {bad[0]}), keeping the archive days of {month_key}")
+            continue
+        for date_str in days:
+            shutil.rmtree(os.path.join(config.ARCHIVE_DIR, *date_str.split('-')))
+        for directory in (month_dir, os.path.dirname(month_dir)):
+            if os.path.isdir(directory) and not os.listdir(directory):
+                os.rmdir(directory)
+        month_index_path = _month_index_path(month_key)
+        os.makedirs(os.path.dirname(month_index_path), exist_ok=True)
+        save_json(_scan_archive_month(month_key), month_index_path)
+        compacted.append(month_key)
+        logger.info(f"Compacted {len(days)} archived days of {month_key} into {path} "
+                    f"({len(digests)} files, {size / (1024 * 1024):.2f} MB)")
+    if compacted:
+        removed = _remove_unreferenced_blobs()
+        logger.info(f"Removed {removed} unreferenced archive blobs")
+        _save_archive_manifest()
+    if len(compacted) < len(months):
+        raise IOError(f"Failed to compact {', '.join(sorted(set(months) - set(compacted)))}")
+    return compacted
+
+
+def backfill_star_history(force: bool = False):
+    """将已有的 JSON 归档导入 star 历史库 (有 star 快照旁路文件的日期直接读取旁路文件)
+    Args:
+        force (bool): 为 True 时重新导入历史库中已存在的日期
+    Returns:
+        int: 导入的天数
+    """
+    existing_days = set() if force else set(get_star_history_days(config.STAR_HISTORY_DB_PATH))
+    imported = 0
+    for date_str in _iter_archive_dates():
+        day = _date_str_to_day(date_str)
+        if day in existing_days:
+            continue
+        snapshot = _read_star_sidecar(date_str)
+        stars = snapshot.to_dict() if snapshot is not None else read_archived_stars_from_json(date_str)
+        if stars:
+            save_star_snapshot(config.STAR_HISTORY_DB_PATH, day, stars)
+            imported += 1
+    logger.info(f"Backfilled star history for {imported} archived days")
+    return imported
+
+
+def record_star_history():
+    """将数据库中当前的 star 数作为今天的快照写入 star 历史库
+    历史库为空时先从 JSON 归档回填。
+    """
+    if not get_star_history_days(config.STAR_HISTORY_DB_PATH):
+        logger.info("Star history is empty, backfilling from the JSON archive...")
+        backfill_star_history()
+    today = datetime.date.today()
+    save_star_snapshot(config.STAR_HISTORY_DB_PATH, int(today.strftime('%Y%m%d')),
+                       get_current_stars(config.REPOS_SQLITE_DB_PATH))
+    _star_snapshot_cache.invalidate((config.ARCHIVE_DIR, today.strftime('%Y-%m-%d')))
+
+
+def build_star_sidecars(force: bool = False):
+    """为已有的归档目录生成 star 快照旁路文件 (按需手动执行)
+    快照取自 star 历史库，历史库中没有该日期时从归档的 JSON 文件读取。已压缩为归档包的月份
+    不会改写，其中没有旁路文件的日期仍从历史库读取。
+    Args:
+        force (bool): 为 True 时重新生成已存在的旁路文件
+    Returns:
+        int: 生成的旁路文件数
+    """
+    written = 0
+    for date_str in _iter_archive_dates(include_bundles=False):
+        path = os.path.join(config.ARCHIVE_DIR, *date_str.split('-'), config.ARCHIVE_STARS_SIDECAR)
+        if os.path.exists(path) and not force:
+            continue
+        stars = get_star_snapshot(config.STAR_HISTORY_DB_PATH, _date_str_to_day(date_str))
+        if stars is None:
+            stars = read_archived_stars_from_json(date_str)
+        if _write_star_sidecar(date_str, stars):
+            written += 1
+    logger.info(f"Wrote star sidecars for {written} archived days")
+    return written
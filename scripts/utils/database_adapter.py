@@ -1,9 +1,14 @@
 import os
+import threading
 from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker
 
+import config
+from config import logger
+
 from .models import Base
 
 
@@ -16,14 +21,139 @@ class DatabaseAdapter(ABC):
         pass
 
 
+class _EngineEntry:
+    """引擎注册表中的一项：引擎、会话工厂以及统计计数器"""
+
+    def __init__(self, engine, Session):
+        self.engine = engine
+        self.Session = Session
+        self.connections_opened = 0
+        self.statements_executed = 0
+        self.rows_affected = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections_opened": self.connections_opened,
+            "statements_executed": self.statements_executed,
+            "rows_affected": self.rows_affected,
+        }
+
+
+# 进程级引擎注册表，按数据库文件绝对路径索引
+_registry: Dict[str, _EngineEntry] = {}
+_registry_lock = threading.Lock()
+
+
+def _install_listeners(engine, entry: _EngineEntry):
+    """在新连接上设置 PRAGMA，并统计连接数和语句数"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in config.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+        entry.connections_opened += 1
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        entry.statements_executed += 1
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        if cursor.rowcount and cursor.rowcount > 0:
+            entry.rows_affected += cursor.rowcount
+
+
+def _add_missing_columns(engine):
+    """为已存在的表补充模型中新增的列 (``create_all`` 不会修改已有的表)。
+
+    新列均可为空，使用 ``ALTER TABLE ... ADD COLUMN`` 即可完成迁移，已有数据保持不变。
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+                logger.info(f"Added column {table.name}.{column.name} ({column_type}) to {engine.url.database}")
+
+
+def _add_missing_indexes(engine):
+    """为已存在的表创建模型中新增的索引 (``create_all`` 只为新建的表创建索引)。"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 class SQLiteAdapter(DatabaseAdapter):
-    """SQLite数据库适配器"""
+    """SQLite数据库适配器
+
+    每个数据库文件在进程内只创建一次引擎（带连接池）、只执行一次建表，
+    之后的调用直接复用；管道结束时调用 ``dispose`` 释放连接。
+    """
 
     def get_engine_and_session(self, db_path):
+        key = os.path.abspath(db_path)
+        entry = _registry.get(key)
+        if entry is not None:
+            return entry.engine, entry.Session
+        with _registry_lock:
+            entry = _registry.get(key)
+            if entry is None:
+                entry = self._create_entry(key)
+                _registry[key] = entry
+        return entry.engine, entry.Session
+
+    def _create_entry(self, db_path) -> _EngineEntry:
         data_dir = os.path.dirname(db_path)
         os.makedirs(data_dir, exist_ok=True)
         connection_string = f"sqlite:///{db_path}"
-        engine = create_engine(connection_string)
+        engine = create_engine(connection_string,
+                               pool_size=config.SQLITE_POOL_SIZE,
+                               connect_args={"timeout": config.SQLITE_BUSY_TIMEOUT})
+        entry = _EngineEntry(engine, sessionmaker(bind=engine))
+        _install_listeners(engine, entry)
         Base.metadata.create_all(engine, checkfirst=True)
-        Session = sessionmaker(bind=engine)
-        return engine, Session
+        _add_missing_columns(engine)
+        _add_missing_indexes(engine)
+        logger.debug(f"Created engine for {db_path}")
+        return entry
+
+    def init_db(self, db_path):
+        """初始化数据库，如果不存在则创建表结构"""
+        self.get_engine_and_session(db_path)
+
+    def dispose(self, db_path: Optional[str] = None):
+        """释放引擎的连接池并从注册表中移除。
+
+        释放前执行 WAL checkpoint，使数据完整写回主数据库文件
+        (数据库文件会被提交到 git，不能遗留 -wal 文件中的数据)。
+
+        Args:
+            db_path (Optional[str]): 数据库文件路径，为 None 时释放所有引擎。
+        """
+        with _registry_lock:
+            keys = list(_registry) if db_path is None else [os.path.abspath(db_path)]
+            for key in keys:
+                entry = _registry.pop(key, None)
+                if entry is None:
+                    continue
+                try:
+                    with entry.engine.connect() as conn:
+                        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+                except Exception as e:
+                    logger.warning(f"WAL checkpoint failed for {key}: {e}")
+                entry.engine.dispose()
+                logger.info(f"Disposed engine for {key}: {entry.stats()}")
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """返回每个已注册引擎的统计计数器"""
+        return {key: entry.stats() for key, entry in _registry.items()}
@@ -1,13 +1,19 @@
 import datetime
+import heapq
+import threading
 
 from config import logger
-from typing import Tuple, Optional, Type
+from typing import Dict, Tuple, Optional, Type
 from contextlib import contextmanager
 
 from .database_adapter import SQLiteAdapter
-from .models import GithubInfo, Repository, User
+from .models import (CrawlCheckpoint, CrawlRun, CrawlRunItem, GithubInfo,
+                     LanguageDailyStat, PipelineStepMetric, Repository,
+                     StarHistory, User, UserContribution)
 
 
+from sqlalchemy import Table, delete, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from sqlalchemy.engine import Engine
 
@@ -24,6 +30,24 @@ def get_engine_and_session(db_path: str) -> Tuple[Engine, Type[Session]]:
     return adapter.get_engine_and_session(db_path)
 
 
+def dispose_engines(db_path: Optional[str] = None):
+    """释放数据库引擎及其连接池，应在管道结束时调用。
+
+    Args:
+        db_path (Optional[str]): 数据库文件的路径，为 None 时释放所有引擎。
+    """
+    SQLiteAdapter().dispose(db_path)
+
+
+def get_engine_stats() -> Dict[str, Dict[str, int]]:
+    """获取每个数据库引擎的统计计数器 (打开的连接数、执行的语句数、影响的行数)。
+
+    Returns:
+        Dict[str, Dict[str, int]]: 数据库文件路径到统计信息的映射。
+    """
+    return SQLiteAdapter().get_stats()
+
+
 from collections.abc import Generator
 
 @contextmanager
@@ -63,73 +87,244 @@ def init_db(db_path: str):
     adapter.init_db(db_path)
 
 
-def save_users(db_path: str, users: List[Dict]):
-    """将用户数据批量保存或更新到数据库（ORM方式）。
+# upsert 时由抓取数据覆盖的列；star 增长字段由 batch_update_accumulated_stars 维护，不在此覆盖
+_USER_UPSERT_COLUMNS = ['id', 'login', 'name', 'location', 'avatarUrl', 'url',
+                        'followersCount', 'topRepositories_starsgazerCount',
+                        'updatedAt', 'metadataUpdatedAt']
+_REPO_UPSERT_COLUMNS = ['id', 'name', 'url', 'language', 'description',
+                        'accumulatedStars', 'createdAt', 'updatedAt', 'metadataUpdatedAt']
+# 只刷新计数时覆盖的列，元数据列保持不变
+_USER_COUNT_COLUMNS = ['id', 'followersCount', 'topRepositories_starsgazerCount', 'updatedAt']
+_REPO_COUNT_COLUMNS = ['id', 'accumulatedStars', 'updatedAt']
+# IN (...) 查询每次绑定的参数个数上限 (低于 SQLite 的 999 个变量限制)
+_IN_CLAUSE_CHUNK = 500
+
+
+def _bulk_upsert(db_path: str, table: Table, rows: List[Dict], update_columns: List[str],
+                 checkpoint: Optional[Dict] = None):
+    """使用 ``INSERT ... ON CONFLICT(databaseId) DO UPDATE`` 批量写入数据。
+
+    所有行通过一次 executemany 提交，SQLAlchemy 会将其合并为多行 VALUES 语句，
+    取代逐行 SELECT + merge 的 2N 次往返。
 
     Args:
         db_path (str): 数据库文件的路径。
-        users (List[Dict]): 包含用户数据的字典列表。
+        table (Table): 目标表。
+        rows (List[Dict]): 要写入的行，键必须一致。
+        update_columns (List[str]): 主键冲突时需要更新的列。
+        checkpoint (Optional[Dict]): 抓取断点，与数据在同一事务中提交，见 ``save_crawl_checkpoint``。
     """
+    if not rows and checkpoint is None:
+        return
     with session_scope(db_path) as session:
-        for item in users:
-            user = session.query(User).filter_by(
-                databaseId=item.get('databaseId')).first()
-            if not user:
-                user = User(databaseId=item.get('databaseId'))
-            # Update user attributes safely using .get with defaults
-            user.login = item.get('login')
-            user.name = item.get('name')
-            user.id = item.get('id')
-            user.location = item.get('location')
-            user.avatarUrl = item.get('avatarUrl')
-            user.url = item.get('url')
-            user.followersCount = item.get('followersCount')
-            user.topRepositories_starsgazerCount = item.get(
-                'topRepositories_starsgazerCount')
-            user.updatedAt = datetime.datetime.now()
-            session.merge(user)
-    logger.info(f"{len(users)} Users saved to {db_path}")
-
-
-def save_repositories(db_path: str, repos: List[Dict]):
-    """将仓库数据批量保存或更新到数据库（ORM方式）。
+        if rows:
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['databaseId'],
+                set_={column: stmt.excluded[column] for column in update_columns})
+            session.execute(stmt, rows)
+        if checkpoint is not None:
+            _record_crawl_page(session, checkpoint, [row['databaseId'] for row in rows])
+
+
+def _parse_created_at(created_at_str: Optional[str], databaseId) -> Optional[str]:
+    """将 GitHub 的 ISO 8601 时间转换为数据库中使用的 'YYYY-MM-DD HH:MM:SS' 格式。"""
+    if not created_at_str:
+        return None
+    try:
+        return datetime.datetime.strptime(
+            created_at_str, '%Y-%m-%dT%H:%M:%SZ').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        logger.warning(f"Invalid createdAt format for repo {databaseId}: {created_at_str}")
+        return None
+
+
+def save_users(db_path: str, users: List[Dict], checkpoint: Optional[Dict] = None):
+    """将用户数据批量保存或更新到数据库（批量 upsert）。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        users (List[Dict]): 包含用户数据的字典列表。
+        checkpoint (Optional[Dict]): 与本页数据一同提交的抓取断点。
+    """
+    now = datetime.datetime.now()
+    rows = [{
+        'databaseId': item.get('databaseId'),
+        'id': item.get('id'),
+        'login': item.get('login'),
+        'name': item.get('name'),
+        'location': item.get('location'),
+        'avatarUrl': item.get('avatarUrl'),
+        'url': item.get('url'),
+        'followersCount': item.get('followersCount'),
+        'topRepositories_starsgazerCount': item.get('topRepositories_starsgazerCount'),
+        'updatedAt': now,
+        'metadataUpdatedAt': now,
+    } for item in users if item.get('databaseId') is not None]
+    _bulk_upsert(db_path, User.__table__, rows, _USER_UPSERT_COLUMNS, checkpoint)
+    logger.info(f"{len(rows)} Users saved to {db_path}")
+
+
+def save_user_counts(db_path: str, users: List[Dict], checkpoint: Optional[Dict] = None):
+    """只更新用户的计数字段 (粉丝数、Top 仓库 star 总数)，新用户以仅含计数的行插入。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        users (List[Dict]): 包含 databaseId/id/followersCount/topRepositories_starsgazerCount 的字典列表。
+        checkpoint (Optional[Dict]): 与本页数据一同提交的抓取断点。
+    """
+    now = datetime.datetime.now()
+    rows = [{
+        'databaseId': item.get('databaseId'),
+        'id': item.get('id'),
+        'followersCount': item.get('followersCount'),
+        'topRepositories_starsgazerCount': item.get('topRepositories_starsgazerCount'),
+        'updatedAt': now,
+    } for item in users if item.get('databaseId') is not None]
+    _bulk_upsert(db_path, User.__table__, rows, _USER_COUNT_COLUMNS, checkpoint)
+    logger.info(f"{len(rows)} user counts saved to {db_path}")
+
+
+def save_repositories(db_path: str, repos: List[Dict], checkpoint: Optional[Dict] = None):
+    """将仓库数据批量保存或更新到数据库（批量 upsert）。
 
     Args:
         db_path (str): 数据库文件的路径。
         repos (List[Dict]): 包含仓库数据的字典列表。
+        checkpoint (Optional[Dict]): 与本页数据一同提交的抓取断点。
     """
-    with session_scope(db_path) as session:
-        for item in repos:
-            repo = session.query(Repository).filter_by(
-                databaseId=item.get('databaseId')).first()
-            if not repo:
-                repo = Repository(databaseId=item.get('databaseId'))
-
-            # Update repo attributes safely
-            repo.id = item.get('id')
-            repo.name = item.get('name')
-            repo.url = item.get('url')
-            languages = item.get('languages', [])
-            repo.language = ' | '.join(languages) if languages else None
-            repo.description = item.get('description')
-            repo.accumulatedStars = item.get('stargazerCount')
-            # These fields might not be present in the initial fetch, handle None
-            repo.accumulatedStars_1d = item.get('accumulatedStars_1d')
-            repo.accumulatedStars_7d = item.get('accumulatedStars_7d')
-            repo.accumulatedStars_30d = item.get('accumulatedStars_30d')
-            created_at_str = item.get('createdAt')
-            if created_at_str:
-                try:
-                    repo.createdAt = datetime.datetime.strptime(created_at_str, '%Y-%m-%dT%H:%M:%SZ')
-                except ValueError:
-                     logger.warning(f"Invalid createdAt format for repo {repo.databaseId}: {created_at_str}")
-                     repo.createdAt = None # Or set a default
-            else:
-                repo.createdAt = None
+    now = datetime.datetime.now()
+    rows = []
+    for item in repos:
+        if item.get('databaseId') is None:
+            continue
+        languages = item.get('languages', [])
+        rows.append({
+            'databaseId': item.get('databaseId'),
+            'id': item.get('id'),
+            'name': item.get('name'),
+            'url': item.get('url'),
+            'language': ' | '.join(languages) if languages else None,
+            'description': item.get('description'),
+            # _process_repo_data emits 'accumulatedStars'; raw GraphQL nodes use 'stargazerCount'
+            'accumulatedStars': item.get('accumulatedStars', item.get('stargazerCount')),
+            'createdAt': _parse_created_at(item.get('createdAt'), item.get('databaseId')),
+            'updatedAt': now,
+            'metadataUpdatedAt': now,
+        })
+    _bulk_upsert(db_path, Repository.__table__, rows, _REPO_UPSERT_COLUMNS, checkpoint)
+    logger.info(f"{len(rows)} repos saved to {db_path}")
+
+
+def save_repository_counts(db_path: str, repos: List[Dict], checkpoint: Optional[Dict] = None):
+    """只更新仓库的 star 数，新仓库以仅含计数的行插入，元数据稍后通过 nodes(ids:) 补全。
 
-            repo.updatedAt = datetime.datetime.now()
-            session.merge(repo)
-    logger.info(f"{len(repos)} repos saved to {db_path}")
+    Args:
+        db_path (str): 数据库文件的路径。
+        repos (List[Dict]): 包含 databaseId/id/accumulatedStars 的字典列表。
+        checkpoint (Optional[Dict]): 与本页数据一同提交的抓取断点。
+    """
+    now = datetime.datetime.now()
+    rows = [{
+        'databaseId': item.get('databaseId'),
+        'id': item.get('id'),
+        'accumulatedStars': item.get('accumulatedStars'),
+        'updatedAt': now,
+    } for item in repos if item.get('databaseId') is not None]
+    _bulk_upsert(db_path, Repository.__table__, rows, _REPO_COUNT_COLUMNS, checkpoint)
+    logger.info(f"{len(rows)} repo counts saved to {db_path}")
+
+
+def get_node_ids(db_path: str, table: Table) -> List[str]:
+    """查询所有已有行的 node id，用于不经搜索直接按 id 刷新整张表。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        table (Table): users 或 repositories 表。
+
+    Returns:
+        List[str]: GitHub node id 列表。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    stmt = select(table.c.id).where(table.c.id.is_not(None)).order_by(table.c.databaseId)
+    with engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def get_node_ids_by_database_ids(db_path: str, table: Table, database_ids: List[int]) -> Dict[int, str]:
+    """按 databaseId 查询已有行的 node id。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        table (Table): users 或 repositories 表。
+        database_ids (List[int]): 要查询的 databaseId 列表。
+
+    Returns:
+        Dict[int, str]: databaseId 到 node id 的映射，不存在或没有 node id 的行不包含在内。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    stmt = select(table.c.databaseId, table.c.id).where(table.c.id.is_not(None))
+    node_ids = {}
+    with engine.connect() as conn:
+        for i in range(0, len(database_ids), _IN_CLAUSE_CHUNK):
+            chunk = database_ids[i:i + _IN_CLAUSE_CHUNK]
+            node_ids.update(conn.execute(stmt.where(table.c.databaseId.in_(chunk))).tuples().all())
+    return node_ids
+
+
+def get_node_ids_with_stale_counts(db_path: str, table: Table, since: datetime.datetime) -> List[str]:
+    """查询自 since 之后计数未被更新过的行的 node id (本次搜索未覆盖的已有条目)。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        table (Table): users 或 repositories 表。
+        since (datetime.datetime): 本次抓取的开始时间。
+
+    Returns:
+        List[str]: GitHub node id 列表。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    stmt = (select(table.c.id)
+            .where(table.c.id.is_not(None),
+                   (table.c.updatedAt < since) | table.c.updatedAt.is_(None)))
+    with engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def get_node_ids_for_metadata_refresh(db_path: str, table: Table, name_column: str,
+                                      max_age_days: int) -> List[str]:
+    """查询需要重新获取完整元数据的行的 node id。
+
+    新发现的条目 (只有计数、name_column 为空) 总是包含在内；其余条目按元数据更新时间
+    从旧到新轮换，每次最多刷新 1/max_age_days 的行，且只刷新超过 max_age_days 天未更新的行，
+    因此每行大约每 max_age_days 天刷新一次，而每次运行的开销保持平稳。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        table (Table): users 或 repositories 表。
+        name_column (str): 用于识别新条目的元数据列 ('login' / 'name')。
+        max_age_days (int): 元数据的最长保留天数。
+
+    Returns:
+        List[str]: GitHub node id 列表。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+    metadata_at = table.c.metadataUpdatedAt
+    is_new = table.c[name_column].is_(None) & metadata_at.is_(None)
+    with engine.connect() as conn:
+        new_ids = list(conn.execute(
+            select(table.c.id).where(table.c.id.is_not(None), is_new)).scalars())
+        total = conn.execute(select(func.count()).select_from(table)).scalar_one()
+        rotation_size = -(-total // max(max_age_days, 1))
+        rotation_ids = list(conn.execute(
+            select(table.c.id)
+            .where(table.c.id.is_not(None), ~is_new,
+                   metadata_at.is_(None) | (metadata_at < cutoff))
+            .order_by(metadata_at.is_not(None), metadata_at)
+            .limit(rotation_size)).scalars())
+    logger.info(f"{len(new_ids)} new and {len(rotation_ids)} stale rows need metadata in {table.name}")
+    return new_ids + rotation_ids
 
 
 # get repo data from database by databaseId
@@ -194,6 +389,98 @@ def get_repos_hot(db_path: str, limit: int = 100) -> List[Dict]:
         return [repo.as_dict() for repo in repos_list]
 
 
+class _TopK:
+    """按排序键保留前 K 行的小顶堆，limit 为 -1 时保留全部行。
+
+    排序键相同时先扫描到的行排在前面；None 视为最小值 (与 SQLite 降序排序一致)。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._items = []
+
+    def push(self, value, seq: int, row):
+        item = ((value is not None, value or 0), -seq, row)
+        if self.limit < 0:
+            self._items.append(item)
+        elif len(self._items) < self.limit:
+            heapq.heappush(self._items, item)
+        elif item[:2] > self._items[0][:2]:
+            heapq.heapreplace(self._items, item)
+
+    def rows(self) -> list:
+        self._items.sort(key=lambda item: item[:2], reverse=True)
+        return [row for _, _, row in self._items]
+
+
+def _repo_row_as_dict(row) -> Dict:
+    """将 Core 查询得到的行转换为与 ``Repository.as_dict()`` 相同的字典。"""
+    result = row._asdict()
+    language = result.get('language')
+    # save_repositories joins the languages with ' | '
+    result['language'] = [name.strip() for name in language.split('|')] if language else []
+    return result
+
+
+def get_repos_by_database_ids(db_path: str, database_ids: List[int]) -> Dict[int, Dict]:
+    """按 databaseId 批量查询仓库。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        database_ids (List[int]): 要查询的 databaseId 列表。
+
+    Returns:
+        Dict[int, Dict]: databaseId 到仓库数据字典 (与 ``Repository.as_dict()`` 相同) 的映射。
+    """
+    table = Repository.__table__
+    engine, _ = get_engine_and_session(db_path)
+    repos = {}
+    with engine.connect() as conn:
+        for i in range(0, len(database_ids), _IN_CLAUSE_CHUNK):
+            chunk = database_ids[i:i + _IN_CLAUSE_CHUNK]
+            for row in conn.execute(select(table).where(table.c.databaseId.in_(chunk))):
+                repos[row.databaseId] = _repo_row_as_dict(row)
+    return repos
+
+
+def get_repo_rankings(db_path: str, limits: Dict[str, int]) -> Dict[str, List[Dict]]:
+    """只扫描一次 repositories 表，同时生成按多个 star 字段降序排列的榜单。
+
+    使用 Core ``select()`` 流式读取轻量行，每个榜单维护一个大小为 limit 的堆，
+    因此内存占用只与榜单大小有关，而不是仓库总数乘以榜单数量。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        limits (Dict[str, int]): 排序字段名 (如 'accumulatedStars_1d') 到榜单长度的映射，
+            -1 表示返回所有仓库。
+
+    Returns:
+        Dict[str, List[Dict]]: 排序字段名到仓库数据字典列表的映射。
+
+    Raises:
+        ValueError: 如果排序字段无效。
+    """
+    valid_keys = ['accumulatedStars'] + _STAR_DELTA_KEYS
+    for key in limits:
+        if key not in valid_keys:
+            raise ValueError(f'ranking key must be one of {valid_keys}')
+
+    table = Repository.__table__
+    column_names = list(table.columns.keys())
+    heaps = [(column_names.index(key), _TopK(limit)) for key, limit in limits.items()]
+    engine, _ = get_engine_and_session(db_path)
+    scanned = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=1000).execute(select(table))
+        for seq, row in enumerate(result):
+            for index, heap in heaps:
+                heap.push(row[index], seq, row)
+            scanned = seq + 1
+    logger.info(f"Scanned {scanned} repositories once for rankings {list(limits)}")
+    return {key: [_repo_row_as_dict(row) for row in heap.rows()]
+            for key, (_, heap) in zip(limits, heaps)}
+
+
 def update_accumulated_stars_by_db_id(db_path: str, databaseId: int,
                                       accumulated_stars_key: str,
                                       accumulated_stars_value: int):
@@ -300,9 +587,60 @@ def get_top_followergazer_count_users(db_path: str, limit: int = 100) -> List[Di
     return _get_top_users_by_metric(db_path, User.followersCount, limit)
 
 
+_STAR_DELTA_KEYS = ['accumulatedStars_1d', 'accumulatedStars_7d', 'accumulatedStars_30d']
+
+
+def bulk_update_star_deltas(db_path: str, archived_stars: Dict[str, Optional[Dict[int, int]]]):
+    """用一次集合运算计算并更新多个时间范围的 star 增长数。
+
+    归档的 star 数先批量写入临时表，再通过一条 ``UPDATE ... FROM`` 连接同时更新所有字段，
+    语句数与仓库数量无关。快照中不存在的仓库（或整个快照缺失时的所有仓库）
+    对应字段被显式置为 NULL，而不是保留上一次的旧值。需要 SQLite >= 3.33。
+
+    Args:
+        db_path (str): 当前数据库文件的路径。
+        archived_stars (Dict[str, Optional[Dict[int, int]]]): star 增长字段名
+            ('accumulatedStars_1d' 等) 到归档快照 {databaseId: star 数} 的映射，
+            快照为 None 表示该日期没有归档数据。
+    """
+    keys = [key for key in archived_stars if key in _STAR_DELTA_KEYS]
+    invalid_keys = set(archived_stars) - set(keys)
+    if invalid_keys:
+        logger.error(f"Invalid accumulated_stars_key: {invalid_keys}")
+    if not keys:
+        return
+
+    ids = set()
+    for key in keys:
+        ids.update(archived_stars[key] or {})
+    rows = [{'databaseId': repo_id,
+             **{key: (archived_stars[key] or {}).get(repo_id) for key in keys}}
+            for repo_id in ids]
+
+    columns_sql = ', '.join(f'{key} INTEGER' for key in keys)
+    reset_sql = ', '.join(f'{key} = NULL' for key in keys)
+    delta_sql = ', '.join(f'{key} = repositories.accumulatedStars - a.{key}' for key in keys)
+    with session_scope(db_path) as session:
+        session.execute(text('DROP TABLE IF EXISTS temp.archived_stars'))
+        session.execute(text(
+            f'CREATE TEMP TABLE archived_stars (databaseId INTEGER PRIMARY KEY, {columns_sql})'))
+        if rows:
+            session.execute(text(
+                f"INSERT INTO temp.archived_stars (databaseId, {', '.join(keys)}) "
+                f"VALUES (:databaseId, {', '.join(':' + key for key in keys)})"), rows)
+        session.execute(text(f'UPDATE repositories SET {reset_sql}'))
+        result = session.execute(text(
+            f'UPDATE repositories SET {delta_sql}, updatedAt = :now '
+            f'FROM temp.archived_stars AS a WHERE a.databaseId = repositories.databaseId'),
+            {'now': datetime.datetime.now()})
+        session.execute(text('DROP TABLE temp.archived_stars'))
+    logger.info(f"Bulk updated star deltas {keys} for {result.rowcount} repos "
+                f"from {len(rows)} archived rows in {db_path}")
+
+
 def batch_update_accumulated_stars(db_path: str, top_repos_data: Dict,
                                    accumulated_stars_key: str):
-    """根据前一天的 star 数，批量计算并更新仓库在指定时间范围内的 star 增长数。
+    """根据归档的 star 数，批量计算并更新仓库在指定时间范围内的 star 增长数。
 
     Args:
         db_path (str): 当前数据库文件的路径。
@@ -311,44 +649,406 @@ def batch_update_accumulated_stars(db_path: str, top_repos_data: Dict,
         accumulated_stars_key (str): 要更新的 star 增长数字段名
                                      ('accumulatedStars_1d', 'accumulatedStars_7d', 'accumulatedStars_30d')。
     """
-    valid_keys = ['accumulatedStars_1d', 'accumulatedStars_7d', 'accumulatedStars_30d']
-    if accumulated_stars_key not in valid_keys:
+    from .archive_utils import archived_stars_from_top_repos  # archive_utils 依赖本模块，延迟导入
+
+    if accumulated_stars_key not in _STAR_DELTA_KEYS:
         logger.error(f"Invalid accumulated_stars_key: {accumulated_stars_key}")
         return
+    bulk_update_star_deltas(db_path, {accumulated_stars_key: archived_stars_from_top_repos(top_repos_data)})
+
+
+def get_current_stars(db_path: str) -> Dict[int, int]:
+    """读取所有仓库当前的 star 数。
+
+    Args:
+        db_path (str): 仓库数据库文件的路径。
 
-    if not top_repos_data or 'top_repos' not in top_repos_data:
-        logger.warning("No top_repos data provided for batch update.")
+    Returns:
+        Dict[int, int]: {databaseId: accumulatedStars}，不包含 star 数为空的仓库。
+    """
+    stmt = select(Repository.databaseId, Repository.accumulatedStars).where(
+        Repository.accumulatedStars.is_not(None))
+    with session_scope(db_path) as session:
+        return {repo_id: stars for repo_id, stars in session.execute(stmt)}
+
+
+def save_star_snapshot(db_path: str, day: int, stars: Dict[int, int]):
+    """将某一天的 star 数快照写入历史表，同一天重复写入时覆盖。
+
+    Args:
+        db_path (str): 历史数据库文件的路径。
+        day (int): 快照日期，格式为 YYYYMMDD。
+        stars (Dict[int, int]): {databaseId: star 数}。
+    """
+    rows = [{'day': day, 'databaseId': repo_id, 'stars': count}
+            for repo_id, count in stars.items() if count is not None]
+    if not rows:
         return
+    stmt = sqlite_insert(StarHistory.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=['day', 'databaseId'],
+                                      set_={'stars': stmt.excluded.stars})
+    with session_scope(db_path) as session:
+        session.execute(stmt, rows)
+    logger.info(f"Saved star snapshot for {day} with {len(rows)} repos to {db_path}")
+
 
-    updates_count = 0
+def get_star_snapshot(db_path: str, day: int) -> Optional[Dict[int, int]]:
+    """读取某一天的 star 数快照（按主键 (day, databaseId) 索引查找）。
+
+    Args:
+        db_path (str): 历史数据库文件的路径。
+        day (int): 快照日期，格式为 YYYYMMDD。
+
+    Returns:
+        Optional[Dict[int, int]]: {databaseId: star 数}，该日没有快照时返回 None。
+    """
+    stmt = select(StarHistory.databaseId, StarHistory.stars).where(StarHistory.day == day)
     with session_scope(db_path) as session:
-        # Fetch all relevant repos in one go for potential optimization
-        # repo_ids = [item['databaseId'] for item in top_repos_data['top_repos']]
-        # existing_repos = {repo.databaseId: repo for repo in session.query(Repository).filter(Repository.databaseId.in_(repo_ids)).all()}
-
-        for repo_item in top_repos_data['top_repos']:
-            repo_db_id = repo_item.get('databaseId')
-            archived_stargazer_count = repo_item.get('accumulatedStars')
-
-            if repo_db_id is None or archived_stargazer_count is None:
-                logger.warning(f"Skipping item due to missing data: {repo_item}")
-                continue
-
-            # repo = existing_repos.get(repo_db_id) # Use pre-fetched repo if optimization is applied
-            repo = session.query(Repository).filter_by(databaseId=repo_db_id).first()
-
-            if repo:
-                if repo.accumulatedStars is not None:
-                    star_diff = repo.accumulatedStars - archived_stargazer_count
-                    setattr(repo, accumulated_stars_key, star_diff)
-                    repo.updatedAt = datetime.datetime.now()
-                    updates_count += 1
-                    # Commit is handled by session_scope
-                else:
-                    logger.warning(f"Repo {repo_db_id} has None for accumulatedStars, cannot calculate diff.")
-            else:
-                logger.warning(f"Repo {repo_db_id} not found in database during batch update")
-    logger.info(f"Batch updated {updates_count} repos for key '{accumulated_stars_key}' in {db_path}")
+        snapshot = {repo_id: stars for repo_id, stars in session.execute(stmt)}
+    return snapshot or None
+
+
+def get_star_history_days(db_path: str) -> List[int]:
+    """返回历史表中已有快照的日期列表 (YYYYMMDD，升序)。"""
+    stmt = select(StarHistory.day).distinct().order_by(StarHistory.day)
+    with session_scope(db_path) as session:
+        return list(session.scalars(stmt))
+
+
+def iter_star_history(db_path: str, first_day: int, last_day: int):
+    """按日期升序逐日读取 [first_day, last_day] 范围内的 star 快照 (按主键范围扫描)。
+
+    Args:
+        db_path (str): 历史数据库文件的路径。
+        first_day (int): 起始日期 (YYYYMMDD，含)。
+        last_day (int): 结束日期 (YYYYMMDD，含)。
+
+    Yields:
+        Tuple[int, List[Tuple[int, int]]]: (day, [(databaseId, stars), ...])。
+    """
+    table = StarHistory.__table__
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        days = conn.execute(select(table.c.day).distinct()
+                            .where(table.c.day.between(first_day, last_day))
+                            .order_by(table.c.day)).scalars().all()
+        for day in days:
+            rows = conn.execute(select(table.c.databaseId, table.c.stars)
+                                .where(table.c.day == day)).tuples().all()
+            yield day, rows
+
+
+# --- 语言汇总 ---
+
+# 主语言：language 列按代码量降序以 ' | ' 拼接，取第一项
+_PRIMARY_LANGUAGE_SQL = "substr(language, 1, instr(language || ' | ', ' | ') - 1)"
+
+
+def update_language_rollup(db_path: str, day: int):
+    """增量更新 language_daily_stats 汇总表中当天 (day) 各语言的 starsGained
+    (仓库的 accumulatedStars_1d 之和) 和 repos (仓库数)。
+
+    newRepos 来自 GitHub 的 ``created:`` 计数搜索，由 ``save_language_new_repos`` 写入。
+
+    Args:
+        db_path (str): 仓库数据库文件的路径 (汇总表与 repositories 表在同一数据库中)。
+        day (int): 汇总记录的日期 (YYYYMMDD，UTC 昨天，与 newRepos 的创建日期一致)。
+    """
+    params = {'day': day, 'now': datetime.datetime.now()}
+    with session_scope(db_path) as session:
+        # 先清零再写入，使重复运行或语言从榜单消失时不残留旧值
+        session.execute(text('UPDATE language_daily_stats SET starsGained = 0, repos = 0 WHERE day = :day'),
+                        params)
+        session.execute(text(
+            f"INSERT INTO language_daily_stats (day, language, newRepos, starsGained, repos, updatedAt) "
+            f"SELECT :day, {_PRIMARY_LANGUAGE_SQL} AS lang, 0, COALESCE(SUM(accumulatedStars_1d), 0), COUNT(*), :now "
+            f"FROM repositories WHERE language IS NOT NULL AND language != '' GROUP BY lang "
+            f"ON CONFLICT (day, language) DO UPDATE SET starsGained = excluded.starsGained, "
+            f"repos = excluded.repos, updatedAt = excluded.updatedAt"), params)
+        session.execute(text('DELETE FROM language_daily_stats '
+                             'WHERE newRepos = 0 AND starsGained = 0 AND repos = 0'))
+    logger.info(f"Updated language rollup for {day} in {db_path}")
+
+
+def get_tracked_languages(db_path: str, day: int, limit: int) -> List[str]:
+    """返回 day 当天抓取到的仓库中仓库数最多的 limit 种主语言 (需先运行 ``update_language_rollup``)。"""
+    table = LanguageDailyStat.__table__
+    stmt = (select(table.c.language).where(table.c.day == day, table.c.repos > 0)
+            .order_by(table.c.repos.desc(), table.c.language).limit(limit))
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def get_language_new_repo_days(db_path: str, first_day: int, last_day: int) -> List[int]:
+    """返回 [first_day, last_day] 内已保存新建仓库数的日期 (YYYYMMDD)。"""
+    table = LanguageDailyStat.__table__
+    stmt = (select(table.c.day).where(table.c.day.between(first_day, last_day), table.c.newRepos > 0)
+            .group_by(table.c.day).order_by(table.c.day))
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def save_language_new_repos(db_path: str, day: int, counts: Dict[str, int]):
+    """保存某个创建日期各语言的新建仓库数 (``created:`` 计数搜索的结果)，重复保存时覆盖。
+
+    Args:
+        db_path (str): 仓库数据库文件的路径。
+        day (int): 创建日期 (YYYYMMDD)。
+        counts (Dict[str, int]): 语言到新建仓库数的映射。
+    """
+    now = datetime.datetime.now()
+    rows = [{'day': day, 'language': language, 'newRepos': count, 'starsGained': 0, 'repos': 0, 'updatedAt': now}
+            for language, count in counts.items() if count]
+    if not rows:
+        return
+    stmt = sqlite_insert(LanguageDailyStat.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=['day', 'language'],
+                                      set_={'newRepos': stmt.excluded.newRepos,
+                                            'updatedAt': stmt.excluded.updatedAt})
+    with session_scope(db_path) as session:
+        session.execute(stmt, rows)
+    logger.info(f"Saved new repo counts of {len(rows)} languages for {day} to {db_path}")
+
+
+def get_language_rankings(db_path: str, first_day: int, last_day: int, limit: int = -1) -> List[Dict]:
+    """汇总 [first_day, last_day] 内各语言的计数 (按主键范围求和，不扫描 repositories 表)。
+
+    Args:
+        db_path (str): 仓库数据库文件的路径。
+        first_day (int): 起始日期 (YYYYMMDD，含)。
+        last_day (int): 结束日期 (YYYYMMDD，含)。
+        limit (int): 返回的语言数量，-1 表示全部。
+
+    Returns:
+        List[Dict]: {language, newRepos, starsGained, repos}，按 newRepos、starsGained 降序；
+            repos 为范围内最近一次运行时的仓库数。
+    """
+    table = LanguageDailyStat.__table__
+    in_range = table.c.day.between(first_day, last_day)
+    latest_day = select(func.max(table.c.day)).where(in_range, table.c.repos > 0).scalar_subquery()
+    repos = func.sum(func.iif(table.c.day == latest_day, table.c.repos, 0))
+    stmt = (select(table.c.language,
+                   func.sum(table.c.newRepos).label('newRepos'),
+                   func.sum(table.c.starsGained).label('starsGained'),
+                   repos.label('repos'))
+            .where(in_range)
+            .group_by(table.c.language)
+            .order_by(func.sum(table.c.newRepos).desc(), func.sum(table.c.starsGained).desc(),
+                      table.c.language))
+    if limit >= 0:
+        stmt = stmt.limit(limit)
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        return [row._asdict() for row in conn.execute(stmt)]
+
+
+# --- 用户贡献 ---
+
+def get_contribution_candidates(db_path: str, day: int, limit: int) -> List[str]:
+    """返回粉丝数最多的 limit 个用户中，还没有 day 当天贡献记录的用户的 node id。
+
+    某天部分批次失败时，下一次运行只会补抓缺少记录的用户。
+
+    Args:
+        db_path (str): 用户数据库文件的路径。
+        day (int): 贡献日期 (YYYYMMDD)。
+        limit (int): 候选用户数量。
+
+    Returns:
+        List[str]: GitHub node id 列表，按粉丝数降序。
+    """
+    top = (select(User.databaseId, User.id, User.followersCount)
+           .where(User.id.is_not(None))
+           .order_by(User.followersCount.desc(), User.databaseId)
+           .limit(limit).subquery())
+    recorded = (select(UserContribution.databaseId)
+                .where(UserContribution.day == day, UserContribution.databaseId == top.c.databaseId)
+                .exists())
+    stmt = select(top.c.id).where(~recorded).order_by(top.c.followersCount.desc(), top.c.databaseId)
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def save_user_contributions(db_path: str, day: int, contributions: List[Dict]):
+    """写入用户某一天的贡献数，同一天重复写入时覆盖。
+
+    Args:
+        db_path (str): 用户数据库文件的路径。
+        day (int): 贡献日期 (YYYYMMDD)。
+        contributions (List[Dict]): {databaseId, commits, contributions} 列表。
+    """
+    now = datetime.datetime.now()
+    rows = [{'day': day, 'databaseId': item['databaseId'], 'commits': item.get('commits') or 0,
+             'contributions': item.get('contributions') or 0, 'updatedAt': now}
+            for item in contributions if item.get('databaseId') is not None]
+    if not rows:
+        return
+    stmt = sqlite_insert(UserContribution.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=['day', 'databaseId'],
+                                      set_={column: stmt.excluded[column]
+                                            for column in ('commits', 'contributions', 'updatedAt')})
+    with session_scope(db_path) as session:
+        session.execute(stmt, rows)
+    logger.info(f"Saved contributions of {len(rows)} users for {day} to {db_path}")
+
+
+def prune_user_contributions(db_path: str, before_day: int) -> int:
+    """删除 before_day 之前的贡献记录，返回删除的行数。"""
+    with session_scope(db_path) as session:
+        result = session.execute(delete(UserContribution).where(UserContribution.day < before_day))
+    return result.rowcount
+
+
+def get_top_contributor_users(db_path: str, first_day: int, last_day: int, limit: int = 100) -> List[Dict]:
+    """汇总 [first_day, last_day] 内已保存的每日贡献数 (按主键范围求和)，返回提交数最多的用户。
+
+    Args:
+        db_path (str): 用户数据库文件的路径。
+        first_day (int): 起始日期 (YYYYMMDD，含)。
+        last_day (int): 结束日期 (YYYYMMDD，含)。
+        limit (int): 返回的用户数量上限。
+
+    Returns:
+        List[Dict]: 用户数据字典，附加 commits、contributions 和有记录的天数 days，
+            按 commits、contributions 降序，不含没有提交的用户。
+    """
+    table = UserContribution.__table__
+    totals = (select(table.c.databaseId,
+                     func.sum(table.c.commits).label('commits'),
+                     func.sum(table.c.contributions).label('contributions'),
+                     func.count().label('days'))
+              .where(table.c.day.between(first_day, last_day))
+              .group_by(table.c.databaseId)
+              .subquery())
+    stmt = (select(User, totals.c.commits, totals.c.contributions, totals.c.days)
+            .join(totals, totals.c.databaseId == User.databaseId)
+            .where(totals.c.commits > 0)
+            .order_by(totals.c.commits.desc(), totals.c.contributions.desc(), User.databaseId)
+            .limit(limit))
+    with session_scope(db_path) as session:
+        return [{**user.as_dict(), 'commits': commits, 'contributions': contributions, 'days': days}
+                for user, commits, contributions, days in session.execute(stmt)]
+
+
+# --- 抓取断点 ---
+
+_CHECKPOINT_COLUMNS = ['shardKey', 'position', 'field', 'low', 'high', 'createdFrom',
+                       'createdTo', 'count', 'cursor', 'fetched', 'done']
+
+
+def _record_crawl_page(session: Session, checkpoint: Dict, ids: List[int]):
+    """在当前事务中更新分片断点，并记录本页写入的 databaseId。"""
+    session.execute(
+        update(CrawlCheckpoint.__table__)
+        .where(CrawlCheckpoint.runId == checkpoint['runId'],
+               CrawlCheckpoint.shardKey == checkpoint['shardKey'])
+        .values(cursor=checkpoint.get('cursor'),
+                fetched=checkpoint.get('fetched', 0),
+                done=bool(checkpoint.get('done')),
+                updatedAt=datetime.datetime.now()))
+    if ids:
+        session.execute(
+            sqlite_insert(CrawlRunItem.__table__).on_conflict_do_nothing(),
+            [{'runId': checkpoint['runId'], 'databaseId': databaseId} for databaseId in ids])
+
+
+def start_crawl_run(db_path: str, run_id: str, total_count: int, shards: List[Dict]) -> List[Dict]:
+    """开始新的抓取批次：清除旧批次的断点，并持久化分片计划。
+
+    Args:
+        db_path (str): 数据库文件的路径 (与抓取数据相同的数据库，断点与数据在同一事务中提交)。
+        run_id (str): 批次 id。
+        total_count (int): 规划时的搜索结果总数。
+        shards (List[Dict]): 分片列表，键为 field/low/high/createdFrom/createdTo/count/shardKey。
+
+    Returns:
+        List[Dict]: 各分片的初始断点，顺序与 shards 一致。
+    """
+    checkpoints = [{**shard, 'runId': run_id, 'position': position,
+                    'cursor': None, 'fetched': 0, 'done': False}
+                   for position, shard in enumerate(shards)]
+    with session_scope(db_path) as session:
+        for model in (CrawlRunItem, CrawlCheckpoint, CrawlRun):
+            session.execute(delete(model.__table__))
+        session.execute(sqlite_insert(CrawlRun.__table__).values(
+            runId=run_id, totalCount=total_count, startedAt=datetime.datetime.now()))
+        if checkpoints:
+            session.execute(sqlite_insert(CrawlCheckpoint.__table__),
+                            [{**checkpoint, 'updatedAt': datetime.datetime.now()}
+                             for checkpoint in checkpoints])
+    logger.info(f"Started crawl run {run_id} with {len(shards)} shards in {db_path}")
+    return checkpoints
+
+
+def get_latest_crawl_run(db_path: str) -> Optional[Dict]:
+    """查询最近一次抓取批次及其分片断点。
+
+    Returns:
+        Optional[Dict]: 批次信息 (runId/totalCount/fetchedCount/startedAt/finishedAt)，
+            ``shards`` 为按计划顺序排列的断点列表；没有批次时返回 None。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        run = conn.execute(select(CrawlRun.__table__)
+                           .order_by(CrawlRun.runId.desc()).limit(1)).first()
+        if run is None:
+            return None
+        checkpoints = conn.execute(
+            select(*[CrawlCheckpoint.__table__.c[column] for column in _CHECKPOINT_COLUMNS])
+            .where(CrawlCheckpoint.runId == run.runId)
+            .order_by(CrawlCheckpoint.position)).all()
+    result = run._asdict()
+    result['shards'] = [{**row._asdict(), 'runId': run.runId} for row in checkpoints]
+    return result
+
+
+def save_crawl_checkpoint(db_path: str, checkpoint: Dict):
+    """单独提交分片断点 (如游标链以空页结束时)。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        checkpoint (Dict): 断点，键为 runId/shardKey/cursor/fetched/done。
+    """
+    with session_scope(db_path) as session:
+        _record_crawl_page(session, checkpoint, [])
+
+
+def finish_crawl_run(db_path: str, run_id: str, fetched_count: int):
+    """标记抓取批次完成，并删除只在续传时才需要的条目记录。"""
+    with session_scope(db_path) as session:
+        session.execute(update(CrawlRun.__table__).where(CrawlRun.runId == run_id)
+                        .values(fetchedCount=fetched_count, finishedAt=datetime.datetime.now()))
+        session.execute(delete(CrawlRunItem.__table__).where(CrawlRunItem.runId == run_id))
+    logger.info(f"Finished crawl run {run_id} with {fetched_count} items in {db_path}")
+
+
+def iter_crawled_rows(db_path: str, table: Table, run_id: str, batch_size: int = 1000):
+    """分批读取某个抓取批次已提交的行，用于续传时重建输出文件。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        table (Table): 数据表 (users 或 repositories)。
+        run_id (str): 批次 id。
+        batch_size (int): 每批行数。
+
+    Yields:
+        List[Dict]: 一批行数据。
+    """
+    engine, _ = get_engine_and_session(db_path)
+    stmt = (select(table)
+            .join(CrawlRunItem.__table__, CrawlRunItem.databaseId == table.c.databaseId)
+            .where(CrawlRunItem.runId == run_id))
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for partition in result.partitions():
+            yield [row._asdict() for row in partition]
+
+
+# 仓库和用户抓取并发执行时会同时读写当天的 GithubInfo 记录，需串行化
+_total_count_lock = threading.Lock()
 
 
 def update_total_count(db_path: str, 
@@ -365,7 +1065,7 @@ def update_total_count(db_path: str,
         fetched_repos_count (Optional[int]): 当天实际抓取的仓库数，仅在大于 0 时更新。
         fetched_users_count (Optional[int]): 当天实际抓取的用户数，仅在大于 0 时更新。
     """
-    with session_scope(db_path) as session:
+    with _total_count_lock, session_scope(db_path) as session:
         dt = datetime.datetime.now().strftime("%Y%m%d")
         github_info = session.query(GithubInfo).filter_by(dt=dt).first()
         updated = False
@@ -432,3 +1132,89 @@ def get_total_count_by_datetime(db_path: str, date_str: str) -> Tuple[int, int,
         else:
             logger.warning(f"No GithubInfo found for date {date_str} in {db_path}")
             return 0, 0, 0, 0
+
+
+
+def get_latest_total_counts(db_path: str) -> Tuple[int, int]:
+    """获取最近一次记录的仓库总数和用户总数 (各自取最近一个非零值)。
+
+    仓库和用户抓取并发执行、各自在结束时写入计数，先完成的一方生成榜单时，
+    另一方当天的计数可能尚未写入，此时使用之前的计数。
+
+    Args:
+        db_path (str): GithubInfo 数据库文件的路径。
+
+    Returns:
+        Tuple[int, int]: (repos_count, users_count)，没有记录时为 0。
+    """
+    table = GithubInfo.__table__
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        counts = []
+        for column in (table.c.reposCount, table.c.usersCount):
+            value = conn.execute(select(column).where(column > 0)
+                                 .order_by(table.c.dt.desc()).limit(1)).scalar()
+            counts.append(value or 0)
+    return counts[0], counts[1]
+
+
+def save_pipeline_step_metrics(db_path: str, run_id: str, steps: List[Dict]):
+    """把一次管道运行的步骤指标追加到历史表 (同一 runId 重复保存时覆盖)。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        run_id (str): 运行 id。
+        steps (List[Dict]): ``PipelineMetrics.steps`` 中的步骤记录。
+    """
+    rows = []
+    for record in steps:
+        counters = record.get("counters", {})
+        rows.append({
+            'runId': run_id,
+            'step': record['step'],
+            'position': record['position'],
+            'status': record['status'],
+            'startedAt': datetime.datetime.fromisoformat(record['startedAt']),
+            'wallSeconds': record['wall_seconds'],
+            'cpuSeconds': record['cpu_seconds'],
+            'httpRequests': counters.get('http_requests'),
+            'rateLimitSleepSeconds': counters.get('rate_limit_sleep_seconds'),
+            'dbStatements': counters.get('db_statements_executed'),
+            'dbRows': counters.get('db_rows_affected'),
+            'bytesWritten': counters.get('files_bytes_written'),
+            'peakMemoryBytes': record.get('peak_memory_bytes'),
+            'counters': counters,
+        })
+    if not rows:
+        return
+    with session_scope(db_path) as session:
+        statement = sqlite_insert(PipelineStepMetric.__table__)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['runId', 'step'],
+            set_={column: statement.excluded[column] for column in rows[0] if column not in ('runId', 'step')}),
+            rows)
+    logger.info(f"Saved metrics of {len(rows)} steps for run {run_id} to {db_path}")
+
+
+def get_recent_pipeline_step_metrics(db_path: str, runs: int, exclude_run_id: Optional[str] = None) -> List[Dict]:
+    """查询最近若干次运行中成功步骤的指标。
+
+    Args:
+        db_path (str): 数据库文件的路径。
+        runs (int): 运行次数。
+        exclude_run_id (Optional[str]): 排除的运行 id (通常是本次运行)。
+
+    Returns:
+        List[Dict]: 步骤指标，键为 runId/step/wallSeconds/cpuSeconds。
+    """
+    table = PipelineStepMetric.__table__
+    run_ids = select(table.c.runId).distinct()
+    if exclude_run_id is not None:
+        run_ids = run_ids.where(table.c.runId != exclude_run_id)
+    run_ids = run_ids.order_by(table.c.runId.desc()).limit(runs)
+    engine, _ = get_engine_and_session(db_path)
+    with engine.connect() as conn:
+        result = conn.execute(
+            select(table.c.runId, table.c.step, table.c.wallSeconds, table.c.cpuSeconds)
+            .where(table.c.runId.in_(run_ids.scalar_subquery()), table.c.status == 'ok'))
+        return [row._asdict() for row in result]
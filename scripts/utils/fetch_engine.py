@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List
+
+from config import logger
+
+
+class FetchEngine:
+    """基于线程池的并发抓取引擎。
+
+    抓取任务主要耗时在网络 IO 上，``requests`` 在等待响应时会释放 GIL，
+    因此线程池即可让多个查询并发执行；请求速率由共享的 ``RateLimiter`` 控制。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Args:
+            max_workers (int): 最大并发线程数。
+        """
+        self.max_workers = max(1, max_workers)
+
+    def run(self, tasks: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """并发执行一组互不依赖的任务。
+
+        单个任务失败不会中断其它任务，失败任务的结果为其抛出的异常对象。
+
+        Args:
+            tasks (Dict[str, Callable[[], Any]]): 任务名到无参可调用对象的映射。
+
+        Returns:
+            Dict[str, Any]: 任务名到返回值（或异常）的映射。
+        """
+        results = {}
+        if not tasks:
+            return results
+        workers = min(self.max_workers, len(tasks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+            futures = {executor.submit(func): name for name, func in tasks.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    logger.info(f"Fetch task '{name}' finished")
+                except Exception as e:
+                    logger.error(f"Fetch task '{name}' failed: {type(e).__name__} - {e}")
+                    results[name] = e
+        return results
+
+    def map(self, func: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """并发地对每个元素执行 func，按输入顺序返回结果（或异常）。"""
+        items = list(items)
+        tasks = {str(i): (lambda item=item: func(item)) for i, item in enumerate(items)}
+        results = self.run(tasks)
+        return [results[str(i)] for i in range(len(items))]
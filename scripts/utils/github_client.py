@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import logger
+from .graphql_recorder import GraphQLRecorder
+from .rate_limiter import RateLimiter
+
+
+class GitHubClient:
+    """GitHub GraphQL API 客户端，复用一个带连接池的 ``requests.Session``。
+
+    所有抓取线程共享同一个实例：连接池让每个请求复用已建立的 TCP+TLS 连接
+    (keep-alive)，响应以 gzip 压缩传输，连接和读取超时分别可配置。
+    每个请求的耗时、传输字节数和 GraphQL 点数都会被记录，可通过 ``stats()`` 获取。
+    设置 ``recorder`` 后，每次交互 (包括失败的请求) 还会被录制下来以便离线回放。
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 headers: Optional[Mapping[str, str]] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 pool_size: int = 10,
+                 connect_timeout: float = 10,
+                 read_timeout: float = 60,
+                 accept_encoding: str = "gzip, deflate",
+                 retry_after: int = 60,
+                 recorder: Optional[GraphQLRecorder] = None):
+        """
+        Args:
+            base_url (str): API 基础 URL (如 ``https://api.github.com``)。
+            headers (Optional[Mapping[str, str]]): 每个请求附带的请求头 (认证信息等)。
+            rate_limiter (Optional[RateLimiter]): 共享的限流器，为 None 时不限流。
+            pool_size (int): 连接池大小，应不小于并发抓取的线程数。
+            connect_timeout (float): 建立连接的超时时间 (秒)。
+            read_timeout (float): 等待响应数据的超时时间 (秒)。
+            accept_encoding (str): ``Accept-Encoding`` 请求头。
+            retry_after (int): 429/二级限流且未返回 Retry-After 时的等待时间 (秒)。
+            recorder (Optional[GraphQLRecorder]): 录制每次交互的 recorder，为 None 时不录制。
+        """
+        self.graphql_url = f"{base_url.rstrip('/')}/graphql"
+        self.rate_limiter = rate_limiter
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_after = retry_after
+        self.recorder = recorder
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(headers or {})
+        self.session.headers["Accept-Encoding"] = accept_encoding
+
+        # 统计信息
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.points_used = 0
+
+    def _record(self, latency: float, response: Optional[requests.Response], cost: Optional[int]):
+        """记录一个请求的统计信息。"""
+        with self._lock:
+            self.requests += 1
+            self.latency_seconds += latency
+            self.max_latency_seconds = max(self.max_latency_seconds, latency)
+            if response is None or response.status_code != 200:
+                self.errors += 1
+            if response is not None:
+                decoded = len(response.content)
+                self.bytes_decoded += decoded
+                # Content-Length 是压缩后的长度；分块传输时没有该头，只能按解压后的长度计
+                self.bytes_received += int(response.headers.get("Content-Length", decoded))
+            if cost is not None:
+                self.points_used += cost
+
+    def graphql(self, query: str, operation_name: str, variables: Dict) -> Tuple[Dict, float]:
+        """发送一个 GraphQL 请求 (不重试)。
+
+        Args:
+            query (str): GraphQL 查询语句。
+            operation_name (str): GraphQL 操作名。
+            variables (Dict): 查询变量。
+
+        Returns:
+            Tuple[Dict, float]: 响应 JSON 和服务端响应耗时 (秒，不含下载响应体的时间)。
+
+        Raises:
+            requests.exceptions.RequestException: 请求失败或返回非 200 状态码。
+        """
+        payload = {
+            "query": query,
+            "operationName": operation_name,
+            "variables": variables
+        }
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = self.session.post(self.graphql_url, json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._record(time.monotonic() - started, None, None)
+            if self.recorder is not None:
+                self.recorder.record(operation_name, variables, error=e)
+            raise
+        latency = time.monotonic() - started
+        if self.recorder is not None:
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            self.recorder.record(operation_name, variables, response.status_code, response.headers,
+                                 body, response.elapsed.total_seconds())
+
+        # Feed the shared limiter with the budget reported in the response headers
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(response.headers)
+        if "X-RateLimit-Remaining" in response.headers:
+            logger.debug(f"Rate limit: {response.headers['X-RateLimit-Remaining']}/{response.headers.get('X-RateLimit-Limit')} "
+                         f"| Reset at: {response.headers.get('X-RateLimit-Reset')}")
+
+        if response.status_code != 200:
+            self._record(latency, response, None)
+            if response.status_code == 429 or (response.status_code == 403 and "Retry-After" in response.headers):
+                retry_after = int(response.headers.get("Retry-After", self.retry_after))
+                logger.warning(f"Rate limited ({response.status_code}), pausing all requests for {retry_after} seconds")
+                if self.rate_limiter is not None:
+                    self.rate_limiter.block_for(retry_after)
+            elif response.status_code == 403:
+                logger.error(f"Forbidden (403) error accessing GitHub API: {response.text}")
+            else:
+                logger.warning(f"Non-200 status code: {response.status_code}|{response.text}")
+            response.raise_for_status() # Raise to let the caller retry or fail
+
+        result = response.json()
+        rate_limit = (result.get("data") or {}).get("rateLimit")
+        self._record(latency, response, (rate_limit or {}).get("cost"))
+        # GraphQL reports the real point cost of the query, which headers do not
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_graphql(rate_limit)
+        return result, response.elapsed.total_seconds()
+
+    def stats(self) -> Dict:
+        """返回客户端的统计信息。"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_latency_ms": round(self.latency_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+                "max_latency_ms": round(self.max_latency_seconds * 1000, 1),
+                "bytes_received": self.bytes_received,
+                "bytes_decoded": self.bytes_decoded,
+                "points_used": self.points_used,
+            }
+
+    def close(self):
+        """关闭会话及其连接池。"""
+        self.session.close()
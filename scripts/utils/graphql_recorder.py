@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+from config import logger
+
+# 回放时需要的响应头 (限流信息)
+RECORDED_HEADERS = ("X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "Retry-After")
+
+
+def exchange_key(operation_name: str, variables: Optional[Dict]) -> str:
+    """返回用于匹配录制请求与回放请求的键 (操作名 + 规范化的变量)。"""
+    return f"{operation_name} {json.dumps(variables or {}, sort_keys=True, separators=(',', ':'))}"
+
+
+class GraphQLRecorder:
+    """把 GitHub GraphQL 请求和响应逐条追加到 JSON Lines 文件 (cassette)。
+
+    每行记录一次交互：操作名、变量、状态码、限流响应头、服务端耗时和响应体；
+    网络错误 (超时、连接中断) 也会被记录。录制的文件可以交给
+    ``scripts/benchmarks/fake_graphql_server.py`` 离线回放，
+    包括游标链、限流响应头和 502 等失败响应。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): cassette 文件路径，已存在时追加写入。
+        """
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        logger.info(f"Recording GraphQL exchanges to {path}")
+
+    def record(self,
+               operation_name: str,
+               variables: Optional[Dict],
+               status: Optional[int] = None,
+               headers: Optional[Mapping[str, str]] = None,
+               body=None,
+               elapsed: Optional[float] = None,
+               error: Optional[Exception] = None):
+        """记录一次交互。
+
+        Args:
+            operation_name (str): GraphQL 操作名。
+            variables (Optional[Dict]): 查询变量。
+            status (Optional[int]): HTTP 状态码，网络错误时为 None。
+            headers (Optional[Mapping[str, str]]): 响应头，只保留限流相关的头。
+            body: 响应体 (JSON 对象或文本)。
+            elapsed (Optional[float]): 服务端响应耗时 (秒)。
+            error (Optional[Exception]): 网络错误。
+        """
+        entry = {
+            "key": exchange_key(operation_name, variables),
+            "operationName": operation_name,
+            "variables": variables,
+            "recordedAt": time.time(),
+            "status": status,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if headers and name in headers},
+            "elapsed": elapsed,
+            "body": body,
+            "error": type(error).__name__ if error is not None else None,
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        """关闭 cassette 文件。"""
+        with self._lock:
+            self._file.close()
+        logger.info(f"Recorded {self.count} GraphQL exchanges to {self.path}")
+
+
+def load_cassette(path: str) -> Dict[str, list]:
+    """读取 cassette 文件，按 ``exchange_key`` 分组，保持录制顺序。"""
+    exchanges = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                exchanges.setdefault(entry["key"], []).append(entry)
+    return exchanges
@@ -1,7 +1,9 @@
-from sqlalchemy import JSON, Column, DateTime, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, Integer, String
 from sqlalchemy.orm import declarative_base
 
-__all__ = ['User', 'Repository', 'GithubInfo', 'Base']
+__all__ = ['User', 'Repository', 'GithubInfo', 'StarHistory',
+           'CrawlRun', 'CrawlCheckpoint', 'CrawlRunItem', 'PipelineStepMetric',
+           'LanguageDailyStat', 'UserContribution', 'Base']
 
 Base = declarative_base()
 
@@ -21,6 +23,7 @@ class User(Base):
     followersCount = Column(Integer, comment='Number of followers')
     topRepositories_starsgazerCount = Column(Integer, comment='Total stars of top repositories')
     updatedAt = Column(DateTime, comment='Last update timestamp')
+    metadataUpdatedAt = Column(DateTime, comment='Last full metadata refresh timestamp')
 
     def as_dict(self) -> Dict[str, Any]:
         """Converts the User model instance to a dictionary.
@@ -55,6 +58,7 @@ class Repository(Base):
     accumulatedStars_30d = Column(Integer, comment='Star difference in the last 30 days', default=0)
     createdAt = Column(String, comment='Creation timestamp (ISO 8601 string)') # Kept as string based on db_utils usage
     updatedAt = Column(DateTime, comment='Last update timestamp')
+    metadataUpdatedAt = Column(DateTime, comment='Last full metadata refresh timestamp')
 
     def as_dict(self) -> Dict[str, Any]:
         """Converts the Repository model instance to a dictionary.
@@ -67,7 +71,7 @@ class Repository(Base):
             value = getattr(self, column.name)
             # Handle JSON fields
             if column.name == 'language':
-                result[column.name] = value.split('|') if value else []
+                result[column.name] = [name.strip() for name in value.split('|')] if value else []
             else:
                 result[column.name] = value
         return result
@@ -81,3 +85,91 @@ class GithubInfo(Base):
     usersCount = Column(Integer, comment='Total user count for the day', default=0)
     fetchedReposCount = Column(Integer, comment='Actual fetched repository count for the day', default=0)
     fetchedUsersCount = Column(Integer, comment='Actual fetched user count for the day', default=0)
+
+
+class StarHistory(Base):
+    """Append-only daily star counts, one row per (day, repository)."""
+    __tablename__ = 'star_history'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = Column(Integer, primary_key=True, comment='Snapshot date as YYYYMMDD')
+    databaseId = Column(Integer, primary_key=True, comment='GitHub Database ID')
+    stars = Column(Integer, nullable=False, comment='Accumulated stars on that day')
+
+
+class CrawlRun(Base):
+    """One search crawl (repos or users), kept so an interrupted crawl can be resumed."""
+    __tablename__ = 'crawl_runs'
+    runId = Column(String, primary_key=True, comment='Run id (YYYYMMDDHHMMSS of the start time)')
+    totalCount = Column(Integer, comment='Total search result count when the run was planned')
+    fetchedCount = Column(Integer, comment='Unique items fetched, set when the run finishes')
+    startedAt = Column(DateTime, comment='Start timestamp')
+    finishedAt = Column(DateTime, comment='Finish timestamp, NULL while the run is incomplete')
+
+
+class CrawlCheckpoint(Base):
+    """Planned search shard of a crawl run and how far its cursor chain has been followed."""
+    __tablename__ = 'crawl_checkpoints'
+    runId = Column(String, primary_key=True, comment='Run id')
+    shardKey = Column(String, primary_key=True, comment='Search qualifier of the shard')
+    position = Column(Integer, comment='Order of the shard in the plan')
+    field = Column(String, comment='Shard field ("stars" or "followers")')
+    low = Column(Integer, comment='Lower bound (inclusive)')
+    high = Column(Integer, comment='Upper bound (inclusive), NULL for no upper bound')
+    createdFrom = Column(String, comment='created: window start (YYYY-MM-DD)')
+    createdTo = Column(String, comment='created: window end (YYYY-MM-DD)')
+    count = Column(Integer, comment='Result count when the shard was planned')
+    cursor = Column(String, comment='Cursor of the last committed page')
+    fetched = Column(Integer, comment='Items fetched from this shard so far', default=0)
+    done = Column(Boolean, comment='Whether the cursor chain is exhausted', default=False)
+    updatedAt = Column(DateTime, comment='Last update timestamp')
+
+
+class CrawlRunItem(Base):
+    """Items committed by an unfinished crawl run, used to rebuild its output on resume."""
+    __tablename__ = 'crawl_run_items'
+    __table_args__ = {'sqlite_with_rowid': False}
+    runId = Column(String, primary_key=True, comment='Run id')
+    databaseId = Column(Integer, primary_key=True, comment='GitHub Database ID')
+
+
+class PipelineStepMetric(Base):
+    """Per-step timings and counters of every pipeline run, kept to spot regressions across runs."""
+    __tablename__ = 'pipeline_step_metrics'
+    runId = Column(String, primary_key=True, comment='Run id (YYYYMMDDHHMMSS of the start time)')
+    step = Column(String, primary_key=True, comment='Step name')
+    position = Column(Integer, comment='Order of the step in the run')
+    status = Column(String, comment='"ok" or "failed"')
+    startedAt = Column(DateTime, comment='Start timestamp')
+    wallSeconds = Column(Float, comment='Wall-clock time of the step')
+    cpuSeconds = Column(Float, comment='Process CPU time of the step (all threads)')
+    httpRequests = Column(Integer, comment='GraphQL requests sent')
+    rateLimitSleepSeconds = Column(Float, comment='Seconds spent waiting for the rate limiter')
+    dbStatements = Column(Integer, comment='SQL statements executed')
+    dbRows = Column(Integer, comment='Rows affected by SQL statements')
+    bytesWritten = Column(Integer, comment='Bytes written to published and archived files')
+    peakMemoryBytes = Column(Integer, comment='tracemalloc peak, NULL when memory tracing is off')
+    counters = Column(JSON, comment='All counters of the step')
+
+
+class LanguageDailyStat(Base):
+    """Materialized per-day, per-language counters (keyed by primary language for the tracked repositories)."""
+    __tablename__ = 'language_daily_stats'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = Column(Integer, primary_key=True, comment='Date as YYYYMMDD')
+    language = Column(String, primary_key=True, comment='Primary language')
+    newRepos = Column(Integer, default=0, comment='Repositories on GitHub created on that day (created: search count)')
+    starsGained = Column(Integer, default=0, comment='Stars gained on that day by tracked repositories')
+    repos = Column(Integer, default=0, comment='Tracked repositories on that day (set for days the pipeline ran)')
+    updatedAt = Column(DateTime, comment='Last update timestamp')
+
+
+class UserContribution(Base):
+    """Contributions of a tracked user on one UTC day, from contributionsCollection(from:, to:)."""
+    __tablename__ = 'user_contributions'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = Column(Integer, primary_key=True, comment='Date as YYYYMMDD (UTC)')
+    databaseId = Column(Integer, primary_key=True, comment='GitHub Database ID of the user')
+    commits = Column(Integer, default=0, comment='Commit contributions (public repositories)')
+    contributions = Column(Integer, default=0,
+                           comment='Commits, issues, pull requests and reviews, plus private contributions')
+    updatedAt = Column(DateTime, comment='Last update timestamp')
@@ -0,0 +1,80 @@
+import math
+import threading
+from typing import List, Optional
+
+from config import logger
+
+# GitHub 对单个 nodes(ids:) 字段最多接受 100 个 id
+NODES_FIELD_LIMIT = 100
+
+
+class NodeBatcher:
+    """按 GraphQL 查询成本自适应地把 node id 切分为批次。
+
+    一个查询可以包含多个带别名的 ``nodes(ids:)`` 字段，因此每批 id 数量可以超过
+    单个字段的 100 个上限。第一批使用 ``initial_size`` 作为探测，之后根据响应中
+    ``rateLimit.cost`` 观测到的每个节点的点数，把批次放大到单个查询不超过
+    ``max_query_cost`` 点为止 (同时不超过 ``max_size``)。
+    """
+
+    def __init__(self,
+                 max_size: int = 1000,
+                 max_query_cost: int = 20,
+                 initial_size: int = NODES_FIELD_LIMIT):
+        """
+        Args:
+            max_size (int): 每批的最大 id 数 (别名字段数 × 100)。
+            max_query_cost (int): 单个查询允许消耗的最大点数。
+            initial_size (int): 尚无成本观测时的探测批次大小。
+        """
+        self.max_size = max(1, max_size)
+        self.max_query_cost = max(1, max_query_cost)
+        self.initial_size = max(1, min(initial_size, self.max_size))
+        self._lock = threading.Lock()
+        self._cost_per_node: Optional[float] = None
+
+    @property
+    def observed(self) -> bool:
+        """是否已经观测到至少一个查询的成本。"""
+        return self._cost_per_node is not None
+
+    def observe(self, batch_size: int, cost: Optional[int]):
+        """记录一个批次的实际点数。
+
+        每个查询至少消耗 1 点，小批次会高估单个节点的成本，
+        因此只在批次不小于探测大小时才用它降低估计值；更高的成本总是被采用。
+        """
+        if not batch_size or cost is None:
+            return
+        per_node = cost / batch_size
+        with self._lock:
+            if (self._cost_per_node is None or per_node > self._cost_per_node
+                    or batch_size >= self.initial_size):
+                self._cost_per_node = per_node
+
+    def batch_size(self) -> int:
+        """返回当前成本估计下的批次大小。"""
+        with self._lock:
+            if self._cost_per_node is None:
+                return self.initial_size
+            if self._cost_per_node <= 0:
+                return self.max_size
+            size = int(self.max_query_cost / self._cost_per_node)
+        return max(1, min(size, self.max_size))
+
+    def take(self, ids: List, max_batches: int) -> List[List]:
+        """从 ids 头部取出最多 max_batches 个批次 (会修改 ids)。
+
+        尚无成本观测时只取出一个探测批次，让后续批次可以按实际成本放大。
+        """
+        size = self.batch_size()
+        count = 1 if not self.observed else max(1, max_batches)
+        batches = [ids[i * size:(i + 1) * size] for i in range(min(count, math.ceil(len(ids) / size)))]
+        del ids[:sum(len(batch) for batch in batches)]
+        return batches
+
+    def log_estimate(self, name: str, total: int):
+        """记录按当前批次大小刷新 total 个节点预计需要的查询数。"""
+        size = self.batch_size()
+        logger.info(f"{name}: batch size {size} ({math.ceil(size / NODES_FIELD_LIMIT)} aliased nodes fields), "
+                    f"~{math.ceil(total / size)} queries for {total} nodes")
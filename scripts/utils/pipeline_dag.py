@@ -0,0 +1,139 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+
+from config import logger
+
+# 步骤的最终状态
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class PipelineStep:
+    """管道中的一个步骤：读取 ``inputs`` 中的产物，成功后产出 ``outputs`` 中的产物。
+
+    步骤之间的依赖由产物推导：一个步骤依赖于产出其任一输入的步骤。
+    """
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[[], object],
+                 inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = (),
+                 run_on_failure: bool = False):
+        """
+        Args:
+            name (str): 步骤名称。
+            func (Callable[[], object]): 无参可调用对象，抛出异常表示失败。
+            inputs (Iterable[str]): 读取的产物名称。
+            outputs (Iterable[str]): 产出的产物名称。
+            run_on_failure (bool): 上游失败或被跳过时仍然执行 (如收尾检查)；默认跳过。
+        """
+        self.name = name
+        self.func = func
+        self.inputs = frozenset(inputs)
+        self.outputs = frozenset(outputs)
+        self.run_on_failure = run_on_failure
+
+
+class PipelineDAG:
+    """按产物依赖调度步骤的小型 DAG 执行器。
+
+    所有上游步骤结束后，步骤立即在线程池中执行，互不依赖的分支并发运行。
+    某个步骤失败时，只有 (直接或间接) 依赖其产物的步骤会被跳过，其它分支照常完成。
+    """
+
+    def __init__(self, steps: List[PipelineStep]):
+        """
+        Args:
+            steps (List[PipelineStep]): 步骤列表，产物只能由一个步骤产出。
+
+        Raises:
+            ValueError: 步骤重名、产物重复产出、输入没有产出者或存在环。
+        """
+        self.steps = {}
+        producers = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate pipeline step '{step.name}'")
+            self.steps[step.name] = step
+            for output in step.outputs:
+                if output in producers:
+                    raise ValueError(f"Output '{output}' is produced by both '{producers[output]}' and '{step.name}'")
+                producers[output] = step.name
+        self.upstream: Dict[str, set] = {}
+        for step in steps:
+            missing = [name for name in step.inputs if name not in producers]
+            if missing:
+                raise ValueError(f"Inputs {missing} of step '{step.name}' are not produced by any step")
+            self.upstream[step.name] = {producers[name] for name in step.inputs}
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """返回拓扑序 (同层按声明顺序)，有环时抛出 ValueError。"""
+        order = []
+        done = set()
+        pending = list(self.steps)
+        while pending:
+            ready = [name for name in pending if self.upstream[name] <= done]
+            if not ready:
+                raise ValueError(f"Pipeline steps {pending} have a dependency cycle")
+            order.extend(ready)
+            done.update(ready)
+            pending = [name for name in pending if name not in done]
+        return order
+
+    def run(self,
+            max_workers: int = 2,
+            wrap: Optional[Callable[[str], ContextManager]] = None,
+            on_skip: Optional[Callable[[str, List[str]], None]] = None) -> Dict[str, str]:
+        """执行所有步骤。
+
+        Args:
+            max_workers (int): 同时执行的最大步骤数。
+            wrap (Optional[Callable[[str], ContextManager]]): 以步骤名调用，返回包裹该步骤执行的上下文管理器
+                (如 ``PipelineMetrics.step``)。
+            on_skip (Optional[Callable[[str, List[str]], None]]): 步骤因上游失败被跳过时调用，参数为步骤名和失败的上游步骤。
+
+        Returns:
+            Dict[str, str]: 步骤名到状态 (ok / failed / skipped) 的映射。
+        """
+        wrap = wrap or (lambda name: nullcontext())
+        status: Dict[str, str] = {}
+
+        def execute(name):
+            logger.info(f"--- Starting Step: {name} ---")
+            try:
+                with wrap(name):
+                    self.steps[name].func()
+                logger.info(f"--- Finished Step: {name} ---")
+                return STATUS_OK
+            except Exception as e:
+                logger.error(f"--- Step Failed: {name} - {e} ---", exc_info=True)
+                return STATUS_FAILED
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="step") as executor:
+            running = {}
+            while len(status) < len(self.steps):
+                # Topological order: a step skipped here makes its dependents decidable in the same pass
+                for name in self.order:
+                    if name in status or name in running.values():
+                        continue
+                    upstream = self.upstream[name]
+                    if not upstream <= set(status):
+                        continue
+                    failed = sorted(up for up in upstream if status[up] != STATUS_OK)
+                    if failed and not self.steps[name].run_on_failure:
+                        status[name] = STATUS_SKIPPED
+                        logger.warning(f"--- Skipping Step: {name} (upstream failed: {', '.join(failed)}) ---")
+                        if on_skip is not None:
+                            on_skip(name, failed)
+                        continue
+                    running[executor.submit(execute, name)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    status[running.pop(future)] = future.result()
+        return {name: status[name] for name in self.order}
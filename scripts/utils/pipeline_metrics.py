@@ -0,0 +1,244 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import logger
+
+# 计数器来源：返回 {计数器名: 累计值} 的函数，步骤的计数为结束与开始时的差值
+CounterSource = Callable[[], Dict[str, float]]
+
+
+class PipelineMetrics:
+    """记录管道每个步骤的耗时、资源计数器，以及可选的 cProfile / tracemalloc 数据。
+
+    每个步骤记录墙钟时间和进程 CPU 时间 (包括所有抓取线程)，以及各计数器来源
+    (HTTP 请求数、限流等待时间、数据库语句数和行数、写出的字节数等) 在该步骤内的增量。
+    ``profile`` 开启时用 cProfile 分析每个步骤 (只覆盖执行步骤的线程，抓取线程池中的
+    函数不会出现在结果中)，``.prof`` 文件写入 ``profile_dir``；``trace_memory`` 开启时
+    用 tracemalloc 记录每个步骤的内存峰值和分配最多的代码行。
+
+    用法:
+        metrics = PipelineMetrics(run_id)
+        metrics.add_counter_source("http", github_client.stats)
+        with metrics.step("Fetching Data"):
+            fetch_data()
+        metrics.save(path)
+    """
+
+    def __init__(self,
+                 run_id: Optional[str] = None,
+                 profile: bool = False,
+                 trace_memory: bool = False,
+                 profile_dir: Optional[str] = None,
+                 top_functions: int = 10):
+        """
+        Args:
+            run_id (Optional[str]): 运行 id，默认使用开始时间 (YYYYMMDDHHMMSS)。
+            profile (bool): 是否用 cProfile 分析每个步骤。
+            trace_memory (bool): 是否用 tracemalloc 记录每个步骤的内存分配。
+            profile_dir (Optional[str]): ``.prof`` 文件的输出目录，为 None 时不写文件。
+            top_functions (int): 报告中保留的耗时最多的函数 / 分配最多的代码行数。
+        """
+        self.started_at = datetime.datetime.now()
+        self.run_id = run_id or self.started_at.strftime("%Y%m%d%H%M%S")
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.top_functions = top_functions
+        self.steps: List[Dict] = []
+        self._sources: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._positions = 0
+        self._active: Dict[int, Dict] = {}
+        self._tracing = 0
+        self._baseline = None  # (墙钟时间, CPU 时间, 计数器)，第一个步骤开始时记录
+
+    def add_counter_source(self, name: str, source: CounterSource, keys: Optional[List[str]] = None):
+        """注册一个计数器来源，其计数器在报告中以 ``{name}_{key}`` 命名。
+
+        Args:
+            name (str): 来源名称。
+            source (CounterSource): 返回累计计数器的函数。
+            keys (Optional[List[str]]): 只记录这些键 (平均值、剩余额度等非累计值不能求差)，为 None 时记录全部数值。
+        """
+        self._sources[name] = (source, keys)
+
+    def _read_counters(self) -> Dict[str, float]:
+        counters = {}
+        for name, (source, keys) in self._sources.items():
+            try:
+                values = source()
+            except Exception as e:
+                logger.warning(f"Failed to read counters from {name}: {e}")
+                continue
+            for key, value in values.items():
+                if keys is not None and key not in keys:
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    counters[f"{name}_{key}"] = value
+        return counters
+
+    def _profile_report(self, name: str, profiler: cProfile.Profile) -> Dict:
+        """返回累计耗时最多的函数，并按需写出 ``.prof`` 文件。"""
+        report = {}
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            slug = "".join(c if c.isalnum() else "_" for c in name.lower())
+            path = os.path.join(self.profile_dir, f"{self.run_id}_{slug}.prof")
+            profiler.dump_stats(path)
+            report["file"] = path
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        report["top"] = [
+            {"function": f"{filename}:{line}({function})", "calls": calls,
+             "total_seconds": round(total, 4), "cumulative_seconds": round(cumulative, 4)}
+            for (filename, line, function), (_, calls, total, cumulative, _) in
+            sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_functions]
+        ]
+        return report
+
+    def _start_tracing(self):
+        with self._lock:
+            if self._tracing == 0:
+                tracemalloc.start()
+            self._tracing += 1
+
+    def _stop_tracing(self, record: Dict):
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot()
+            record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            self._tracing -= 1
+            if self._tracing == 0:
+                tracemalloc.stop()
+        record["top_allocations"] = [
+            {"line": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:self.top_functions]
+        ]
+
+    @contextmanager
+    def step(self, name: str):
+        """测量一个步骤；步骤抛出的异常会被记录为失败状态并继续向上抛出。
+
+        步骤可以在不同线程中并发执行。CPU 时间、计数器和内存峰值是进程级的，
+        并发步骤的这些值会互相包含，``overlapped_with`` 列出与该步骤同时运行过的步骤。
+        """
+        record = {"step": name, "status": "ok",
+                  "startedAt": datetime.datetime.now().isoformat(timespec="seconds"),
+                  "overlapped_with": []}
+        with self._lock:
+            record["position"] = self._positions
+            self._positions += 1
+            for other in self._active.values():
+                other["overlapped_with"].append(name)
+                record["overlapped_with"].append(other["step"])
+            self._active[id(record)] = record
+        counters_before = self._read_counters()
+        with self._lock:
+            if self._baseline is None:
+                self._baseline = (time.perf_counter(), time.process_time(), counters_before)
+        profiler = cProfile.Profile() if self.profile else None
+        if self.trace_memory:
+            self._start_tracing()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as e:
+            record["status"] = "failed"
+            record["error"] = str(e)
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 3)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+            counters_after = self._read_counters()
+            record["counters"] = {key: round(value - counters_before.get(key, 0), 3)
+                                  for key, value in counters_after.items()}
+            if self.trace_memory:
+                self._stop_tracing(record)
+            if profiler is not None:
+                record["profile"] = self._profile_report(name, profiler)
+            with self._lock:
+                del self._active[id(record)]
+                self.steps.append(record)
+            logger.info(f"Step metrics: {name} wall={record['wall_seconds']}s cpu={record['cpu_seconds']}s "
+                         f"{record['counters']}")
+
+    def skip(self, name: str, reason: str):
+        """记录一个未执行 (因上游失败被跳过) 的步骤。"""
+        with self._lock:
+            self.steps.append({"step": name, "position": self._positions, "status": "skipped",
+                               "startedAt": datetime.datetime.now().isoformat(timespec="seconds"),
+                               "error": reason, "overlapped_with": [],
+                               "wall_seconds": 0.0, "cpu_seconds": 0.0, "counters": {}})
+            self._positions += 1
+
+    def to_dict(self) -> Dict:
+        """返回整个运行的报告 (按开始顺序排列的步骤记录，及从第一个步骤开始至今的合计)。
+
+        步骤可能并发执行，合计直接取整个运行期间的墙钟时间、CPU 时间和计数器增量，而不是各步骤之和。
+        """
+        totals = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "counters": {}}
+        if self._baseline is not None:
+            wall_start, cpu_start, counters_start = self._baseline
+            totals["wall_seconds"] = round(time.perf_counter() - wall_start, 3)
+            totals["cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+            totals["counters"] = {key: round(value - counters_start.get(key, 0), 3)
+                                  for key, value in self._read_counters().items()}
+        steps = sorted(self.steps, key=lambda record: record["position"])
+        return {
+            "runId": self.run_id,
+            "startedAt": self.started_at.isoformat(timespec="seconds"),
+            "status": "failed" if any(r["status"] != "ok" for r in steps) else "ok",
+            "steps": steps,
+            "totals": totals,
+        }
+
+    def save(self, path: str):
+        """把报告写入 JSON 文件 (先写临时文件再原子替换)。"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        logger.info(f"Run metrics saved to {path}")
+
+
+def find_regressions(current: List[Dict], history: List[Dict], factor: float,
+                     min_seconds: float = 1.0) -> List[str]:
+    """对比本次与历史运行的步骤耗时，返回明显变慢的步骤说明。
+
+    Args:
+        current (List[Dict]): 本次运行的步骤记录 (``PipelineMetrics.steps``)。
+        history (List[Dict]): 历史步骤记录，键为 step/wallSeconds。
+        factor (float): 墙钟时间超过历史中位数的该倍数时视为回归。
+        min_seconds (float): 低于该耗时的步骤不参与比较，避免噪声。
+
+    Returns:
+        List[str]: 每个回归步骤一条说明。
+    """
+    by_step: Dict[str, List[float]] = {}
+    for row in history:
+        if row.get("wallSeconds") is not None:
+            by_step.setdefault(row["step"], []).append(row["wallSeconds"])
+    regressions = []
+    for record in current:
+        previous = sorted(by_step.get(record["step"], []))
+        if not previous or record["status"] != "ok":
+            continue
+        median = previous[len(previous) // 2]
+        if record["wall_seconds"] >= min_seconds and record["wall_seconds"] > median * factor:
+            regressions.append(f"{record['step']}: {record['wall_seconds']}s vs median {median}s "
+                               f"over the last {len(previous)} runs")
+    return regressions
@@ -0,0 +1,191 @@
+import datetime
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+from config import logger
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器，由 GitHub 返回的限流信息动态校准。
+
+    本地令牌桶控制请求的瞬时速率（避免触发 GitHub 的二级限流），
+    服务端预算（``X-RateLimit-*`` 响应头与 GraphQL ``rateLimit`` 字段）
+    决定在重置时间之前还能消耗多少点数。两者取更严格者，
+    因此只会等待预算真正需要的时间，而不是每次请求固定休眠。
+    """
+
+    def __init__(self,
+                 requests_per_second: float = 2.0,
+                 burst: int = 5,
+                 reserve_points: int = 50):
+        """
+        Args:
+            requests_per_second (float): 本地令牌桶的最大补充速率 (次/秒)。
+            burst (int): 令牌桶容量，即允许的最大突发请求数。
+            reserve_points (int): 保留的服务端点数，剩余点数低于该值时等待重置。
+        """
+        self.max_rate = float(requests_per_second)
+        self.capacity = float(burst)
+        self.reserve_points = reserve_points
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0  # time.time() 时间戳，429/二级限流时的强制等待
+
+        # 服务端预算
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # epoch 秒
+        self.last_cost: Optional[int] = None
+
+        # 统计信息
+        self.requests = 0
+        self.points_used = 0
+        self.sleep_seconds = 0.0
+
+    # --- 内部工具 ---
+
+    def _current_rate(self, now: float) -> float:
+        """根据剩余预算计算当前允许的补充速率。"""
+        if self.remaining is None or self.reset_at is None:
+            return self.max_rate
+        seconds_to_reset = max(self.reset_at - now, 1.0)
+        budget = max(self.remaining - self.reserve_points, 0)
+        cost = max(self.last_cost or 1, 1)
+        return min(self.max_rate, budget / cost / seconds_to_reset)
+
+    def _refill(self, now_mono: float, now: float):
+        elapsed = now_mono - self._last_refill
+        self._last_refill = now_mono
+        self._tokens = min(self.capacity,
+                           self._tokens + elapsed * self._current_rate(now))
+
+    def _wait_seconds(self, cost: int) -> float:
+        """返回获取 cost 个令牌前需要等待的秒数，0 表示可以立即发送。"""
+        now = time.time()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        if self.reset_at is not None and now >= self.reset_at:
+            # 限流窗口已重置，在收到新的响应之前按满额预算处理
+            self.remaining = self.limit
+            self.reset_at = None
+
+        # 服务端预算耗尽，等待重置
+        if (self.remaining is not None and self.reset_at is not None
+                and self.remaining - cost < self.reserve_points
+                and now < self.reset_at):
+            return self.reset_at - now + 1.0
+
+        self._refill(time.monotonic(), now)
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            if self.remaining is not None:
+                # 预扣点数，避免并发请求同时透支预算
+                self.remaining -= cost
+            return 0.0
+        rate = self._current_rate(now)
+        if rate <= 0:
+            return max((self.reset_at or now) - now, 1.0)
+        return (1.0 - self._tokens) / rate
+
+    # --- 公共接口 ---
+
+    def acquire(self, cost: Optional[int] = None) -> float:
+        """阻塞直到允许发送下一个请求。
+
+        Args:
+            cost (Optional[int]): 预计消耗的点数，默认为上一次请求的实际消耗。
+
+        Returns:
+            float: 本次调用累计等待的秒数。
+        """
+        cost = max(cost or self.last_cost or 1, 1)
+        waited = 0.0
+        while True:
+            with self._lock:
+                wait = self._wait_seconds(cost)
+                if wait <= 0:
+                    self.requests += 1
+                    self.sleep_seconds += waited
+                    return waited
+            if wait > 1.0:
+                logger.info(f"Rate limiter waiting {wait:.1f}s "
+                            f"(remaining={self.remaining}, reset_at={self.reset_at})")
+            time.sleep(wait)
+            waited += wait
+
+    def update(self,
+               remaining: Optional[int] = None,
+               reset_at: Optional[float] = None,
+               limit: Optional[int] = None,
+               cost: Optional[int] = None):
+        """使用服务端返回的限流信息校准预算。
+
+        Args:
+            remaining (Optional[int]): 剩余点数。
+            reset_at (Optional[float]): 预算重置时间 (epoch 秒)。
+            limit (Optional[int]): 每个窗口的总点数。
+            cost (Optional[int]): 上一次请求实际消耗的点数。
+        """
+        with self._lock:
+            if reset_at is not None and self.reset_at is not None and reset_at > self.reset_at:
+                # 进入新的限流窗口，直接采用服务端数据
+                self.remaining = remaining
+            elif remaining is not None:
+                # 同一窗口内并发响应可能乱序到达，取更保守的值
+                self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
+            if reset_at is not None:
+                self.reset_at = float(reset_at)
+            if limit is not None:
+                self.limit = limit
+            if cost is not None:
+                self.last_cost = cost
+                self.points_used += cost
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """从 ``X-RateLimit-*`` 响应头更新预算。"""
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        try:
+            self.update(remaining=int(headers["X-RateLimit-Remaining"]),
+                        reset_at=float(headers["X-RateLimit-Reset"]),
+                        limit=int(headers["X-RateLimit-Limit"]))
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Could not parse rate limit headers: {e}")
+
+    def update_from_graphql(self, rate_limit: Optional[Dict]):
+        """从 GraphQL 响应中的 ``rateLimit { cost remaining resetAt }`` 更新预算。"""
+        if not rate_limit:
+            return
+        reset_at = None
+        if rate_limit.get("resetAt"):
+            try:
+                reset_at = datetime.datetime.strptime(
+                    rate_limit["resetAt"], "%Y-%m-%dT%H:%M:%SZ").replace(
+                        tzinfo=datetime.timezone.utc).timestamp()
+            except ValueError:
+                logger.warning(f"Invalid resetAt in rateLimit: {rate_limit['resetAt']}")
+        self.update(remaining=rate_limit.get("remaining"),
+                    reset_at=reset_at,
+                    limit=rate_limit.get("limit"),
+                    cost=rate_limit.get("cost"))
+
+    def block_for(self, seconds: float):
+        """在 429 或二级限流时，让所有线程暂停指定的秒数。"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.time() + seconds)
+            self._tokens = 0.0
+
+    def stats(self) -> Dict:
+        """返回限流器的统计信息。"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "points_used": self.points_used,
+                "sleep_seconds": round(self.sleep_seconds, 3),
+                "remaining": self.remaining,
+                "limit": self.limit,
+            }
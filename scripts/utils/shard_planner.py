@@ -0,0 +1,214 @@
+import datetime
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import logger
+
+# GitHub 搜索 API 对单个查询最多返回 1000 条结果
+SEARCH_RESULT_CAP = 1000
+# created: 日期切分的起点 (GitHub 于 2008 年上线)
+CREATED_EPOCH = datetime.date(2008, 1, 1)
+
+
+@dataclass(frozen=True)
+class SearchShard:
+    """GitHub 搜索空间中的一个分片，对应一个 ``stars:a..b`` / ``followers:a..b`` 窗口。
+
+    当单个数值 (如 ``stars:5``) 的结果仍超过上限时，
+    再附加 ``created:from..to`` 日期窗口进一步切分。
+    """
+    field: str  # "stars" 或 "followers"
+    low: int
+    high: Optional[int] = None  # None 表示没有上限
+    created_from: Optional[datetime.date] = None
+    created_to: Optional[datetime.date] = None
+    count: int = field(default=0, compare=False)
+
+    def qualifier(self) -> str:
+        """返回用于搜索查询的限定条件字符串。"""
+        if self.high is None:
+            q = f"{self.field}:>={self.low}"
+        elif self.low == self.high:
+            q = f"{self.field}:{self.low}"
+        else:
+            q = f"{self.field}:{self.low}..{self.high}"
+        if self.created_from or self.created_to:
+            start = (self.created_from or CREATED_EPOCH).isoformat()
+            end = (self.created_to or datetime.date.today()).isoformat()
+            q += f" created:{start}..{end}"
+        return q
+
+    @property
+    def key(self) -> str:
+        """分片的唯一标识，用于日志和断点续传。"""
+        return self.qualifier()
+
+    def with_count(self, count: int) -> "SearchShard":
+        return SearchShard(self.field, self.low, self.high,
+                           self.created_from, self.created_to, count)
+
+    def as_dict(self) -> Dict:
+        """转换为用于持久化分片计划的字典 (键与 CrawlCheckpoint 的列一致)。"""
+        return {
+            "shardKey": self.key,
+            "field": self.field,
+            "low": self.low,
+            "high": self.high,
+            "createdFrom": self.created_from.isoformat() if self.created_from else None,
+            "createdTo": self.created_to.isoformat() if self.created_to else None,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SearchShard":
+        """由 ``as_dict`` 的结果 (或 CrawlCheckpoint 行) 还原分片。"""
+        def _date(value):
+            return datetime.date.fromisoformat(value) if value else None
+        return cls(data["field"], data["low"], data.get("high"),
+                   _date(data.get("createdFrom")), _date(data.get("createdTo")),
+                   data.get("count") or 0)
+
+
+def _split_range(low: int, high: int) -> int:
+    """返回数值窗口的切分点 mid (low <= mid < high)。
+
+    star/follower 数呈长尾分布，跨度很大的窗口按几何中点切分，
+    使两侧结果数更均衡；跨度较小时按算术中点切分。
+    """
+    if low > 0 and high > 4 * low:
+        mid = int(math.sqrt(low * high))
+    else:
+        mid = (low + high) // 2
+    return min(max(mid, low), high - 1)
+
+
+def shard_limits(counts: List[int], max_results: int = -1, cap: int = SEARCH_RESULT_CAP) -> List[int]:
+    """按计划顺序为各分片分配抓取上限，使所有分片合计不超过 ``max_results``。
+
+    分片按数值降序排列，因此前面的分片优先用满预算，最后一个分片只抓取剩余的部分，
+    其后的分片上限为 0。分片结果数以规划时的计数为准。
+
+    Args:
+        counts (List[int]): 各分片规划时的结果数，按计划顺序排列。
+        max_results (int): 全局上限，-1 表示不限制 (每个分片最多抓取 ``cap`` 条)。
+        cap (int): 单个分片可抓取的最大结果数。
+
+    Returns:
+        List[int]: 与 ``counts`` 一一对应的抓取上限。
+    """
+    if max_results == -1:
+        return [cap] * len(counts)
+    limits = []
+    remaining = max_results
+    for count in counts:
+        limit = max(0, min(cap, count, remaining))
+        limits.append(limit)
+        remaining -= limit
+    return limits
+
+
+class ShardPlanner:
+    """自适应地将搜索空间切分为结果数均不超过上限的分片。
+
+    从数值最大的窗口开始向下规划：结果数超过上限的窗口被二分，
+    单个数值仍超限时再按 ``created:`` 日期二分。累计结果数达到
+    ``max_results`` 后停止，因此只为真正需要抓取的头部区间发起计数查询。
+    """
+
+    def __init__(self,
+                 count_func: Callable[[SearchShard], int],
+                 field_name: str,
+                 low: int = 1,
+                 cap: int = SEARCH_RESULT_CAP):
+        """
+        Args:
+            count_func (Callable[[SearchShard], int]): 返回分片结果数
+                (``repositoryCount`` / ``userCount``) 的函数。
+            field_name (str): 切分字段，"stars" 或 "followers"。
+            low (int): 搜索空间的最小值 (包含)。
+            cap (int): 单个分片允许的最大结果数。
+        """
+        self.count_func = count_func
+        self.field_name = field_name
+        self.low = low
+        self.cap = cap
+        self.count_queries = 0
+
+    def _count(self, shard: SearchShard) -> SearchShard:
+        self.count_queries += 1
+        return shard.with_count(self.count_func(shard))
+
+    def _head_shard(self) -> SearchShard:
+        """通过指数增长找到结果数不超过上限的最高区间 ``field:>=x``。"""
+        x = max(self.low, 1) * 1024
+        shard = self._count(SearchShard(self.field_name, x))
+        while shard.count > self.cap:
+            x *= 4
+            shard = self._count(SearchShard(self.field_name, x))
+        # 区间过窄时向下扩展，尽量让头部分片接近上限
+        while x > self.low:
+            lower = max(self.low, x // 2)
+            candidate = self._count(SearchShard(self.field_name, lower))
+            if candidate.count > self.cap:
+                break
+            x, shard = lower, candidate
+        return shard
+
+    def _split_by_created(self, shard: SearchShard) -> List[SearchShard]:
+        """单个数值的结果仍超限时，按创建日期二分切分。"""
+        result = []
+        stack = [(shard.created_from or CREATED_EPOCH,
+                  shard.created_to or datetime.date.today())]
+        while stack:
+            start, end = stack.pop()
+            sub = self._count(SearchShard(shard.field, shard.low, shard.high, start, end))
+            if sub.count <= self.cap or start >= end:
+                if sub.count > self.cap:
+                    logger.warning(f"Shard '{sub.key}' still has {sub.count} results, "
+                                   f"only the first {self.cap} can be fetched")
+                if sub.count > 0:
+                    result.append(sub)
+                continue
+            mid = start + (end - start) // 2
+            stack.append((start, mid))
+            stack.append((mid + datetime.timedelta(days=1), end))
+        return result
+
+    def plan(self, max_results: int = -1) -> Tuple[List[SearchShard], int]:
+        """规划分片。
+
+        Args:
+            max_results (int): 需要覆盖的结果数，-1 表示覆盖整个搜索空间。
+
+        Returns:
+            Tuple[List[SearchShard], int]: 按数值降序排列的分片列表，以及整个搜索空间的结果总数。
+        """
+        total = self._count(SearchShard(self.field_name, self.low)).count
+        if total <= self.cap:
+            root = SearchShard(self.field_name, self.low, count=total)
+            return ([root] if total else []), total
+
+        head = self._head_shard()
+        shards = [head] if head.count else []
+        planned = head.count
+        # 栈顶为数值更大的窗口，保证按降序规划
+        stack = [(self.low, head.low - 1)] if head.low > self.low else []
+        while stack and (max_results == -1 or planned < max_results):
+            low, high = stack.pop()
+            shard = self._count(SearchShard(self.field_name, low, high))
+            if shard.count <= self.cap:
+                if shard.count:
+                    shards.append(shard)
+                    planned += shard.count
+            elif low < high:
+                mid = _split_range(low, high)
+                stack.append((low, mid))
+                stack.append((mid + 1, high))
+            else:
+                for sub in self._split_by_created(shard):
+                    shards.append(sub)
+                    planned += sub.count
+        logger.info(f"Planned {len(shards)} '{self.field_name}' shards covering {planned} of {total} results "
+                    f"with {self.count_queries} count queries")
+        return shards, total
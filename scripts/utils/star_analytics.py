@@ -0,0 +1,234 @@
+import datetime
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import logger
+from .db_utils import iter_star_history
+
+
+def day_to_date(day: int) -> datetime.date:
+    """YYYYMMDD 整数转换为日期"""
+    return datetime.date(day // 10000, day // 100 % 100, day % 100)
+
+
+def date_to_day(date: datetime.date) -> int:
+    """日期转换为 YYYYMMDD 整数"""
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+@dataclass
+class StarSeries:
+    """一组仓库按自然日排列的 star 数矩阵。
+
+    ``stars[i, j]`` 是仓库 ``ids[i]`` 在 ``start + j`` 天的 star 数，没有快照的日期为 NaN。
+    列覆盖从 ``start`` 到 ``end`` 的每一天 (包括没有运行管道的日期)，最后一列是 ``end``。
+    """
+    ids: np.ndarray  # int64，升序
+    start: datetime.date
+    stars: np.ndarray  # float64，形状 (len(ids), 天数)
+
+    @property
+    def end(self) -> datetime.date:
+        return self.start + datetime.timedelta(days=self.stars.shape[1] - 1)
+
+    def snapshot(self, days_before: int) -> Optional[Dict[int, int]]:
+        """返回 end 之前 days_before 天的 {databaseId: star 数}，不含该日没有数值的仓库。"""
+        column = self.stars.shape[1] - 1 - days_before
+        if column < 0:
+            return None
+        values = self.stars[:, column]
+        known = ~np.isnan(values)
+        if not known.any():
+            return None
+        return dict(zip(self.ids[known].tolist(), np.rint(values[known]).astype(np.int64).tolist()))
+
+
+def load_star_series(db_path: str, length: int, end: Optional[datetime.date] = None,
+                     current: Optional[Dict[int, int]] = None) -> Optional[StarSeries]:
+    """从 star 历史库读取截至 end 的 length 天数据。
+
+    Args:
+        db_path (str): star 历史数据库文件的路径。
+        length (int): 天数 (矩阵列数)。
+        end (Optional[datetime.date]): 最后一天，默认为今天。
+        current (Optional[Dict[int, int]]): end 当天的 star 数 (如仓库库中刚抓取的数据)；
+            给出时只包含这些仓库，并覆盖历史库中 end 当天的快照。
+
+    Returns:
+        Optional[StarSeries]: 没有任何数据时返回 None。
+    """
+    end = end or datetime.date.today()
+    start = end - datetime.timedelta(days=length - 1)
+    days = []
+    for day, rows in iter_star_history(db_path, date_to_day(start), date_to_day(end)):
+        # fromiter over the flattened tuples; np.asarray on a list of rows is ~100x slower
+        flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        days.append((day, flat.reshape(-1, 2)))
+    if current:
+        ids = np.fromiter(current.keys(), dtype=np.int64, count=len(current))
+        ids.sort()
+    elif days:
+        ids = np.unique(days[-1][1][:, 0])
+    else:
+        return None
+
+    stars = np.full((len(ids), length), np.nan)
+    for day, rows in days:
+        # 只保留 ids 中的仓库，按位置写入对应列
+        position = np.searchsorted(ids, rows[:, 0])
+        position[position == len(ids)] = 0
+        matched = ids[position] == rows[:, 0]
+        stars[position[matched], (day_to_date(day) - start).days] = rows[matched, 1]
+    if current:
+        stars[:, -1] = np.fromiter((current[i] for i in ids.tolist()), dtype=np.float64, count=len(ids))
+    logger.info(f"Loaded star series of {len(ids)} repos x {length} days "
+                f"({len(days)} days with snapshots) from {db_path}")
+    return StarSeries(ids=ids, start=start, stars=stars)
+
+
+def interpolate_gaps(stars: np.ndarray, max_gap: Optional[int] = None) -> np.ndarray:
+    """按行对两个已知值之间缺失的天数做线性插值。
+
+    第一个已知值之前和最后一个已知值之后的缺失值保持 NaN (仓库当时不在榜单中)；
+    超过 max_gap 天的缺口也不插值。
+
+    Args:
+        stars (np.ndarray): (仓库数, 天数) 矩阵，NaN 表示缺失。
+        max_gap (Optional[int]): 允许插值的最大连续缺失天数，为 None 时不限制。
+
+    Returns:
+        np.ndarray: 插值后的新矩阵。
+    """
+    n, d = stars.shape
+    known = ~np.isnan(stars)
+    columns = np.arange(d, dtype=np.int32)
+    # 每个位置之前 (含) 最近的已知列，以及之后 (含) 最近的已知列
+    prev = np.maximum.accumulate(np.where(known, columns, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(known, columns, d)[:, ::-1], axis=1)[:, ::-1]
+    fill = ~known & (prev >= 0) & (nxt < d)
+    if max_gap is not None:
+        fill &= (nxt - prev - 1) <= max_gap
+    result = stars.copy()
+    if not fill.any():
+        return result
+    rows, cols = np.nonzero(fill)
+    left, right = prev[rows, cols], nxt[rows, cols]
+    left_value, right_value = stars[rows, left], stars[rows, right]
+    result[rows, cols] = left_value + (right_value - left_value) * (cols - left) / (right - left)
+    return result
+
+
+def window_metrics(series: StarSeries, window: int, baseline: int,
+                   min_coverage: float = 0.5) -> Dict[str, np.ndarray]:
+    """计算截至 series.end 的窗口指标 (需要已插值的矩阵)。
+
+    - gained: 窗口内获得的 star 数
+    - velocity: 平均每天获得的 star 数；窗口开始时还没有数据的仓库按实际覆盖的天数计算，
+      覆盖不足 ``min_coverage`` 的为 NaN
+    - acceleration: 本窗口与上一个等长窗口的速度差除以窗口天数 (star/天²)
+    - breakout: 本窗口获得数与按前 ``baseline`` 天的速度预期的获得数之差，
+      除以 sqrt(预期 + 1) (类似泊松分布的 z 分数)，衡量相对仓库自身常态的爆发程度
+
+    Args:
+        series (StarSeries): 已插值的 star 数矩阵。
+        window (int): 窗口天数。
+        baseline (int): 计算 breakout 的基线天数 (紧接在窗口之前)。
+        min_coverage (float): 速度计算要求的最小窗口覆盖比例。
+
+    Returns:
+        Dict[str, np.ndarray]: 指标名到每个仓库的值的映射 (与 series.ids 对齐)，无法计算时为 NaN。
+    """
+    stars = series.stars
+    n, d = stars.shape
+    last = d - 1
+
+    def column(days_before):
+        if days_before > last:
+            return np.full(n, np.nan)
+        return stars[:, last - days_before]
+
+    now = column(0)
+    start = column(window)
+    # 窗口开始时没有数据：从窗口内第一个有数据的日期算起
+    known = ~np.isnan(stars[:, max(last - window, 0):])
+    first = np.where(known.any(axis=1), known.argmax(axis=1), known.shape[1])
+    span = np.full(n, float(window))
+    partial = np.isnan(start) & (first < known.shape[1] - 1)
+    if partial.any():
+        offset = max(last - window, 0)
+        start = start.copy()
+        start[partial] = stars[partial, offset + first[partial]]
+        span[partial] = last - (offset + first[partial])
+    span[span < window * min_coverage] = np.nan
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gained = now - start
+        velocity = gained / span
+        previous_velocity = (column(window) - column(2 * window)) / window
+        acceleration = (gained / window - previous_velocity) / window
+        base_velocity = (column(window) - column(window + baseline)) / baseline
+        expected = np.clip(base_velocity, 0, None) * window
+        breakout = (gained - expected) / np.sqrt(expected + 1)
+    acceleration[partial] = np.nan
+    return {"gained": gained, "velocity": velocity, "acceleration": acceleration, "breakout": breakout}
+
+
+def top_indices(values: np.ndarray, limit: int) -> np.ndarray:
+    """返回 values 中最大的 limit 个非 NaN 值的下标 (降序)，limit 为 -1 时返回全部。"""
+    valid = np.flatnonzero(~np.isnan(values))
+    if 0 <= limit < len(valid):
+        if limit == 0:
+            return valid[:0]
+        valid = valid[np.argpartition(-values[valid], limit - 1)[:limit]]
+    return valid[np.argsort(-values[valid], kind="stable")]
+
+
+def star_velocity_rankings(db_path: str, current: Dict[int, int], windows: List[int], baseline: int,
+                           limit: int, max_gap: Optional[int] = None,
+                           breakout_window: Optional[int] = None) -> Dict[str, List[Dict]]:
+    """计算各窗口的速度榜单 (及可选的 breakout 榜单)。
+
+    Args:
+        db_path (str): star 历史数据库文件的路径。
+        current (Dict[int, int]): 今天的 {databaseId: star 数}。
+        windows (List[int]): 窗口天数列表，如 [3, 14, 90]。
+        baseline (int): breakout 的基线天数。
+        limit (int): 每个榜单的长度。
+        max_gap (Optional[int]): 允许插值的最大连续缺失天数。
+        breakout_window (Optional[int]): 生成 breakout 榜单所用的窗口天数，为 None 时不生成。
+
+    Returns:
+        Dict[str, List[Dict]]: 榜单名 (``velocity_{w}d`` / ``breakout_{w}d``) 到条目列表的映射，
+            条目为 {databaseId, starsGained, velocity, acceleration, breakout}，按榜单指标降序。
+    """
+    all_windows = sorted(set(windows) | ({breakout_window} if breakout_window else set()))
+    if not all_windows or not current:
+        return {}
+    length = max(max(2 * w, w + baseline) for w in all_windows) + 1
+    series = load_star_series(db_path, length, current=current)
+    if series is None:
+        return {}
+    series.stars = interpolate_gaps(series.stars, max_gap)
+
+    rankings = {}
+    for window in all_windows:
+        metrics = window_metrics(series, window, baseline)
+        boards = []
+        if window in windows:
+            boards.append((f"velocity_{window}d", metrics["velocity"]))
+        if window == breakout_window:
+            boards.append((f"breakout_{window}d", metrics["breakout"]))
+        for name, key in boards:
+            rankings[name] = [
+                {
+                    "databaseId": int(series.ids[i]),
+                    **{field: (None if np.isnan(metrics[metric][i]) else round(float(metrics[metric][i]), 3))
+                       for field, metric in (("starsGained", "gained"), ("velocity", "velocity"),
+                                             ("acceleration", "acceleration"), ("breakout", "breakout"))},
+                }
+                for i in top_indices(key, limit)
+            ]
+    return rankings
@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+# 归档 star 快照的二进制旁路文件格式 (小端)：
+#   8 字节魔数 | uint64 仓库数 n | int64[n] databaseId (升序) | int32[n] star 数
+# 两个数组都是定长、按 8 / 4 字节对齐，可以直接内存映射，不需要解析
+SIDECAR_MAGIC = b"CLSTARS1"
+_HEADER_DTYPE = np.dtype([("magic", "S8"), ("count", "<u8")])
+_ID_DTYPE = np.dtype("<i8")
+_STAR_DTYPE = np.dtype("<i4")
+
+
+@dataclass
+class StarSnapshot:
+    """某一天的 star 快照：按 databaseId 升序排列的两个数组。"""
+    ids: np.ndarray  # int64，升序
+    stars: np.ndarray  # 与 ids 对齐；旁路文件中为 int32，from_dict 保留 int64，写入时才检查范围并转换
+
+    @classmethod
+    def from_dict(cls, stars: Dict[int, int]) -> "StarSnapshot":
+        ids = np.fromiter(stars.keys(), dtype=np.int64, count=len(stars))
+        values = np.fromiter(stars.values(), dtype=np.int64, count=len(stars))
+        order = np.argsort(ids, kind="stable")
+        return cls(ids=ids[order], stars=values[order])
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.stars.nbytes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, repo_id: int) -> Optional[int]:
+        """二分查找一个仓库的 star 数，不在快照中时返回 None。"""
+        position = int(np.searchsorted(self.ids, repo_id))
+        if position < len(self.ids) and self.ids[position] == repo_id:
+            return int(self.stars[position])
+        return None
+
+    def to_dict(self) -> Dict[int, int]:
+        return dict(zip(self.ids.tolist(), self.stars.tolist()))
+
+
+def encode_star_sidecar(snapshot: StarSnapshot) -> bytes:
+    """把快照编码为旁路文件内容。
+
+    Raises:
+        ValueError: star 数超出 int32 范围。
+    """
+    if len(snapshot) and (snapshot.stars.min() < np.iinfo(np.int32).min
+                          or snapshot.stars.max() > np.iinfo(np.int32).max):
+        raise ValueError("Star counts do not fit in int32")
+    header = np.array([(SIDECAR_MAGIC, len(snapshot))], dtype=_HEADER_DTYPE)
+    return (header.tobytes() + snapshot.ids.astype(_ID_DTYPE).tobytes()
+            + snapshot.stars.astype(_STAR_DTYPE).tobytes())
+
+
+def _parse_header(buffer, size: int) -> int:
+    """校验魔数和文件长度，返回仓库数。"""
+    if size < _HEADER_DTYPE.itemsize:
+        raise ValueError("Star sidecar is truncated")
+    header = np.frombuffer(buffer, dtype=_HEADER_DTYPE, count=1)[0]
+    count = int(header["count"])
+    if header["magic"] != SIDECAR_MAGIC:
+        raise ValueError("Not a star sidecar")
+    if size != _HEADER_DTYPE.itemsize + count * (_ID_DTYPE.itemsize + _STAR_DTYPE.itemsize):
+        raise ValueError(f"Star sidecar size {size} does not match its {count} entries")
+    return count
+
+
+def decode_star_sidecar(payload: bytes) -> StarSnapshot:
+    """从内存中的旁路文件内容 (如归档包中的成员) 读取快照，数组直接引用 payload。
+
+    Raises:
+        ValueError: 内容不是有效的旁路文件。
+    """
+    count = _parse_header(payload, len(payload))
+    offset = _HEADER_DTYPE.itemsize
+    ids = np.frombuffer(payload, dtype=_ID_DTYPE, count=count, offset=offset)
+    stars = np.frombuffer(payload, dtype=_STAR_DTYPE, count=count, offset=offset + ids.nbytes)
+    return StarSnapshot(ids=ids, stars=stars)
+
+
+def load_star_sidecar(path: str) -> StarSnapshot:
+    """内存映射一个旁路文件，只有实际访问到的页才会被读入。
+
+    Raises:
+        ValueError: 文件不是有效的旁路文件。
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        count = _parse_header(f.read(_HEADER_DTYPE.itemsize), size)
+    offset = _HEADER_DTYPE.itemsize
+    if count == 0:
+        return StarSnapshot(ids=np.empty(0, dtype=_ID_DTYPE), stars=np.empty(0, dtype=_STAR_DTYPE))
+    ids = np.memmap(path, dtype=_ID_DTYPE, mode="r", offset=offset, shape=(count,))
+    stars = np.memmap(path, dtype=_STAR_DTYPE, mode="r", offset=offset + ids.nbytes, shape=(count,))
+    return StarSnapshot(ids=ids, stars=stars)
+
+
+def write_star_sidecar(path: str, snapshot: StarSnapshot) -> int:
+    """写入旁路文件 (先写临时文件再原子替换，已映射旧文件的读者不受影响)，返回写出的字节数。"""
+    payload = encode_star_sidecar(snapshot)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+    return len(payload)
+
+
+class SnapshotCache:
+    """按字节数限制总大小的 LRU 快照缓存 (线程安全)。
+
+    超出 ``max_bytes`` 时淘汰最久未使用的快照；单个快照超过上限时不缓存。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, StarSnapshot]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[StarSnapshot]:
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return snapshot
+
+    def put(self, key: Hashable, snapshot: StarSnapshot):
+        with self._lock:
+            self._pop(key)
+            if snapshot.nbytes > self.max_bytes:
+                return
+            self._entries[key] = snapshot
+            self._bytes += snapshot.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+
+    def _pop(self, key: Hashable):
+        snapshot = self._entries.pop(key, None)
+        if snapshot is not None:
+            self._bytes -= snapshot.nbytes
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self._hits,
+                    "misses": self._misses, "evictions": self._evictions}
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their siblings as top-level modules (``import config``, ``from utils...``)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+# Keep test runs out of the repo-root codeLegend.log
+os.environ.setdefault("CODELEGEND_LOG_FILE", "")
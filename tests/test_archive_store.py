@@ -0,0 +1,104 @@
+import config
+import pytest
+
+from utils.archive_store import (RecordStore, append_bundle, bundle_members, decode_records,
+                                 encode_records, is_records_doc, read_bundle_member, split_records,
+                                 verify_bundle)
+
+
+def ranking(stars_offset=0):
+    return {
+        "meta": {"updated_at": "2024-01-01T00:00:00Z", "top_repos_count": 2},
+        "top_repos": [
+            {"databaseId": 1, "name": "a/one", "language": ["Python"], "accumulatedStars": 100 + stars_offset,
+             "accumulatedStars_1d": 3 + stars_offset, "accumulatedStars_7d": 20, "accumulatedStars_30d": 80,
+             "updatedAt": f"2024-01-0{1 + stars_offset}T00:00:00"},
+            {"databaseId": 2, "name": "b/two", "language": [], "accumulatedStars": 50 + stars_offset,
+             "accumulatedStars_1d": 1, "accumulatedStars_7d": 5, "accumulatedStars_30d": 9 + stars_offset,
+             "updatedAt": f"2024-01-0{1 + stars_offset}T00:00:00"},
+        ],
+    }
+
+
+def test_split_records_finds_the_record_list():
+    assert split_records(ranking()) == "top_repos"
+    assert split_records({"meta": {}, "a": [{}], "b": [{}]}) is None
+    assert split_records([1, 2]) is None
+
+
+def test_encode_decode_round_trip(tmp_path):
+    store = RecordStore(str(tmp_path))
+    data = ranking()
+    doc, written = encode_records(data, "top_repos", store, config.ARCHIVE_VOLATILE_FIELDS)
+    assert written > 0
+    assert is_records_doc(doc)
+    assert doc["fields"]["accumulatedStars"] == [100, 50]
+    assert decode_records(doc, store) == data
+    # A fresh store reads the records back from the JSON Lines shards
+    assert decode_records(doc, RecordStore(str(tmp_path))) == data
+
+
+def test_star_changes_add_no_new_records(tmp_path):
+    store = RecordStore(str(tmp_path))
+    first, _ = encode_records(ranking(), "top_repos", store, config.ARCHIVE_VOLATILE_FIELDS)
+    second_data = ranking(stars_offset=1)
+    second, written = encode_records(second_data, "top_repos", store, config.ARCHIVE_VOLATILE_FIELDS)
+    assert written == 0
+    assert second["records"] == first["records"]
+    assert decode_records(second, RecordStore(str(tmp_path))) == second_data
+
+
+def test_metadata_change_adds_one_record(tmp_path):
+    store = RecordStore(str(tmp_path))
+    encode_records(ranking(), "top_repos", store, config.ARCHIVE_VOLATILE_FIELDS)
+    data = ranking()
+    data["top_repos"][0]["name"] = "a/renamed"
+    lines = sum(1 for path in (tmp_path / "records").iterdir() for _ in path.open())
+    _, written = encode_records(data, "top_repos", store, config.ARCHIVE_VOLATILE_FIELDS)
+    assert written > 0
+    assert sum(1 for path in (tmp_path / "records").iterdir() for _ in path.open()) == lines + 1
+
+
+def test_bundle_members_read_back(tmp_path):
+    path = str(tmp_path / "bundles" / "2024-01.zip")
+    members = [("2024/01/01/top_repos_list.json", b'{"a":1}'), ("2024/01/02/top_repos_list.json", b'{"a":2}')]
+    digests = append_bundle(path, members)
+    assert verify_bundle(path, digests) == []
+    assert bundle_members(path) == [name for name, _ in members]
+    for name, payload in members:
+        assert read_bundle_member(path, name) == payload
+    assert read_bundle_member(path, "2024/01/03/top_repos_list.json") is None
+    assert read_bundle_member(str(tmp_path / "missing.zip"), members[0][0]) is None
+
+
+def test_append_bundle_keeps_existing_members(tmp_path):
+    path = str(tmp_path / "2024-01.zip")
+    append_bundle(path, [("2024/01/01/a.json", b"1")])
+    # A member that is already in the bundle with the same content is not written twice
+    digests = append_bundle(path, [("2024/01/01/a.json", b"1"), ("2024/01/02/a.json", b"2")])
+    assert bundle_members(path) == ["2024/01/01/a.json", "2024/01/02/a.json"]
+    assert verify_bundle(path, digests) == []
+
+
+def test_append_bundle_leaves_bundle_untouched_on_error(tmp_path):
+    path = str(tmp_path / "2024-01.zip")
+    append_bundle(path, [("2024/01/01/a.json", b"1")])
+    with open(path, "rb") as f:
+        before = f.read()
+
+    def members():
+        yield "2024/01/02/a.json", b"2"
+        raise IOError("blob missing")
+    with pytest.raises(IOError):
+        append_bundle(path, members())
+    with pytest.raises(ValueError):
+        append_bundle(path, [("2024/01/01/a.json", b"changed")])
+    with open(path, "rb") as f:
+        assert f.read() == before
+    assert not (tmp_path / "2024-01.zip.tmp").exists()
+
+
+def test_verify_bundle_reports_missing_and_changed_members(tmp_path):
+    path = str(tmp_path / "2024-01.zip")
+    digests = append_bundle(path, [("a", b"1"), ("b", b"2")])
+    assert verify_bundle(path, {**digests, "b": digests["a"], "c": digests["a"]}) == ["b", "c"]
@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+import config
+from utils import archive_utils
+from utils.archive_store import bundle_members, bundle_path, put_blob, write_manifest
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(config, "ARCHIVE_DIR", str(tmp_path / "data" / "archive"))
+    os.makedirs(config.ARCHIVE_DIR)
+    return config.ARCHIVE_DIR
+
+
+def archive_day(date_str, files):
+    """Writes a manifest-style archive day: blobs plus manifest.json."""
+    day_dir = os.path.join(config.ARCHIVE_DIR, *date_str.split("-"))
+    manifest = {}
+    for fname, data in files.items():
+        manifest[fname], _ = put_blob(config.ARCHIVE_DIR, json.dumps(data).encode("utf-8"))
+    write_manifest(day_dir, manifest)
+    return day_dir
+
+
+def test_compact_archive_appends_days_and_removes_them(archive_dir):
+    first = archive_day("2020-01-01", {"top_users_list.json": {"day": 1}})
+    archive_utils.compact_archive(keep_months=1)
+    second = archive_day("2020-01-02", {"top_users_list.json": {"day": 2}})
+    assert archive_utils.compact_archive(keep_months=1) == ["2020-01"]
+    path = bundle_path(archive_dir, "2020-01")
+    assert bundle_members(path) == ["2020/01/01/top_users_list.json", "2020/01/02/top_users_list.json"]
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert archive_utils.read_archived_json("2020-01-01", "top_users_list.json") == {"day": 1}
+    assert archive_utils.read_archived_json("2020-01-02", "top_users_list.json") == {"day": 2}
+    # The blobs are only referenced by the compacted days
+    assert not any(files for _, _, files in os.walk(os.path.join(archive_dir, "blobs")))
+
+
+def test_compact_archive_keeps_days_when_a_file_is_missing(archive_dir):
+    day_dir = archive_day("2020-02-01", {"top_users_list.json": {"day": 1}})
+    with open(os.path.join(day_dir, "manifest.json"), encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    files["top_repos_list.json"] = "blobs/00/missing.json"
+    write_manifest(day_dir, files)
+    with pytest.raises(IOError, match="2020-02"):
+        archive_utils.compact_archive(keep_months=1)
+    assert os.path.exists(os.path.join(day_dir, "manifest.json"))
+    assert not os.path.exists(bundle_path(archive_dir, "2020-02"))
+    assert archive_utils.read_archived_json("2020-02-01", "top_users_list.json") == {"day": 1}
+
+
+def test_compact_archive_keeps_days_when_verification_fails(archive_dir, monkeypatch):
+    day_dir = archive_day("2020-03-01", {"top_users_list.json": {"day": 1}})
+    monkeypatch.setattr(archive_utils, "verify_bundle", lambda path, digests: sorted(digests))
+    with pytest.raises(IOError):
+        archive_utils.compact_archive(keep_months=1)
+    assert os.path.exists(os.path.join(day_dir, "manifest.json"))
@@ -0,0 +1,42 @@
+import pytest
+
+from utils.db_utils import (dispose_engines, get_language_new_repo_days, get_language_rankings,
+                            get_repo_rankings, get_tracked_languages, save_language_new_repos,
+                            save_repositories, update_language_rollup)
+
+
+@pytest.fixture
+def repos_db(tmp_path):
+    yield str(tmp_path / "repos.db")
+    dispose_engines()
+
+
+def test_repo_rankings_split_languages_without_padding(repos_db):
+    save_repositories(repos_db, [
+        {"databaseId": 1, "id": "R_1", "name": "a/one", "accumulatedStars": 10,
+         "languages": ["Python", "C"], "createdAt": "2020-01-01T00:00:00Z"},
+        {"databaseId": 2, "id": "R_2", "name": "a/two", "accumulatedStars": 20,
+         "languages": [], "createdAt": "2020-01-01T00:00:00Z"},
+    ])
+    rankings = get_repo_rankings(repos_db, {"accumulatedStars": -1})
+    assert [(repo["databaseId"], repo["language"]) for repo in rankings["accumulatedStars"]] == [
+        (2, []), (1, ["Python", "C"])]
+
+
+def test_language_rollup_sums_new_repo_counts(repos_db):
+    save_repositories(repos_db, [
+        {"databaseId": 1, "id": "R_1", "accumulatedStars": 10, "languages": ["Python", "C"]},
+        {"databaseId": 2, "id": "R_2", "accumulatedStars": 20, "languages": ["Python"]},
+        {"databaseId": 3, "id": "R_3", "accumulatedStars": 30, "languages": ["Rust"]},
+    ])
+    update_language_rollup(repos_db, 20240110)
+    assert get_tracked_languages(repos_db, 20240110, limit=1) == ["Python"]
+    save_language_new_repos(repos_db, 20240108, {"Python": 100, "Rust": 40})
+    save_language_new_repos(repos_db, 20240109, {"Python": 120, "Rust": 50, "Go": 0})
+    # Saving a day again overwrites its counts
+    save_language_new_repos(repos_db, 20240109, {"Python": 110, "Rust": 50})
+    assert get_language_new_repo_days(repos_db, 20240101, 20240110) == [20240108, 20240109]
+    assert get_language_rankings(repos_db, 20240101, 20240110) == [
+        {"language": "Python", "newRepos": 210, "starsGained": 0, "repos": 2},
+        {"language": "Rust", "newRepos": 90, "starsGained": 0, "repos": 1},
+    ]
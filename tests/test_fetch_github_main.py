@@ -0,0 +1,132 @@
+import datetime
+
+import pytest
+import requests
+
+import fetch_github_main
+from utils.adaptive_pager import AdaptivePager
+from utils.pipeline_dag import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, PipelineDAG
+
+
+def pipeline_status(**overrides):
+    dag = PipelineDAG(fetch_github_main.pipeline_steps())
+    status = {name: STATUS_OK for name in dag.order}
+    status.update(overrides)
+    return dag, status
+
+
+def test_exit_code_ok_when_every_step_succeeded():
+    assert fetch_github_main._pipeline_exit_code(*pipeline_status()) == fetch_github_main.EXIT_OK
+
+
+def test_exit_code_partial_when_one_branch_still_published():
+    dag, status = pipeline_status(**{"Fetching Repos": STATUS_FAILED, "Generating Repo JSON": STATUS_SKIPPED,
+                                     "Archiving Data": STATUS_SKIPPED})
+    assert fetch_github_main._pipeline_exit_code(dag, status) == fetch_github_main.EXIT_PARTIAL
+
+
+def test_exit_code_failed_when_nothing_was_published():
+    dag, status = pipeline_status()
+    for name, step in dag.steps.items():
+        if step.outputs and name != "Initializing Database":
+            status[name] = STATUS_SKIPPED
+    status["Fetching Repos"] = status["Fetching Users"] = STATUS_FAILED
+    assert fetch_github_main._pipeline_exit_code(dag, status) == fetch_github_main.EXIT_FAILED
+
+
+def test_repo_json_failure_reaches_the_pipeline(monkeypatch):
+    def broken(db_path, limits):
+        raise RuntimeError("db is locked")
+    monkeypatch.setattr(fetch_github_main, "get_repo_rankings", broken)
+    with pytest.raises(RuntimeError, match="db is locked"):
+        fetch_github_main.generate_repo_json_files({})
+
+
+def test_repo_json_fails_after_writing_the_other_files(monkeypatch):
+    written = []
+
+    def save(items, filename, **kwargs):
+        if filename == fetch_github_main.config.DAILY_TRENDING_FILENAME:
+            raise OSError("disk full")
+        written.append(filename)
+    monkeypatch.setattr(fetch_github_main, "get_repo_rankings",
+                        lambda db_path, limits: {column: [] for column in limits})
+    monkeypatch.setattr(fetch_github_main, "_save_ranking_json", save)
+    with pytest.raises(RuntimeError, match="daily_trending.json"):
+        fetch_github_main.generate_repo_json_files({})
+    assert len(written) == 3
+
+
+def test_language_new_repos_saves_only_fully_counted_days(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(fetch_github_main, "get_tracked_languages", lambda db_path, day, limit: ["Python", "Go"])
+    monkeypatch.setattr(fetch_github_main, "save_language_new_repos",
+                        lambda db_path, day, counts: saved.update({day: counts}))
+
+    def count(language, date):
+        if date.day == 2 and language == "Go":
+            raise RuntimeError("502")
+        return len(language) * date.day
+    monkeypatch.setattr(fetch_github_main, "_count_new_repos", count)
+    days = [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2), datetime.date(2024, 1, 3)]
+    with pytest.raises(RuntimeError, match="2024-01-02"):
+        fetch_github_main.fetch_language_new_repos(days)
+    assert saved == {20240101: {"Python": 6, "Go": 2}, 20240103: {"Python": 18, "Go": 6}}
+
+
+def test_language_board_spans_the_rollup_days_ending_utc_yesterday(monkeypatch):
+    windows, metas = [], []
+    monkeypatch.setattr(fetch_github_main, "_last_complete_utc_day", lambda: datetime.date(2024, 3, 1))
+    monkeypatch.setattr(fetch_github_main, "get_language_rankings",
+                        lambda db_path, first_day, last_day, limit: windows.append((first_day, last_day)) or [])
+    monkeypatch.setattr(fetch_github_main, "_save_ranking_json", lambda *args: metas.append(args[-1]))
+    fetch_github_main.generate_language_json_files({})
+    first, last = (datetime.datetime.strptime(str(day), "%Y%m%d").date() for day in windows[0])
+    assert last == datetime.date(2024, 3, 1)
+    assert (last - first).days + 1 == fetch_github_main.config.LANGUAGE_ROLLUP_DAYS
+    assert metas[0]["last_day"] == "2024-03-01"
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+def test_search_page_raises_non_transient_errors_without_resending(monkeypatch):
+    sizes, fallbacks = [], []
+
+    def send(query, operation_name, variables):
+        sizes.append(variables["first"])
+        raise http_error(403)
+    monkeypatch.setattr(fetch_github_main, "_send_graphql_request", send)
+    monkeypatch.setattr(fetch_github_main, "_make_graphql_request", lambda *args: fallbacks.append(args))
+    with pytest.raises(requests.exceptions.HTTPError, match="403"):
+        fetch_github_main._fetch_search_page(AdaptivePager("search", 50), "query", "search", {}, "first", 100)
+    assert sizes == [50]
+    assert fallbacks == []
+
+
+def test_search_page_shrinks_on_502_then_falls_back_to_backoff(monkeypatch):
+    sizes = []
+
+    def send(query, operation_name, variables):
+        sizes.append(variables["first"])
+        raise http_error(502)
+    monkeypatch.setattr(fetch_github_main, "_send_graphql_request", send)
+    monkeypatch.setattr(fetch_github_main, "_make_graphql_request",
+                        lambda query, operation_name, variables: {"size": variables["first"]})
+    pager = AdaptivePager("search", 20, min_size=5)
+    result, size = fetch_github_main._fetch_search_page(pager, "query", "search", {}, "first", 100)
+    assert sizes[0] == 20 and sizes[-1] == 5
+    assert result == {"size": 5} and size == 5
+
+
+def test_contribution_prune_cutoff_uses_utc_yesterday(monkeypatch):
+    cutoffs = []
+    monkeypatch.setattr(fetch_github_main, "prune_user_contributions",
+                        lambda db_path, before_day: cutoffs.append(before_day) or 0)
+    fetch_github_main.fetch_user_contributions(days=[])
+    yesterday = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    oldest = yesterday - datetime.timedelta(days=fetch_github_main.config.CONTRIBUTION_HISTORY_DAYS)
+    assert cutoffs == [int(oldest.strftime("%Y%m%d"))]
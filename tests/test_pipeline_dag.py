@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from utils.pipeline_dag import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, PipelineDAG, PipelineStep
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+def noop():
+    pass
+
+
+def test_steps_run_in_dependency_order():
+    ran = []
+    lock = threading.Lock()
+
+    def record(name):
+        def func():
+            with lock:
+                ran.append(name)
+        return func
+
+    dag = PipelineDAG([
+        PipelineStep("archive", record("archive"), inputs=["repo_json", "user_json"]),
+        PipelineStep("repos", record("repos"), outputs=["repo_json"]),
+        PipelineStep("users", record("users"), outputs=["user_json"]),
+    ])
+    status = dag.run(max_workers=2)
+    assert status == {"repos": STATUS_OK, "users": STATUS_OK, "archive": STATUS_OK}
+    assert ran[-1] == "archive"
+
+
+def test_failure_skips_only_dependents():
+    skipped = []
+    dag = PipelineDAG([
+        PipelineStep("fetch repos", fail, outputs=["repos_db"]),
+        PipelineStep("repo json", noop, inputs=["repos_db"], outputs=["repo_json"]),
+        PipelineStep("archive", noop, inputs=["repo_json", "user_json"], outputs=["archive"]),
+        PipelineStep("fetch users", noop, outputs=["users_db"]),
+        PipelineStep("user json", noop, inputs=["users_db"], outputs=["user_json"]),
+        PipelineStep("check size", noop, inputs=["archive"], run_on_failure=True),
+    ])
+    status = dag.run(on_skip=lambda name, failed: skipped.append((name, failed)))
+    assert status == {
+        "fetch repos": STATUS_FAILED,
+        "fetch users": STATUS_OK,
+        "repo json": STATUS_SKIPPED,
+        "user json": STATUS_OK,
+        "archive": STATUS_SKIPPED,
+        "check size": STATUS_OK,
+    }
+    assert skipped == [("repo json", ["fetch repos"]), ("archive", ["repo json"])]
+
+
+def test_independent_branches_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    dag = PipelineDAG([
+        PipelineStep("a", barrier.wait, outputs=["a"]),
+        PipelineStep("b", barrier.wait, outputs=["b"]),
+    ])
+    assert dag.run(max_workers=2) == {"a": STATUS_OK, "b": STATUS_OK}
+
+
+def test_wrap_is_entered_for_every_executed_step():
+    entered = []
+
+    class Wrap:
+        def __init__(self, name):
+            self.name = name
+
+        def __enter__(self):
+            entered.append(self.name)
+
+        def __exit__(self, *exc):
+            return False
+
+    dag = PipelineDAG([PipelineStep("a", fail, outputs=["a"]), PipelineStep("b", noop, inputs=["a"])])
+    dag.run(wrap=Wrap)
+    assert entered == ["a"]
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([PipelineStep("a", noop), PipelineStep("a", noop)], "Duplicate"),
+    ([PipelineStep("a", noop, outputs=["x"]), PipelineStep("b", noop, outputs=["x"])], "produced by both"),
+    ([PipelineStep("a", noop, inputs=["missing"])], "not produced"),
+    ([PipelineStep("a", noop, inputs=["y"], outputs=["x"]),
+      PipelineStep("b", noop, inputs=["x"], outputs=["y"])], "cycle"),
+])
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        PipelineDAG(steps)
@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+
+from utils.shard_planner import SearchShard, ShardPlanner, shard_limits
+
+
+def make_counter(stars, created=None):
+    """Returns a count function over a list of star counts (and optional creation dates)."""
+    created = created or [datetime.date(2020, 1, 1)] * len(stars)
+
+    def count(shard):
+        return sum(1 for value, day in zip(stars, created)
+                   if value >= shard.low and (shard.high is None or value <= shard.high)
+                   and (shard.created_from is None or day >= shard.created_from)
+                   and (shard.created_to is None or day <= shard.created_to))
+    return count
+
+
+def test_qualifier():
+    assert SearchShard("stars", 10).qualifier() == "stars:>=10"
+    assert SearchShard("stars", 5, 5).qualifier() == "stars:5"
+    assert SearchShard("followers", 1, 9).qualifier() == "followers:1..9"
+    shard = SearchShard("stars", 5, 5, datetime.date(2020, 1, 1), datetime.date(2020, 6, 30))
+    assert shard.qualifier() == "stars:5 created:2020-01-01..2020-06-30"
+
+
+def test_shard_round_trips_through_dict():
+    shard = SearchShard("stars", 5, 5, datetime.date(2020, 1, 1), datetime.date(2020, 6, 30), count=42)
+    restored = SearchShard.from_dict(shard.as_dict())
+    assert restored == shard
+    assert restored.count == 42
+
+
+def test_small_space_is_a_single_shard():
+    planner = ShardPlanner(make_counter([1, 2, 3, 50]), "stars", cap=10)
+    shards, total = planner.plan()
+    assert total == 4
+    assert [shard.qualifier() for shard in shards] == ["stars:>=1"]
+
+
+def test_plan_covers_space_without_overlap():
+    stars = [value for value in range(1, 200) for _ in range(value % 7 + 1)]
+    planner = ShardPlanner(make_counter(stars), "stars", cap=50)
+    shards, total = planner.plan()
+    assert total == len(stars)
+    assert all(shard.count <= 50 for shard in shards)
+    assert sum(shard.count for shard in shards) == total
+    # Shards are disjoint and ordered from the highest star counts down
+    highs = [shard.high if shard.high is not None else float("inf") for shard in shards]
+    assert highs == sorted(highs, reverse=True)
+    for upper, lower in zip(shards, shards[1:]):
+        assert lower.high < upper.low
+
+
+def test_plan_stops_once_max_results_are_covered():
+    stars = list(range(1, 1001))
+    planner = ShardPlanner(make_counter(stars), "stars", cap=100)
+    shards, _ = planner.plan(max_results=250)
+    planned = sum(shard.count for shard in shards)
+    assert 250 <= planned < 250 + 100
+    assert min(shard.low for shard in shards) > 600
+
+
+def test_single_value_over_cap_is_split_by_created_date():
+    created = [datetime.date(2010, 1, 1) + datetime.timedelta(days=30 * i) for i in range(30)]
+    planner = ShardPlanner(make_counter([5] * 30, created), "stars", low=5, cap=10)
+    shards, total = planner.plan()
+    assert total == 30
+    assert all(shard.low == shard.high == 5 and shard.created_from for shard in shards)
+    assert all(shard.count <= 10 for shard in shards)
+    assert sum(shard.count for shard in shards) == 30
+
+
+@pytest.mark.parametrize("counts, max_results, expected", [
+    ([900, 800, 700], -1, [1000, 1000, 1000]),
+    ([900, 800, 700], 1000, [900, 100, 0]),
+    ([900, 800, 700], 5000, [900, 800, 700]),
+    ([1200, 300], 1100, [1000, 100]),
+    ([], 10, []),
+])
+def test_shard_limits_share_the_global_budget(counts, max_results, expected):
+    assert shard_limits(counts, max_results) == expected
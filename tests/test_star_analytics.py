@@ -0,0 +1,88 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from utils.db_utils import dispose_engines, save_star_snapshot
+from utils.star_analytics import (StarSeries, date_to_day, day_to_date, interpolate_gaps,
+                                  star_velocity_rankings, top_indices, window_metrics)
+
+nan = np.nan
+
+
+def test_day_conversions_round_trip():
+    assert date_to_day(datetime.date(2024, 2, 29)) == 20240229
+    assert day_to_date(20240229) == datetime.date(2024, 2, 29)
+
+
+def test_interpolate_fills_inner_gaps_linearly():
+    stars = np.array([[10, nan, nan, 40, nan, 60]])
+    np.testing.assert_allclose(interpolate_gaps(stars), [[10, 20, 30, 40, 50, 60]])
+
+
+def test_interpolate_keeps_leading_and_trailing_gaps():
+    stars = np.array([[nan, 5, nan, 7, nan]])
+    np.testing.assert_allclose(interpolate_gaps(stars), [[nan, 5, 6, 7, nan]])
+
+
+def test_interpolate_respects_max_gap():
+    stars = np.array([[0, nan, 2, nan, nan, nan, 6]])
+    np.testing.assert_allclose(interpolate_gaps(stars, max_gap=2), [[0, 1, 2, nan, nan, nan, 6]])
+
+
+def test_interpolate_does_not_modify_input():
+    stars = np.array([[1, nan, 3]])
+    interpolate_gaps(stars)
+    assert np.isnan(stars[0, 1])
+
+
+def series(rows):
+    stars = np.array(rows, dtype=np.float64)
+    return StarSeries(ids=np.arange(len(rows), dtype=np.int64), start=datetime.date(2024, 1, 1), stars=stars)
+
+
+def test_window_metrics_on_linear_growth():
+    # 10 stars/day for 9 days, then 20 stars/day for the last 3
+    values = [10 * i for i in range(10)] + [90 + 20 * i for i in range(1, 4)]
+    metrics = window_metrics(series([values]), window=3, baseline=6)
+    assert metrics["gained"][0] == 60
+    assert metrics["velocity"][0] == 20
+    assert metrics["acceleration"][0] == pytest.approx((20 - 10) / 3)
+    # expected 30 stars from the 10/day baseline
+    assert metrics["breakout"][0] == pytest.approx((60 - 30) / np.sqrt(31))
+
+
+def test_window_metrics_for_repo_that_joined_mid_window():
+    rows = [[nan, nan, nan, 100, 110, 120], [nan, nan, nan, nan, nan, 5]]
+    metrics = window_metrics(series(rows), window=4, baseline=1)
+    # First value two days before the end: 20 stars over 2 days
+    assert metrics["velocity"][0] == 10
+    assert np.isnan(metrics["acceleration"][0])
+    # Seen on the last day only: not enough coverage
+    assert np.isnan(metrics["velocity"][1])
+
+
+def test_top_indices_skips_nan_and_sorts_descending():
+    values = np.array([3.0, nan, 9.0, 1.0, 9.0])
+    assert top_indices(values, 2).tolist() == [2, 4]
+    assert top_indices(values, -1).tolist() == [2, 4, 0, 3]
+    assert top_indices(values, 0).tolist() == []
+
+
+def test_star_velocity_rankings_interpolate_missing_days(tmp_path):
+    db_path = str(tmp_path / "star_history.db")
+    today = datetime.date.today()
+    try:
+        for days_before in range(1, 8):
+            if days_before in (2, 3):
+                continue  # the pipeline did not run on these days
+            day = today - datetime.timedelta(days=days_before)
+            save_star_snapshot(db_path, date_to_day(day), {1: 1000 - 10 * days_before, 2: 500 - days_before})
+        rankings = star_velocity_rankings(db_path, {1: 1000, 2: 500, 3: 7}, windows=[3], baseline=3, limit=10)
+    finally:
+        dispose_engines()
+    board = rankings["velocity_3d"]
+    assert [entry["databaseId"] for entry in board] == [1, 2]
+    assert board[0]["starsGained"] == 30
+    assert board[0]["velocity"] == 10
+    assert board[1]["velocity"] == 1
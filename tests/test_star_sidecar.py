@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from utils.star_sidecar import (SnapshotCache, StarSnapshot, decode_star_sidecar, encode_star_sidecar,
+                                load_star_sidecar, write_star_sidecar)
+
+
+def test_sidecar_round_trip(tmp_path):
+    snapshot = StarSnapshot.from_dict({30: 7, 10: 1000, 20: 0})
+    assert snapshot.ids.tolist() == [10, 20, 30]
+    path = str(tmp_path / "stars.bin")
+    assert write_star_sidecar(path, snapshot) == 8 + 8 + 3 * 12
+    for loaded in (load_star_sidecar(path), decode_star_sidecar(encode_star_sidecar(snapshot))):
+        assert loaded.to_dict() == {10: 1000, 20: 0, 30: 7}
+        assert loaded.get(20) == 0
+        assert loaded.get(15) is None
+
+
+def test_star_counts_outside_int32_are_rejected():
+    snapshot = StarSnapshot.from_dict({1: 2 ** 31})
+    assert snapshot.get(1) == 2 ** 31
+    with pytest.raises(ValueError, match="int32"):
+        encode_star_sidecar(snapshot)
+
+
+def test_invalid_sidecars_are_rejected():
+    payload = encode_star_sidecar(StarSnapshot.from_dict({1: 2}))
+    with pytest.raises(ValueError):
+        decode_star_sidecar(payload[:-1])
+    with pytest.raises(ValueError):
+        decode_star_sidecar(b"NOTSTARS" + payload[8:])
+
+
+def test_cache_evicts_least_recently_used():
+    snapshot = StarSnapshot(ids=np.arange(2, dtype=np.int64), stars=np.zeros(2, dtype=np.int32))
+    cache = SnapshotCache(max_bytes=2 * snapshot.nbytes)
+    cache.put("a", snapshot)
+    cache.put("b", snapshot)
+    assert cache.get("a") is snapshot
+    cache.put("c", snapshot)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1